@@ -0,0 +1,13 @@
+from django.apps import AppConfig
+
+
+class OctofitTrackerConfig(AppConfig):
+    name = 'octofit_tracker'
+
+    def ready(self):
+        # Connect the signal receivers that keep derived collections in sync.
+        # windows must come after rollups: seeding a window reads the buckets.
+        from . import leaderboard, rollups, versions, windows  # noqa: F401
+        from . import leaderboard_stream, rank_index  # noqa: F401
+        # Register the Mongo command listener before any client is created.
+        from . import profiling  # noqa: F401
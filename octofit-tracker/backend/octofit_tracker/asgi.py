@@ -13,4 +13,15 @@ from django.core.asgi import get_asgi_application
 
 os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'octofit_tracker.settings')
 
-application = get_asgi_application()
+django_application = get_asgi_application()
+
+# Imported after Django is set up
+from .leaderboard_stream import STREAM_PATH, leaderboard_events  # noqa: E402
+
+
+async def application(scope, receive, send):
+    """Serve the leaderboard event stream outside Django, everything else through it."""
+    if scope['type'] == 'http' and scope['path'] == STREAM_PATH:
+        await leaderboard_events(scope, receive, send)
+    else:
+        await django_application(scope, receive, send)
@@ -0,0 +1,97 @@
+"""
+Async read endpoints served under ASGI with the motor driver.
+
+``/api/async/leaderboard/``, ``/api/async/activities/`` and
+``/api/async/workouts/`` return the same JSON as the plain list actions of
+the matching viewsets (documents are converted with NativeReader) without
+holding a worker thread while MongoDB answers. They support ``?fields=``,
+and activities support the same filters as the sync list. The sync
+viewsets are unchanged and keep serving every other route.
+
+motor is optional; without it these routes are not registered. The 2.x
+line is the one that pairs with djongo's pymongo 3, and it only imports on
+Python 3.10 and earlier.
+"""
+import asyncio
+import weakref
+
+from django.conf import settings
+from django.http import HttpResponse, JsonResponse
+from rest_framework.exceptions import ValidationError
+
+from .filters import activity_lookups, mongo_query
+from .models import Activity, Leaderboard, User, Workout
+from .mongo import client_settings
+from .native_reads import NativeReader
+from .renderers import ORJSONRenderer
+from .serializers import ActivitySerializer, LeaderboardSerializer, WorkoutSerializer
+from .sparse_fields import parse_fields
+
+try:
+    from motor.motor_asyncio import AsyncIOMotorClient
+except ImportError:  # pragma: no cover - motor is optional
+    AsyncIOMotorClient = None
+
+# motor clients are bound to the event loop they were created on
+_clients = weakref.WeakKeyDictionary()
+_readers = {}
+_renderer = ORJSONRenderer()
+
+
+def get_motor_db():
+    """Return the default database through this event loop's motor client."""
+    loop = asyncio.get_running_loop()
+    params, name = client_settings()
+    client = _clients.get(loop)
+    if client is None:
+        params.setdefault('maxPoolSize', getattr(settings, 'OCTOFIT_ASYNC_MONGO_POOL_SIZE', 100))
+        client = _clients[loop] = AsyncIOMotorClient(**params)
+    return client[name]
+
+
+def _reader(serializer_class, fields):
+    key = (serializer_class, None if fields is None else tuple(fields))
+    reader = _readers.get(key)
+    if reader is None:
+        reader = _readers[key] = NativeReader(serializer_class, fields)
+    return reader
+
+
+def _fields(request, serializer_class):
+    return parse_fields(request.GET, list(serializer_class().fields))
+
+
+async def _respond(request, serializer_class, collection, query, sort):
+    try:
+        fields = _fields(request, serializer_class)
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    reader = _reader(serializer_class, fields)
+    cursor = get_motor_db()[collection].find(query, reader.projection).sort(sort)
+    records = [reader.to_representation(document) async for document in cursor]
+    return HttpResponse(_renderer.render(records), content_type='application/json')
+
+
+async def leaderboard_list(request):
+    return await _respond(
+        request, LeaderboardSerializer, Leaderboard._meta.db_table, {}, [('rank', 1), ('_id', 1)]
+    )
+
+
+async def activity_list(request):
+    members = None
+    team_id = request.GET.get('team_id')
+    if team_id:
+        users = get_motor_db()[User._meta.db_table].find({'team_id': team_id}, {'_id': 1})
+        members = [str(user['_id']) async for user in users]
+    try:
+        query = mongo_query(activity_lookups(request.GET, team_members=lambda _: members))
+    except ValidationError as exc:
+        return JsonResponse(exc.detail, status=400)
+    return await _respond(
+        request, ActivitySerializer, Activity._meta.db_table, query, [('date', -1), ('_id', -1)]
+    )
+
+
+async def workout_list(request):
+    return await _respond(request, WorkoutSerializer, Workout._meta.db_table, {}, [('_id', 1)])
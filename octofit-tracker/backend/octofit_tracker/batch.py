@@ -0,0 +1,166 @@
+"""
+Batched reads: ``POST /api/batch/`` runs several API GETs in one HTTP call.
+
+Request body::
+
+    {"requests": {"users": "/api/users/?fields=id,name", "leaderboard": "/api/leaderboard/"}}
+
+Response::
+
+    {"responses": {"users": {"status": 200, "headers": {...}, "body": [...]}, ...}}
+
+Each part is resolved against the URLconf and passed straight to its view,
+so it skips the middleware, CORS and session work a separate request would
+pay, and the client saves a round trip per part. Parts see the batch
+request's cookies, session and user. ``headers`` carries the part's
+``ETag``, ``Last-Modified`` and ``X-Sync-Cursor`` when set; ``body`` is the
+part's JSON, spliced in as rendered rather than decoded and re-encoded.
+
+The first part runs in the request thread and the others on a thread pool
+of ``OCTOFIT_BATCH_WORKERS`` threads shared by every batch in the process,
+so batches cannot multiply the load on the database. A worker thread opens
+its own Django connection and closes it after each part under the same
+``CONN_MAX_AGE`` rule as a request thread. Parts run in a copy of the
+request's context, so the profiling middleware counts their queries (their
+``db`` time is summed, and can exceed the batch's wall time).
+
+Only paths under ``/api/`` are accepted, at most
+``OCTOFIT_BATCH_MAX_REQUESTS`` of them. Streaming responses (the activity
+export), the ``/api/async/`` views and nested batches are answered with a
+400 part.
+"""
+import asyncio
+import contextvars
+import json
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from urllib.parse import urlsplit
+
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import HttpRequest, HttpResponse, QueryDict
+from django.urls import Resolver404, resolve
+from rest_framework.decorators import api_view
+from rest_framework.exceptions import ValidationError
+
+logger = logging.getLogger(__name__)
+
+# Part response headers passed through to the client
+PART_HEADERS = ('ETag', 'Last-Modified', 'X-Sync-Cursor')
+
+# Headers of the batch request that must not leak into its parts
+DROPPED_META = ('CONTENT_LENGTH', 'CONTENT_TYPE', 'HTTP_IF_NONE_MATCH', 'HTTP_IF_MODIFIED_SINCE')
+
+executor = ThreadPoolExecutor(
+    max_workers=getattr(settings, 'OCTOFIT_BATCH_WORKERS', 4),
+    thread_name_prefix='octofit-batch',
+)
+
+
+def error_part(status_code, detail):
+    return status_code, {}, json.dumps({'detail': detail}).encode()
+
+
+def subrequest(request, url):
+    """A GET for ``url`` carrying the batch request's client, cookies and user."""
+    parts = urlsplit(url)
+    sub = HttpRequest()
+    sub.method = 'GET'
+    sub.path = sub.path_info = parts.path
+    sub.META = {key: value for key, value in request.META.items() if key not in DROPPED_META}
+    sub.META.update(
+        REQUEST_METHOD='GET',
+        PATH_INFO=parts.path,
+        QUERY_STRING=parts.query,
+        HTTP_ACCEPT='application/json',
+    )
+    sub.GET = QueryDict(parts.query)
+    sub.COOKIES = request.COOKIES
+    for attribute in ('session', 'user'):
+        if hasattr(request, attribute):
+            setattr(sub, attribute, getattr(request, attribute))
+    return sub
+
+
+def dispatch(request, url):
+    """Run one part and return (status, headers, JSON body bytes)."""
+    sub = subrequest(request, url)
+    try:
+        match = resolve(sub.path_info, getattr(request, 'urlconf', None))
+    except Resolver404:
+        return error_part(404, 'Not found.')
+    if match.url_name == 'batch':
+        return error_part(400, 'Batches cannot be nested.')
+    if asyncio.iscoroutinefunction(match.func):
+        return error_part(400, 'Async endpoints cannot be batched.')
+    sub.resolver_match = match
+
+    try:
+        response = match.func(sub, *match.args, **match.kwargs)
+        if response.streaming:
+            response.close()
+            return error_part(400, 'Streaming responses cannot be batched.')
+        if hasattr(response, 'render'):
+            response.render()
+    except Exception:
+        logger.exception('Batch part %s failed', url)
+        return error_part(500, 'A server error occurred.')
+
+    headers = {name: response[name] for name in PART_HEADERS if response.has_header(name)}
+    content = response.content
+    if not content:
+        content = b'null'
+    elif not response.get('Content-Type', '').startswith('application/json'):
+        content = json.dumps(content.decode(response.charset, 'replace')).encode()
+    return response.status_code, headers, content
+
+
+def dispatch_in_worker(request, url):
+    close_old_connections()
+    try:
+        return dispatch(request, url)
+    finally:
+        close_old_connections()
+
+
+def parse_batch(data):
+    """Validate the request body and return [(name, url), ...]."""
+    requests = data.get('requests') if isinstance(data, dict) else None
+    if not isinstance(requests, dict) or not requests:
+        raise ValidationError({'requests': 'Expected a non-empty object of name: URL.'})
+    limit = getattr(settings, 'OCTOFIT_BATCH_MAX_REQUESTS', 20)
+    if len(requests) > limit:
+        raise ValidationError({'requests': f'At most {limit} requests can be batched.'})
+    for name, url in requests.items():
+        if not isinstance(url, str) or not urlsplit(url).path.startswith('/api/'):
+            raise ValidationError({'requests': {name: 'Expected a path under /api/.'}})
+    return list(requests.items())
+
+
+def encode_batch(names, results):
+    """Splice each part's rendered body into one JSON document."""
+    parts = []
+    for name, (status_code, headers, content) in zip(names, results):
+        parts.append(
+            json.dumps(name).encode() + b':{"status":' + str(status_code).encode()
+            + b',"headers":' + json.dumps(headers).encode() + b',"body":' + content + b'}'
+        )
+    return b'{"responses":{' + b','.join(parts) + b'}}'
+
+
+@api_view(['POST'])
+def batch(request, format=None):
+    """
+    Run several read-only API requests in one call; see batch.py for the format.
+    """
+    parts = parse_batch(request.data)
+    names = [name for name, _ in parts]
+    django_request = request._request
+
+    futures = [
+        executor.submit(contextvars.copy_context().run, dispatch_in_worker, django_request, url)
+        for _, url in parts[1:]
+    ]
+    results = [dispatch(django_request, parts[0][1])]
+    results += [future.result() for future in futures]
+    return HttpResponse(encode_batch(names, results), content_type='application/json')
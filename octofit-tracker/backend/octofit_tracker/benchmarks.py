@@ -0,0 +1,203 @@
+"""
+Helpers for the endpoint and concurrency benchmark commands.
+
+``MongoCommandCounter`` is a pymongo command listener, so it counts every
+round trip whether it came through djongo or a native pymongo read path.
+Results are plain dicts so runs can be saved as JSON and compared later.
+"""
+import asyncio
+import contextlib
+import math
+import threading
+from io import StringIO
+
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import setup_test_environment, teardown_test_environment
+from django.urls import reverse
+from pymongo import monitoring
+
+from .indexes import ensure_indexes
+from .mongo import get_db
+
+# Seeded activity count for each named scale; every user gets ten activities
+SCALES = {'1k': 1000, '100k': 100000, '1m': 1000000}
+ACTIVITIES_PER_USER = 10
+
+# Columns the frontend tables show; lists are also measured with ?fields= set
+# to these to show what sparse fieldsets save
+SPARSE_FIELDS = {
+    'activity': 'id,activity_type,duration,calories,date',
+    'workout': 'id,title,difficulty,duration',
+}
+
+
+class MongoCommandCounter(monitoring.CommandListener):
+    """Counts MongoDB commands started by any client created after registration."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.count = 0
+
+    def started(self, event):
+        with self._lock:
+            self.count += 1
+
+    def succeeded(self, event):
+        pass
+
+    def failed(self, event):
+        pass
+
+
+@contextlib.contextmanager
+def benchmark_database():
+    """Run the block against a throwaway test database."""
+    setup_test_environment()
+    old_name = connection.creation.create_test_db(verbosity=0, autoclobber=True, serialize=False)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=0)
+        teardown_test_environment()
+
+
+def seed(scale, seed=1, workers=None):
+    """Fill the current database for a named scale; returns (users, activities)."""
+    activities = SCALES[scale]
+    users = max(activities // ACTIVITIES_PER_USER, 1)
+    options = {'users': users, 'teams': max(users // 100, 2), 'activities_per_user': ACTIVITIES_PER_USER, 'seed': seed}
+    if workers:
+        options['workers'] = workers
+    call_command('populate_db', stdout=StringIO(), **options)
+    ensure_indexes(get_db())
+    return users, activities
+
+
+def percentile(sorted_values, pct):
+    """Nearest-rank percentile of an ascending list."""
+    if not sorted_values:
+        return None
+    index = max(math.ceil(pct / 100 * len(sorted_values)) - 1, 0)
+    return sorted_values[index]
+
+
+def summarize(latencies, elapsed, response_bytes, queries=None, mongo_commands=None):
+    """Reduce per-request measurements (seconds) to the reported metrics."""
+    ordered = sorted(latencies)
+    requests = len(ordered)
+    metrics = {
+        'requests': requests,
+        'p50_ms': percentile(ordered, 50) * 1000,
+        'p95_ms': percentile(ordered, 95) * 1000,
+        'p99_ms': percentile(ordered, 99) * 1000,
+        'mean_ms': sum(ordered) / requests * 1000,
+        'max_ms': ordered[-1] * 1000,
+        'throughput_rps': requests / elapsed if elapsed else None,
+        'response_bytes': response_bytes,
+    }
+    if queries is not None:
+        metrics['queries_per_request'] = queries / requests
+    if mongo_commands is not None:
+        metrics['mongo_commands_per_request'] = mongo_commands / requests
+    return metrics
+
+
+async def asgi_get(application, path, query_string=''):
+    """Send one GET through an ASGI application in-process; returns (status, body)."""
+    scope = {
+        'type': 'http',
+        'asgi': {'version': '3.0'},
+        'http_version': '1.1',
+        'method': 'GET',
+        'scheme': 'http',
+        'path': path,
+        'raw_path': path.encode(),
+        'query_string': query_string.encode(),
+        'root_path': '',
+        'headers': [(b'host', b'localhost'), (b'accept', b'application/json')],
+        'client': ('127.0.0.1', 50000),
+        'server': ('localhost', 80),
+    }
+    request_sent = False
+    disconnected = asyncio.Event()
+    response = {'status': None, 'body': []}
+
+    async def receive():
+        nonlocal request_sent
+        if not request_sent:
+            request_sent = True
+            return {'type': 'http.request', 'body': b'', 'more_body': False}
+        await disconnected.wait()
+        return {'type': 'http.disconnect'}
+
+    async def send(message):
+        if message['type'] == 'http.response.start':
+            response['status'] = message['status']
+        elif message['type'] == 'http.response.body':
+            response['body'].append(message.get('body', b''))
+            if not message.get('more_body'):
+                disconnected.set()
+
+    await application(scope, receive, send)
+    return response['status'], b''.join(response['body'])
+
+
+def endpoints(router, samples, counts, full_list_limit):
+    """
+    Return (name, url) for every GET route the router exposes.
+
+    ``samples`` maps a basename to an object id for detail routes (and
+    ``'user_id'`` to a user id for routes that take one); ``counts`` maps a
+    basename to its collection size. Lists are always measured on their first
+    cursor page and, while the collection has at most ``full_list_limit``
+    rows, unpaginated as well; lists in ``SPARSE_FIELDS`` are repeated with
+    ``?fields=``.
+    """
+    routes = [('api-root', reverse('api-root'))]
+    for prefix, viewset, basename in router.registry:
+        list_url = reverse(f'{basename}-list')
+        queries = ['page_size=50']
+        if counts.get(basename, 0) <= full_list_limit:
+            queries.append('')
+        if basename in SPARSE_FIELDS:
+            queries += [f'{query}&fields={SPARSE_FIELDS[basename]}'.lstrip('&') for query in queries]
+        for query in queries:
+            suffix = f'?{query}' if query else ''
+            routes.append((f'{basename}-list{suffix}', f'{list_url}{suffix}'))
+        if samples.get(basename):
+            routes.append((f'{basename}-detail', reverse(f'{basename}-detail', args=[samples[basename]])))
+        for extra in viewset.get_extra_actions():
+            if 'get' not in extra.mapping or extra.detail:
+                continue
+            name = f'{basename}-{extra.url_name}'
+            if '(?P<user_id>' in extra.url_path:
+                if samples.get('user_id'):
+                    routes.append((name, reverse(name, kwargs={'user_id': samples['user_id']})))
+            elif extra.url_name == 'export':
+                # A full export streams every row; measure one user's slice
+                routes.append((name, f'{reverse(name)}?user_id={samples.get("user_id", "")}'))
+            else:
+                routes.append((name, reverse(name)))
+    return routes
+
+
+def regressions(results, baseline, threshold):
+    """
+    Compare a run against a saved baseline.
+
+    An endpoint regresses when its p95 latency or its Mongo commands per
+    request grew by more than ``threshold`` (0.2 means 20%). Returns
+    human-readable descriptions.
+    """
+    found = []
+    for scale, run in results['scales'].items():
+        previous = baseline.get('scales', {}).get(scale, {}).get('endpoints', {})
+        for name, metrics in run['endpoints'].items():
+            before = previous.get(name)
+            if not before:
+                continue
+            for key in ('p95_ms', 'mongo_commands_per_request'):
+                if before[key] and metrics[key] > before[key] * (1 + threshold):
+                    found.append(f'{scale} {name}: {key} {before[key]:.2f} -> {metrics[key]:.2f}')
+    return found
@@ -0,0 +1,74 @@
+"""
+Conditional GET support for the read endpoints.
+
+The validators are derived from per-collection version counters, so a
+request carrying a matching ``If-None-Match`` or a recent enough
+``If-Modified-Since`` gets a 304 before the query or serializer runs.
+"""
+import datetime
+import hashlib
+
+from django.utils.http import http_date, parse_http_date_safe
+from rest_framework import status
+from rest_framework.response import Response
+
+from . import versions
+
+
+class ConditionalGetMixin:
+    """
+    Adds strong ETag and Last-Modified headers to list and retrieve.
+
+    ``version_collections`` names every collection the response depends on.
+    """
+    version_collections = ()
+
+    def fingerprint_parts(self, request):
+        """Extra values, besides versions, that the response depends on."""
+        return []
+
+    def validators(self, request, state):
+        fingerprint = '|'.join([
+            request.get_full_path(),
+            request.accepted_media_type or '',
+            *(f'{name}:{version}' for name, (version, _) in sorted(state.items())),
+            *self.fingerprint_parts(request),
+        ])
+        etag = '"%s"' % hashlib.sha1(fingerprint.encode()).hexdigest()
+        modified = [updated_at for _, updated_at in state.values() if updated_at is not None]
+        last_modified = max(modified).replace(tzinfo=datetime.timezone.utc) if modified else None
+        return etag, last_modified
+
+    @staticmethod
+    def not_modified(request, etag, last_modified):
+        if_none_match = request.META.get('HTTP_IF_NONE_MATCH')
+        if if_none_match is not None:
+            tags = [tag.strip() for tag in if_none_match.split(',')]
+            return '*' in tags or etag in tags
+        if_modified_since = parse_http_date_safe(request.META.get('HTTP_IF_MODIFIED_SINCE', ''))
+        if if_modified_since is not None and last_modified is not None:
+            return int(last_modified.timestamp()) <= if_modified_since
+        return False
+
+    def fresh_response(self, request, etag, handler, *args, **kwargs):
+        """Produce the full response when the client's copy is stale."""
+        return handler(request, *args, **kwargs)
+
+    def conditional(self, request, handler, *args, **kwargs):
+        state = versions.current(self.version_collections)
+        etag, last_modified = self.validators(request, state)
+        if self.not_modified(request, etag, last_modified):
+            response = Response(status=status.HTTP_304_NOT_MODIFIED)
+        else:
+            response = self.fresh_response(request, etag, handler, *args, **kwargs)
+        if response.status_code in (status.HTTP_200_OK, status.HTTP_304_NOT_MODIFIED):
+            response['ETag'] = etag
+            if last_modified is not None:
+                response['Last-Modified'] = http_date(last_modified.timestamp())
+        return response
+
+    def list(self, request, *args, **kwargs):
+        return self.conditional(request, super().list, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.conditional(request, super().retrieve, *args, **kwargs)
@@ -0,0 +1,8 @@
+"""
+djongo with a translation cache.
+
+Set ``ENGINE`` to ``'octofit_tracker.db_backend'`` to use it. It behaves
+exactly like ``djongo`` except that parsed SQL statements are kept in a
+bounded LRU cache keyed by the parameterized SQL, so the same query shape
+is only run through sqlparse once per process. See ``translation_cache``.
+"""
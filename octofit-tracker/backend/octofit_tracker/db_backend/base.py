@@ -0,0 +1,10 @@
+from djongo.base import DatabaseWrapper as DjongoDatabaseWrapper
+
+from .cursor import Cursor
+
+
+class DatabaseWrapper(DjongoDatabaseWrapper):
+    """djongo's wrapper with cursors that reuse parsed SQL."""
+
+    def create_cursor(self, name=None):
+        return Cursor(self.client_connection, self.connection, self.djongo_connection)
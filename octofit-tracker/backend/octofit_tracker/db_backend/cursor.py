@@ -0,0 +1,50 @@
+from djongo import __version__ as djongo_version
+from djongo.cursor import Cursor as DjongoCursor
+from djongo.database import DatabaseError
+from djongo.exceptions import MigrationError, SQLDecodeError
+from djongo.sql2mongo.query import Query
+
+from .translation_cache import translation_cache
+
+
+class CachingQuery(Query):
+    """djongo's Query, taking its parsed statement from the translation cache."""
+
+    def parse(self):
+        statement = translation_cache.parse(self._sql)
+        if len(statement) > 1:
+            raise SQLDecodeError(self._sql)
+
+        statement = statement[0]
+        sm_type = statement.get_type()
+        try:
+            handler = self.FUNC_MAP[sm_type]
+        except KeyError:
+            raise SQLDecodeError(f'{sm_type} command not implemented for SQL {self._sql}')
+
+        # Same error wrapping as Query.parse
+        try:
+            return handler(self, statement)
+        except MigrationError:
+            raise
+        except SQLDecodeError as e:
+            e.err_sql = self._sql
+            e.params = self._params
+            e.version = djongo_version
+            raise e
+        except Exception as e:
+            raise SQLDecodeError(err_sql=self._sql, params=self._params, version=djongo_version) from e
+
+
+class Cursor(DjongoCursor):
+
+    def execute(self, sql, params=None):
+        try:
+            self.result = CachingQuery(
+                self.client_conn,
+                self.db_conn,
+                self.connection_properties,
+                sql,
+                params)
+        except Exception as e:
+            raise DatabaseError() from e
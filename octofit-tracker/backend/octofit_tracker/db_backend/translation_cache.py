@@ -0,0 +1,101 @@
+"""
+LRU cache of parsed SQL statements.
+
+djongo translates every statement in two steps: sqlparse builds a token
+tree from the SQL, then djongo's converters walk the tree and build the
+``find`` arguments or aggregation pipeline, reading parameter values as
+they go. Parsing is most of the cost (about 85% for the list queries) and
+depends only on the SQL template, which Django keeps separate from the
+parameters, so the tree is cached here and shared by every thread. The
+converters do not modify the tree.
+
+The converters are still run per statement: they bake parameter values
+into the Mongo query (a ``LIKE`` pattern becomes a regex, for example),
+so their output cannot be reused with different parameters.
+
+The cache holds ``OCTOFIT_SQL_CACHE_SIZE`` templates. Templates longer than
+``MAX_CACHED_SQL_LENGTH`` (bulk inserts, whose SQL grows with the row
+count) are parsed without being cached.
+"""
+import threading
+import time
+from collections import OrderedDict
+
+from django.conf import settings
+from sqlparse import parse as sqlparse
+
+# Longer SQL is parsed every time rather than cached
+MAX_CACHED_SQL_LENGTH = 10000
+
+
+class TranslationCache:
+    """Thread-safe LRU map from SQL template to its parsed statement."""
+
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._metrics = {}
+        self.reset_stats()
+
+    def parse(self, sql):
+        """
+        Return the parsed statements for ``sql``.
+
+        Each entry remembers how long its parse took, so hits can report the
+        parsing time they saved.
+        """
+        with self._lock:
+            entry = self._entries.get(sql)
+            if entry is not None:
+                self._entries.move_to_end(sql)
+                self._metrics['hits'] += 1
+                self._metrics['parse_seconds_saved'] += entry[1]
+                return entry[0]
+
+        started = time.perf_counter()
+        statements = sqlparse(sql)
+        elapsed = time.perf_counter() - started
+
+        with self._lock:
+            self._metrics['misses'] += 1
+            self._metrics['parse_seconds'] += elapsed
+            if len(sql) > MAX_CACHED_SQL_LENGTH or self.max_size <= 0:
+                self._metrics['uncacheable'] += 1
+                return statements
+            self._entries[sql] = (statements, elapsed)
+            self._entries.move_to_end(sql)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self._metrics['evictions'] += 1
+        return statements
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self):
+        with self._lock:
+            metrics = dict(self._metrics)
+            size = len(self._entries)
+        lookups = metrics['hits'] + metrics['misses']
+        return {
+            'hits': metrics['hits'],
+            'misses': metrics['misses'],
+            'hit_rate': metrics['hits'] / lookups if lookups else 0.0,
+            'evictions': metrics['evictions'],
+            'uncacheable': metrics['uncacheable'],
+            'size': size,
+            'max_size': self.max_size,
+            'parse_ms': metrics['parse_seconds'] * 1000,
+            'parse_ms_saved': metrics['parse_seconds_saved'] * 1000,
+        }
+
+    def reset_stats(self):
+        with self._lock:
+            self._metrics.update(
+                hits=0, misses=0, evictions=0, uncacheable=0, parse_seconds=0.0, parse_seconds_saved=0.0,
+            )
+
+
+translation_cache = TranslationCache(getattr(settings, 'OCTOFIT_SQL_CACHE_SIZE', 512))
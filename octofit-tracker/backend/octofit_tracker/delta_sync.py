@@ -0,0 +1,155 @@
+"""
+Delta sync: ``?since=<cursor>`` on the user, team, activity and workout lists.
+
+Every list response carries an ``X-Sync-Cursor`` header. Passing it back as
+``?since=`` returns only what changed after it::
+
+    {"changes": [...], "deleted": ["<id>", ...], "cursor": "...", "more": false}
+
+``changes`` holds the current form of every document created or updated
+since the cursor (matched on the indexed ``updated_at``), in the list's
+normal serialization, and ``deleted`` the ids recorded in the tombstone
+collection. Follow ``cursor`` while ``more`` is true; at most
+``OCTOFIT_SYNC_MAX_CHANGES`` documents are returned per response. Other list
+parameters except ``fields`` are ignored.
+
+A write stamps ``updated_at`` before it commits, so a change can become
+visible after a reader has moved past its timestamp. Cursors therefore
+point ``OCTOFIT_SYNC_OVERLAP_SECONDS`` into the past and a refresh repeats
+the changes of that window; clients apply changes as upserts, so repeats
+are harmless. Tombstones expire after ``OCTOFIT_TOMBSTONE_TTL_DAYS``; an
+older cursor gets a 410 and the client downloads the full list again.
+
+A team's ``member_count`` depends on the users collection, so creating,
+moving or deleting a user through the API also touches the teams involved.
+Documents written before ``updated_at`` existed never appear as changes.
+"""
+import base64
+import datetime
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.conf import settings
+from django.utils import timezone
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+from .mongo import get_db, to_mongo_datetime, to_object_id
+
+TOMBSTONE_COLLECTION = 'tombstones'
+
+CURSOR_HEADER = 'X-Sync-Cursor'
+
+
+class CursorExpired(APIException):
+    status_code = status.HTTP_410_GONE
+    default_detail = 'This sync cursor is older than the deletion log; download the full list again.'
+    default_code = 'sync_cursor_expired'
+
+
+def encode_cursor(moment, last_id=None):
+    """Encode a position in (updated_at, _id) order as an opaque string."""
+    milliseconds = int(moment.replace(tzinfo=datetime.timezone.utc).timestamp() * 1000)
+    raw = f'{milliseconds}:{last_id}' if last_id is not None else str(milliseconds)
+    return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Return (naive UTC datetime, ObjectId or None) or raise ValidationError."""
+    try:
+        raw = base64.urlsafe_b64decode(cursor + '=' * (-len(cursor) % 4)).decode()
+        milliseconds, _, last_id = raw.partition(':')
+        moment = datetime.datetime.fromtimestamp(int(milliseconds) / 1000, datetime.timezone.utc)
+        return moment.replace(tzinfo=None), ObjectId(last_id) if last_id else None
+    except (ValueError, UnicodeDecodeError, InvalidId, OverflowError):
+        raise ValidationError({'since': 'Not a valid sync cursor.'})
+
+
+def safe_point():
+    """The newest moment before which every write is assumed committed."""
+    overlap = getattr(settings, 'OCTOFIT_SYNC_OVERLAP_SECONDS', 5)
+    return to_mongo_datetime(timezone.now()) - datetime.timedelta(seconds=overlap)
+
+
+def record_deletions(collection, object_ids):
+    """Log deleted document ids for clients that sync ``collection``."""
+    if not object_ids:
+        return
+    now = to_mongo_datetime(timezone.now())
+    get_db()[TOMBSTONE_COLLECTION].insert_many([
+        {'collection': collection, 'object_id': str(object_id), 'deleted_at': now}
+        for object_id in object_ids
+    ])
+
+
+def touch(collection, object_ids):
+    """Set ``updated_at`` on documents whose serialized form changed without a write of their own."""
+    object_ids = [object_id for object_id in map(to_object_id, object_ids) if object_id is not None]
+    if object_ids:
+        get_db()[collection].update_many(
+            {'_id': {'$in': object_ids}}, {'$set': {'updated_at': to_mongo_datetime(timezone.now())}}
+        )
+
+
+def after(moment, last_id, field):
+    """Filter for documents strictly after a cursor position."""
+    if last_id is None:
+        return {field: {'$gte': moment}}
+    return {'$or': [{field: {'$gt': moment}}, {field: moment, '_id': {'$gt': last_id}}]}
+
+
+class DeltaSyncMixin:
+    """
+    Adds ``?since=`` to list and records tombstones on destroy.
+
+    Changes are read with NativeReadMixin's reader and annotations whatever
+    ``OCTOFIT_READ_PATH`` is, so the view must also use that mixin.
+    """
+
+    def list(self, request, *args, **kwargs):
+        point = safe_point()
+        if 'since' not in request.query_params:
+            response = super().list(request, *args, **kwargs)
+            if response.status_code == status.HTTP_200_OK:
+                response[CURSOR_HEADER] = encode_cursor(point)
+            return response
+        return self.delta_list(request, point)
+
+    def delta_list(self, request, point):
+        moment, last_id = decode_cursor(request.query_params['since'])
+        ttl = datetime.timedelta(days=getattr(settings, 'OCTOFIT_TOMBSTONE_TTL_DAYS', 30))
+        if moment < to_mongo_datetime(timezone.now()) - ttl:
+            raise CursorExpired()
+
+        limit = getattr(settings, 'OCTOFIT_SYNC_MAX_CHANGES', 1000)
+        collection = self.native_collection()
+        reader = self.native_reader(self.sparse_fields())
+        # Later changes wait for the next refresh, so no cursor passes the safe point
+        query = {'$and': [after(moment, last_id, 'updated_at'), {'updated_at': {'$lt': point}}]}
+        documents = list(
+            collection.find(query, dict(reader.projection, updated_at=1))
+            .sort([('updated_at', 1), ('_id', 1)])
+            .limit(limit + 1)
+        )
+        cursor = encode_cursor(point)
+        more = len(documents) > limit
+        if more:
+            documents = documents[:limit]
+            cursor = encode_cursor(documents[-1]['updated_at'], documents[-1]['_id'])
+
+        records = [reader.to_representation(document) for document in documents]
+        self.native_annotate(records, documents)
+        # Tombstones are not paged: each page lists every deletion since its own position
+        deleted = [
+            tombstone['object_id']
+            for tombstone in get_db()[TOMBSTONE_COLLECTION].find(
+                {'collection': collection.name, 'deleted_at': {'$gte': moment}}, {'object_id': 1}
+            ).sort('deleted_at', 1)
+        ]
+        return Response({'changes': records, 'deleted': deleted, 'cursor': cursor, 'more': more})
+
+    def perform_destroy(self, instance):
+        object_id = instance.pk
+        super().perform_destroy(instance)
+        record_deletions(self.queryset.model._meta.db_table, [object_id])
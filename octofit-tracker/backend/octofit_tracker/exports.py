@@ -0,0 +1,60 @@
+"""
+Streaming activity exports.
+
+Rows are produced by a generator over a server-side Mongo cursor, so memory
+use stays flat however many activities are exported. The field set and value
+formats come from ActivitySerializer so exports match the API output.
+"""
+import csv
+import json
+
+from .filters import activity_lookups, mongo_query
+from .models import Activity
+from .mongo import get_db
+from .native_reads import NativeReader
+from .serializers import ActivitySerializer
+
+EXPORT_BATCH_SIZE = 1000
+
+
+def activity_export_filter(params):
+    """Build a Mongo filter from the activity list filters (see filters.py)."""
+    return mongo_query(activity_lookups(params))
+
+
+def activity_records(query):
+    """Yield activities matching ``query`` as dicts shaped like ActivitySerializer output."""
+    reader = NativeReader(ActivitySerializer)
+    cursor = (
+        get_db()[Activity._meta.db_table]
+        .find(query, reader.projection)
+        .sort('date', 1)
+        .batch_size(EXPORT_BATCH_SIZE)
+    )
+    try:
+        for document in cursor:
+            yield reader.to_representation(document)
+    finally:
+        cursor.close()
+
+
+def ndjson_stream(records):
+    """Encode records as newline-delimited JSON."""
+    for record in records:
+        yield json.dumps(record) + '\n'
+
+
+class _Echo:
+    """File-like object that hands back what csv.writer writes to it."""
+
+    def write(self, value):
+        return value
+
+
+def csv_stream(records):
+    """Encode records as CSV with a header row taken from ActivitySerializer."""
+    names = list(ActivitySerializer.Meta.fields)
+    writer = csv.DictWriter(_Echo(), fieldnames=names)
+    yield writer.writerow(dict(zip(names, names)))
+    for record in records:
+        yield writer.writerow(record)
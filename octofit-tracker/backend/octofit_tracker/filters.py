@@ -0,0 +1,109 @@
+"""
+Activity filters shared by the list endpoint and the export.
+
+Supported query parameters: ``user_id``, ``team_id``, ``activity_type``,
+``date_after`` (inclusive) and ``date_before`` (exclusive). Activities only
+carry ``user_id``, so a team is resolved to its members' ids with one query
+on the indexed ``users.team_id`` and filtered with ``user_id__in``. Every
+combination, sorted by date either way, is served by the
+``(user_id, date, _id)``, ``(activity_type, date, _id)`` or ``(date, _id)``
+index.
+"""
+import datetime
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import BaseFilterBackend, OrderingFilter
+
+from .models import User
+from .mongo import get_db, to_mongo_datetime
+
+
+def parse_date_param(params, name):
+    """Parse an ISO date or datetime query parameter into an aware datetime."""
+    raw = params.get(name)
+    if not raw:
+        return None
+    value = parse_datetime(raw)
+    if value is None:
+        day = parse_date(raw)
+        if day is None:
+            raise ValidationError({name: f'"{raw}" is not a valid ISO date or datetime.'})
+        value = datetime.datetime.combine(day, datetime.time.min)
+    if timezone.is_naive(value):
+        value = timezone.make_aware(value)
+    return value
+
+
+def team_member_ids(team_id):
+    """Return the ids of every user in a team."""
+    members = get_db()[User._meta.db_table].find({'team_id': team_id}, {'_id': 1})
+    return [str(member['_id']) for member in members]
+
+
+def activity_lookups(params, team_members=team_member_ids):
+    """
+    Translate the activity filter parameters into ORM lookups.
+
+    ``team_members`` maps a team id to its members' user ids.
+    """
+    lookups = {}
+    user_ids = [params['user_id']] if params.get('user_id') else None
+    if params.get('team_id'):
+        members = team_members(params['team_id'])
+        user_ids = [uid for uid in user_ids if uid in members] if user_ids is not None else members
+    if user_ids is not None:
+        if len(user_ids) == 1:
+            lookups['user_id'] = user_ids[0]
+        else:
+            lookups['user_id__in'] = user_ids
+    if params.get('activity_type'):
+        lookups['activity_type'] = params['activity_type']
+    date_after = parse_date_param(params, 'date_after')
+    date_before = parse_date_param(params, 'date_before')
+    if date_after:
+        lookups['date__gte'] = date_after
+    if date_before:
+        lookups['date__lt'] = date_before
+    return lookups
+
+
+def mongo_query(lookups):
+    """Translate ``activity_lookups`` output into a Mongo filter."""
+    operators = {'in': '$in', 'gte': '$gte', 'lt': '$lt'}
+    query = {}
+    for lookup, value in lookups.items():
+        field, _, operator = lookup.partition('__')
+        if isinstance(value, datetime.datetime):
+            value = to_mongo_datetime(value)
+        if operator:
+            query.setdefault(field, {})[operators[operator]] = value
+        else:
+            query[field] = value
+    return query
+
+
+class ActivityFilterBackend(BaseFilterBackend):
+    """Applies the activity filters to a queryset."""
+
+    def filter_queryset(self, request, queryset, view):
+        return queryset.filter(**activity_lookups(request.query_params))
+
+
+class IndexedOrderingFilter(OrderingFilter):
+    """
+    ``?ordering=`` limited to the view's ``ordering_fields``.
+
+    For activities that is ``date`` or ``-date`` only, the orderings an index
+    serves under every filter. Other fields are ignored and the default
+    ordering applies. The primary
+    key is appended in the direction of the first key so that cursor
+    pagination has a unique, stable order.
+    """
+
+    def get_ordering(self, request, queryset, view):
+        ordering = list(super().get_ordering(request, queryset, view) or [])
+        if ordering and ordering[-1].lstrip('-') != '_id':
+            ordering.append('-_id' if ordering[0].startswith('-') else '_id')
+        return ordering
@@ -0,0 +1,144 @@
+"""
+Declared MongoDB indexes and helpers to create and inspect them.
+
+Model indexes come from each model's ``Meta.indexes`` and unique fields.
+Collections without a Django model declare theirs in ``RAW_COLLECTION_INDEXES``.
+"""
+import datetime
+
+from django.apps import apps
+from django.conf import settings
+from pymongo import ASCENDING, DESCENDING
+
+from .delta_sync import TOMBSTONE_COLLECTION
+from .rollups import ROLLUP_COLLECTION
+from .windows import WINDOW_COLLECTION
+
+RAW_COLLECTION_INDEXES = {
+    ROLLUP_COLLECTION: [
+        {'keys': [('scope', ASCENDING), ('owner_id', ASCENDING), ('period', ASCENDING), ('bucket', ASCENDING)],
+         'name': 'rollup_bucket_uniq', 'unique': True},
+        {'keys': [('scope', ASCENDING), ('owner_id', ASCENDING), ('period', ASCENDING), ('start', ASCENDING)],
+         'name': 'rollup_series_idx'},
+    ],
+    WINDOW_COLLECTION: [
+        {'keys': [('window', ASCENDING), ('user_id', ASCENDING)], 'name': 'window_user_uniq', 'unique': True},
+        {'keys': [('window', ASCENDING), ('total_calories', DESCENDING)], 'name': 'window_ranking_idx'},
+    ],
+    TOMBSTONE_COLLECTION: [
+        {'keys': [('collection', ASCENDING), ('deleted_at', ASCENDING)], 'name': 'tombstone_sync_idx'},
+        # TTL index: Mongo deletes tombstones once they are older than a sync cursor may be
+        {'keys': [('deleted_at', ASCENDING)], 'name': 'tombstone_ttl_idx',
+         'expire_after_seconds': int(getattr(settings, 'OCTOFIT_TOMBSTONE_TTL_DAYS', 30) * 86400)},
+    ],
+}
+
+_SINCE = datetime.datetime(2000, 1, 1)
+
+# Newest first with the primary key as tie-break, as the activity list sorts
+_ACTIVITY_ORDER = [('date', DESCENDING), ('_id', DESCENDING)]
+
+# (collection, filter, sort) shapes of the hot API queries, exactly as the
+# views issue them, used by ``ensure_indexes --check`` to prove each one is
+# served by an index.
+HOT_QUERIES = [
+    ('activities', {}, _ACTIVITY_ORDER),
+    ('activities', {'user_id': ''}, _ACTIVITY_ORDER),
+    ('activities', {'user_id': {'$in': ['', '']}}, _ACTIVITY_ORDER),
+    ('activities', {'activity_type': ''}, _ACTIVITY_ORDER),
+    ('users', {'team_id': ''}, None),
+    ('leaderboard', {}, [('rank', ASCENDING)]),
+    ('leaderboard', {}, [('rank', ASCENDING), ('_id', ASCENDING)]),
+    ('leaderboard', {'user_id': ''}, None),
+    ('leaderboard', {'total_calories': {'$gt': 0}}, None),
+    (ROLLUP_COLLECTION, {'scope': 'user', 'owner_id': '', 'period': 'day'}, [('start', ASCENDING)]),
+    (WINDOW_COLLECTION, {'window': '7d'}, [('total_calories', DESCENDING)]),
+    *(
+        (collection, {'updated_at': {'$gte': _SINCE}}, [('updated_at', ASCENDING), ('_id', ASCENDING)])
+        for collection in ('users', 'teams', 'activities', 'workouts')
+    ),
+    (TOMBSTONE_COLLECTION, {'collection': 'activities', 'deleted_at': {'$gte': _SINCE}}, [('deleted_at', ASCENDING)]),
+]
+
+
+def _field_keys(model, names):
+    keys = []
+    for name in names:
+        direction = DESCENDING if name.startswith('-') else ASCENDING
+        keys.append((model._meta.get_field(name.lstrip('-')).column, direction))
+    return keys
+
+
+def declared_indexes():
+    """Return {collection: [index spec, ...]} for every declared index."""
+    declared = {}
+    for model in apps.get_app_config('octofit_tracker').get_models():
+        specs = declared.setdefault(model._meta.db_table, [])
+        for index in model._meta.indexes:
+            specs.append({'keys': _field_keys(model, index.fields), 'name': index.name})
+        for field in model._meta.fields:
+            if field.unique and not field.primary_key:
+                specs.append({'keys': [(field.column, ASCENDING)], 'name': f'{field.column}_1', 'unique': True})
+    for collection, specs in RAW_COLLECTION_INDEXES.items():
+        declared.setdefault(collection, []).extend(specs)
+    return declared
+
+
+def ensure_indexes(db):
+    """
+    Create every declared index that is missing.
+
+    Indexes are matched on their key pattern, so ones created earlier under
+    another name are left alone. Returns (collection, name, created) tuples.
+    """
+    results = []
+    for collection, specs in declared_indexes().items():
+        existing = {tuple(info['key']) for info in db[collection].index_information().values()}
+        for spec in specs:
+            keys = [(field, int(direction)) for field, direction in spec['keys']]
+            if tuple(keys) in existing:
+                results.append((collection, spec['name'], False))
+                continue
+            options = {'expireAfterSeconds': spec['expire_after_seconds']} if 'expire_after_seconds' in spec else {}
+            db[collection].create_index(keys, name=spec['name'], unique=spec.get('unique', False), **options)
+            results.append((collection, spec['name'], True))
+    return results
+
+
+def index_report(db, collection):
+    """Return [(name, size_bytes, accesses)] for the indexes of a collection."""
+    sizes = db.command('collStats', collection).get('indexSizes', {})
+    usage = {
+        stat['name']: stat['accesses']['ops']
+        for stat in db[collection].aggregate([{'$indexStats': {}}])
+    }
+    return [(name, size, usage.get(name, 0)) for name, size in sorted(sizes.items())]
+
+
+def plan_stages(plan):
+    """Yield every stage name in an explain() query plan."""
+    yield plan.get('stage')
+    for key in ('inputStage', 'outerStage', 'innerStage'):
+        if key in plan:
+            yield from plan_stages(plan[key])
+    for child in plan.get('inputStages', []):
+        yield from plan_stages(child)
+
+
+def uses_collection_scan(db, collection, query, sort=None):
+    """Return True when Mongo's winning plan for a query is a COLLSCAN."""
+    cursor = db[collection].find(query)
+    if sort:
+        cursor = cursor.sort(sort)
+    plan = cursor.explain()['queryPlanner']['winningPlan']
+    return 'COLLSCAN' in plan_stages(plan)
+
+
+def slow_collection_scans(db, slow_ms):
+    """Return profiled operations slower than ``slow_ms`` that scanned a collection."""
+    if 'system.profile' not in db.list_collection_names():
+        return []
+    return list(db['system.profile'].find(
+        {'planSummary': 'COLLSCAN', 'millis': {'$gte': slow_ms}},
+        {'ns': 1, 'op': 1, 'millis': 1, 'command': 1, 'ts': 1},
+    ).sort('millis', DESCENDING).limit(50))
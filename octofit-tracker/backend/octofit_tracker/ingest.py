@@ -0,0 +1,55 @@
+"""Batched activity writes that bypass per-row ORM inserts."""
+from django.utils import timezone
+from pymongo.errors import BulkWriteError
+
+from .models import Activity
+from .mongo import get_db, to_mongo_datetime
+from .signals import SNAPSHOT_FIELDS, activities_changed
+from .versions import bump
+
+BULK_CHUNK_SIZE = 500
+
+
+def activity_document(validated_data, now):
+    """Build the Mongo document djongo would store for a validated activity."""
+    document = dict(validated_data)
+    document['date'] = to_mongo_datetime(document['date'])
+    document['created_at'] = now
+    document['updated_at'] = now
+    return document
+
+
+def insert_activities(records, chunk_size=BULK_CHUNK_SIZE):
+    """
+    Insert validated activities with chunked ``insert_many`` calls.
+
+    ``records`` is a list of (index, validated_data) pairs. Returns a pair of
+    lists: (index, document) for each inserted activity, and per-record error
+    dicts for documents Mongo rejected. Derived data is updated once for the
+    whole batch.
+    """
+    collection = get_db()[Activity._meta.db_table]
+    now = to_mongo_datetime(timezone.now())
+    created, errors = [], []
+
+    for start in range(0, len(records), chunk_size):
+        chunk = records[start:start + chunk_size]
+        documents = [activity_document(data, now) for _, data in chunk]
+        failed = {}
+        try:
+            collection.insert_many(documents, ordered=False)
+        except BulkWriteError as exc:
+            failed = {error['index']: error['errmsg'] for error in exc.details['writeErrors']}
+        for position, ((index, _), document) in enumerate(zip(chunk, documents)):
+            if position in failed:
+                errors.append({'index': index, 'errors': {'non_field_errors': [failed[position]]}})
+            else:
+                created.append((index, document))
+
+    if created:
+        bump(Activity._meta.db_table)
+        activities_changed.send(
+            sender=Activity,
+            added=[{field: document[field] for field in SNAPSHOT_FIELDS} for _, document in created],
+        )
+    return created, errors
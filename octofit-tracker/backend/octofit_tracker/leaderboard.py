@@ -0,0 +1,174 @@
+"""
+Incremental maintenance of the leaderboard collection.
+
+Activity writes are reduced to per-user deltas which are applied with atomic
+``$inc`` updates. Ranks use competition ranking (a user's rank is one more
+than the number of users with strictly more calories), so a change in one
+user's total only shifts the rows whose total lies between the old and the
+new value.
+
+``rebuild`` recomputes the whole collection inside Mongo and swaps it in.
+"""
+import time
+from collections import defaultdict
+
+from django.dispatch import receiver
+from django.utils import timezone
+from pymongo import ReturnDocument
+
+from .indexes import declared_indexes
+from .models import Activity, Leaderboard, User
+from .mongo import get_db, team_ids_for_users, to_mongo_datetime
+from .signals import activities_changed, leaderboard_changed
+from .versions import bump
+
+
+def activity_deltas(added=(), removed=()):
+    """Reduce activity snapshots to {user_id: (calories, activities)} deltas."""
+    deltas = defaultdict(lambda: [0, 0])
+    for activity in added:
+        delta = deltas[activity['user_id']]
+        delta[0] += activity['calories']
+        delta[1] += 1
+    for activity in removed:
+        delta = deltas[activity['user_id']]
+        delta[0] -= activity['calories']
+        delta[1] -= 1
+    return {user_id: tuple(delta) for user_id, delta in deltas.items() if delta != [0, 0]}
+
+
+def apply_deltas(deltas):
+    """
+    Apply per-user deltas to the leaderboard and re-rank the affected rows.
+
+    Returns a list of (user_id, total_calories, total_activities, rank) for
+    every user whose totals changed.
+    """
+    if not deltas:
+        return []
+
+    board = get_db()[Leaderboard._meta.db_table]
+    teams = team_ids_for_users(deltas)
+    now = to_mongo_datetime(timezone.now())
+    changes = []
+
+    for user_id, (calories, activities) in deltas.items():
+        row = board.find_one_and_update(
+            {'user_id': user_id},
+            {
+                '$inc': {'total_calories': calories, 'total_activities': activities},
+                '$set': {'updated_at': now},
+                '$setOnInsert': {'team_id': teams.get(user_id)},
+            },
+            upsert=True,
+            return_document=ReturnDocument.AFTER,
+        )
+        new_total = row['total_calories']
+        old_total = new_total - calories
+        _shift_ranks(board, user_id, old_total, new_total)
+
+        rank = board.count_documents({'total_calories': {'$gt': new_total}}) + 1
+        board.update_one({'_id': row['_id']}, {'$set': {'rank': rank}})
+        changes.append((user_id, new_total, row['total_activities'], rank))
+
+    bump(Leaderboard._meta.db_table)
+    leaderboard_changed.send(sender=Leaderboard, changes=changes)
+    return changes
+
+
+def _shift_ranks(board, user_id, old_total, new_total):
+    """Move the rows that one user overtook (or fell behind) by one place."""
+    if new_total > old_total:
+        low, high, step = old_total, new_total, 1
+    elif new_total < old_total:
+        low, high, step = new_total, old_total, -1
+    else:
+        return
+    board.update_many(
+        {'user_id': {'$ne': user_id}, 'total_calories': {'$gte': low, '$lt': high}},
+        {'$inc': {'rank': step}},
+    )
+
+
+def rebuild_pipeline(staging, now):
+    """
+    Aggregation over the activities collection that writes a ranked board to ``staging``.
+
+    Users without activities are unioned in with zero totals, team ids are
+    joined from the users collection and ``$rank`` gives competition ranks.
+    ``$setWindowFields`` needs MongoDB 5.0 or later.
+    """
+    return [
+        {'$group': {
+            '_id': '$user_id',
+            'total_calories': {'$sum': '$calories'},
+            'total_activities': {'$sum': 1},
+        }},
+        {'$unionWith': {'coll': User._meta.db_table, 'pipeline': [
+            {'$project': {'_id': {'$toString': '$_id'}, 'total_calories': {'$literal': 0},
+                          'total_activities': {'$literal': 0}}},
+        ]}},
+        {'$group': {
+            '_id': '$_id',
+            'total_calories': {'$sum': '$total_calories'},
+            'total_activities': {'$sum': '$total_activities'},
+        }},
+        {'$addFields': {'user_oid': {'$convert': {
+            'input': '$_id', 'to': 'objectId', 'onError': None, 'onNull': None,
+        }}}},
+        {'$lookup': {'from': User._meta.db_table, 'localField': 'user_oid', 'foreignField': '_id', 'as': 'user'}},
+        {'$setWindowFields': {'sortBy': {'total_calories': -1}, 'output': {'rank': {'$rank': {}}}}},
+        {'$project': {
+            '_id': 0,
+            'user_id': '$_id',
+            'team_id': {'$ifNull': [{'$arrayElemAt': ['$user.team_id', 0]}, None]},
+            'total_calories': 1,
+            'total_activities': 1,
+            'rank': 1,
+            'updated_at': {'$literal': now},
+        }},
+        {'$merge': {'into': staging, 'whenMatched': 'replace', 'whenNotMatched': 'insert'}},
+    ]
+
+
+def rebuild(timings=None):
+    """
+    Recompute the leaderboard from the activities collection inside Mongo.
+
+    The ranked board is merged into a staging collection, the declared
+    indexes are built on it, and it is renamed over the live collection with
+    ``dropTarget`` so readers never see a partial board. Activity writes that
+    land while the pipeline runs are only in the old collection and are lost,
+    so run it when writes are quiet. ``timings``, if given, receives the
+    seconds spent in each phase. Returns the number of rows written.
+    """
+    timings = {} if timings is None else timings
+    db = get_db()
+    table = Leaderboard._meta.db_table
+    staging = f'{table}_staging'
+
+    started = time.perf_counter()
+    db.drop_collection(staging)
+    db.create_collection(staging)
+    db[Activity._meta.db_table].aggregate(
+        rebuild_pipeline(staging, to_mongo_datetime(timezone.now())), allowDiskUse=True
+    )
+    timings['aggregate'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    for spec in declared_indexes().get(table, []):
+        db[staging].create_index(spec['keys'], name=spec['name'], unique=spec.get('unique', False))
+    timings['index'] = time.perf_counter() - started
+
+    started = time.perf_counter()
+    db[staging].rename(table, dropTarget=True)
+    bump(table)
+    leaderboard_changed.send(sender=Leaderboard, changes=None)
+    timings['swap'] = time.perf_counter() - started
+    return db[table].estimated_document_count()
+
+
+@receiver(activities_changed)
+def update_leaderboard(sender, added=(), removed=(), **kwargs):
+    """Keep leaderboard totals and ranks in step with activity writes."""
+    apply_deltas(activity_deltas(added, removed))
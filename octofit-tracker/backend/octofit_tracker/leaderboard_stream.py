@@ -0,0 +1,276 @@
+"""
+Server-Sent Events stream of leaderboard changes.
+
+``GET /api/leaderboard/stream/`` is served by ``leaderboard_events``, a plain
+ASGI application that ``asgi.py`` routes to ahead of Django, so an idle
+subscriber costs one coroutine on the event loop rather than a worker
+thread. It is only available under an ASGI server.
+
+Events:
+
+* ``ranks``: ``{"version": n, "changes": [{"user_id", "total_calories",
+  "total_activities", "rank"}, ...]}`` with the current row of every user
+  whose totals changed. Moving one user also moves the users they overtook
+  by one place; clients holding the whole board can re-rank it from the
+  totals.
+* ``reset``: the board was rebuilt, or this subscriber fell too far behind;
+  fetch ``/api/leaderboard/`` again.
+
+Changes come from the ``leaderboard_changed`` signal in this process or, when
+the database is a replica set or sharded cluster, from a change stream on
+the leaderboard collection, which also sees writes made by other processes
+(``OCTOFIT_STREAM_SOURCE``). Changes that arrive within
+``OCTOFIT_STREAM_INTERVAL`` seconds of the last message are merged, keeping
+the latest row per user, so a burst of writes produces at most one message
+per interval. One background thread does the merging and fans each encoded
+message out to every subscriber's event loop.
+"""
+import asyncio
+import json
+import logging
+import threading
+import time
+
+from django.conf import settings
+from django.dispatch import receiver
+from pymongo.errors import PyMongoError
+
+from .models import Leaderboard
+from .mongo import get_shared_db
+from .signals import leaderboard_changed
+
+try:
+    import orjson
+except ImportError:  # pragma: no cover - orjson is optional
+    orjson = None
+
+logger = logging.getLogger(__name__)
+
+STREAM_PATH = '/api/leaderboard/stream/'
+
+# Fields sent for each changed row
+ROW_FIELDS = ('user_id', 'total_calories', 'total_activities', 'rank')
+
+
+def sse_message(event, data=None, event_id=None):
+    """Encode one Server-Sent Events message."""
+    lines = []
+    if event_id is not None:
+        lines.append(f'id: {event_id}')
+    lines.append(f'event: {event}')
+    data = data if data is not None else {}
+    payload = orjson.dumps(data).decode() if orjson is not None else json.dumps(data, separators=(',', ':'))
+    lines.append('data: ' + payload)
+    return ('\n'.join(lines) + '\n\n').encode()
+
+
+RESET_MESSAGE = sse_message('reset')
+
+
+def change_streams_available(db):
+    """Change streams need a replica set or a mongos."""
+    hello = db.client.admin.command('isMaster')
+    return 'setName' in hello or hello.get('msg') == 'isdbgrid'
+
+
+class Subscription:
+    """One client's queue of encoded messages, living on its event loop."""
+
+    def __init__(self, loop, max_size):
+        self.loop = loop
+        self.queue = asyncio.Queue(max_size)
+
+    def deliver(self, message):
+        """Queue a message; a subscriber that fell behind is told to start over."""
+        try:
+            self.queue.put_nowait(message)
+        except asyncio.QueueFull:
+            while not self.queue.empty():
+                self.queue.get_nowait()
+            self.queue.put_nowait(RESET_MESSAGE)
+
+
+class LeaderboardBroker:
+    """In-process pub/sub that coalesces leaderboard changes per interval."""
+
+    def __init__(self, interval, queue_size, source):
+        self.interval = interval
+        self.queue_size = queue_size
+        self.source = source
+        # 'local' until a change stream is confirmed to be available
+        self.mode = 'local'
+        self._condition = threading.Condition()
+        self._subscribers = set()
+        self._pending = {}
+        self._reset = False
+        self._version = 0
+        self._thread = None
+
+    def subscribe(self, loop):
+        subscription = Subscription(loop, self.queue_size)
+        with self._condition:
+            self._subscribers.add(subscription)
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name='octofit-leaderboard-stream', daemon=True)
+                self._thread.start()
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._condition:
+            self._subscribers.discard(subscription)
+
+    def publish(self, rows, source='local'):
+        """Queue changed rows (dicts with ``ROW_FIELDS``) for the next message."""
+        with self._condition:
+            if source != self.mode or not self._subscribers:
+                return
+            for row in rows:
+                self._pending[row['user_id']] = row
+            self._condition.notify_all()
+
+    def publish_reset(self, source='local'):
+        with self._condition:
+            if source != self.mode or not self._subscribers:
+                return
+            self._reset = True
+            self._pending.clear()
+            self._condition.notify_all()
+
+    def stats(self):
+        with self._condition:
+            return {
+                'subscribers': len(self._subscribers),
+                'mode': self.mode,
+                'version': self._version,
+                'pending': len(self._pending),
+            }
+
+    def _run(self):
+        self._start_change_stream()
+        last_sent = float('-inf')
+        while True:
+            with self._condition:
+                self._condition.wait_for(lambda: self._pending or self._reset)
+            # Let the interval since the last message pass; anything published
+            # meanwhile is merged into the same message
+            delay = last_sent + self.interval - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            with self._condition:
+                rows, reset = list(self._pending.values()), self._reset
+                self._pending.clear()
+                self._reset = False
+                self._version += 1
+                version = self._version
+                subscribers = list(self._subscribers)
+            if reset:
+                message = RESET_MESSAGE
+            else:
+                message = sse_message('ranks', {'version': version, 'changes': rows}, event_id=version)
+            for subscription in subscribers:
+                try:
+                    subscription.loop.call_soon_threadsafe(subscription.deliver, message)
+                except RuntimeError:
+                    # The subscriber's event loop has been closed
+                    self.unsubscribe(subscription)
+            last_sent = time.monotonic()
+
+    def _start_change_stream(self):
+        if self.source == 'local':
+            return
+        try:
+            available = change_streams_available(get_shared_db())
+        except PyMongoError:
+            logger.exception('Leaderboard stream: could not check for change stream support')
+            available = False
+        if not available:
+            if self.source == 'change_stream':
+                logger.warning('Leaderboard stream: change streams are unavailable, using in-process changes')
+            return
+        self.mode = 'change_stream'
+        threading.Thread(target=self._watch, name='octofit-leaderboard-watch', daemon=True).start()
+
+    def _watch(self):
+        board = get_shared_db()[Leaderboard._meta.db_table]
+        resume_token = None
+        while True:
+            try:
+                with board.watch(full_document='updateLookup', resume_after=resume_token) as stream:
+                    for event in stream:
+                        resume_token = event['_id']
+                        document = event.get('fullDocument')
+                        if event['operationType'] in ('insert', 'update', 'replace') and document:
+                            self.publish([{field: document.get(field) for field in ROW_FIELDS}], 'change_stream')
+                        else:
+                            # drop, rename or invalidate: the board was replaced
+                            self.publish_reset('change_stream')
+                            if event['operationType'] == 'invalidate':
+                                resume_token = None
+            except PyMongoError:
+                logger.exception('Leaderboard stream: change stream failed, reopening')
+                resume_token = None
+                time.sleep(1)
+
+
+broker = LeaderboardBroker(
+    interval=getattr(settings, 'OCTOFIT_STREAM_INTERVAL', 1.0),
+    queue_size=getattr(settings, 'OCTOFIT_STREAM_QUEUE_SIZE', 16),
+    source=getattr(settings, 'OCTOFIT_STREAM_SOURCE', 'auto'),
+)
+
+
+@receiver(leaderboard_changed)
+def publish_leaderboard_changes(sender, changes=None, **kwargs):
+    """Feed rows changed by this process to the stream."""
+    if changes is None:
+        broker.publish_reset()
+        return
+    broker.publish([dict(zip(ROW_FIELDS, change)) for change in changes])
+
+
+async def _wait_for_disconnect(receive):
+    while (await receive())['type'] != 'http.disconnect':
+        pass
+
+
+async def leaderboard_events(scope, receive, send):
+    """ASGI application streaming leaderboard changes to one client."""
+    if scope['method'] != 'GET':
+        await send({'type': 'http.response.start', 'status': 405, 'headers': [(b'allow', b'GET')]})
+        await send({'type': 'http.response.body', 'body': b''})
+        return
+
+    headers = [
+        (b'content-type', b'text/event-stream'),
+        (b'cache-control', b'no-cache'),
+        # Stops nginx from buffering the stream
+        (b'x-accel-buffering', b'no'),
+    ]
+    if getattr(settings, 'CORS_ALLOW_ALL_ORIGINS', False):
+        headers.append((b'access-control-allow-origin', b'*'))
+
+    keepalive = getattr(settings, 'OCTOFIT_STREAM_KEEPALIVE', 15.0)
+    subscription = broker.subscribe(asyncio.get_running_loop())
+    disconnected = asyncio.ensure_future(_wait_for_disconnect(receive))
+    try:
+        await send({'type': 'http.response.start', 'status': 200, 'headers': headers})
+        await send({'type': 'http.response.body', 'body': b'retry: 5000\n\n', 'more_body': True})
+        while True:
+            message = asyncio.ensure_future(subscription.queue.get())
+            done, _ = await asyncio.wait(
+                {message, disconnected}, timeout=keepalive, return_when=asyncio.FIRST_COMPLETED
+            )
+            if disconnected in done:
+                message.cancel()
+                break
+            if message in done:
+                body = message.result()
+            else:
+                message.cancel()
+                body = b': keepalive\n\n'
+            await send({'type': 'http.response.body', 'body': body, 'more_body': True})
+    except OSError:
+        pass
+    finally:
+        broker.unsubscribe(subscription)
+        disconnected.cancel()
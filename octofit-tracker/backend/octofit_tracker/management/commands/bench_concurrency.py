@@ -0,0 +1,132 @@
+import asyncio
+import json
+import time
+
+from django.conf import settings
+from django.core.asgi import get_asgi_application
+from django.core.management.base import BaseCommand, CommandError
+from django.test.utils import override_settings
+from django.urls import reverse
+from django.utils import timezone
+
+from octofit_tracker import async_views, benchmarks
+from octofit_tracker.models import User
+from octofit_tracker.mongo import get_db
+
+# (name, sync route, async route); activities are measured for one user
+ENDPOINTS = [
+    ('leaderboard', 'leaderboard-list', 'async-leaderboard-list'),
+    ('activities', 'activity-list', 'async-activity-list'),
+    ('workouts', 'workout-list', 'async-workout-list'),
+]
+
+
+class Command(BaseCommand):
+    help = (
+        'Compare requests/second of the sync viewsets and the /api/async/ endpoints at several '
+        'concurrency levels, driving the ASGI application in-process against a throwaway test database'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scale', default='1k', choices=list(benchmarks.SCALES),
+            help='Seeded activity count (default: 1k)',
+        )
+        parser.add_argument(
+            '--concurrency', nargs='+', type=int, default=[1, 50, 500],
+            help='Concurrent clients to run with (default: 1 50 500)',
+        )
+        parser.add_argument(
+            '--requests', type=int, default=1000,
+            help='Measured requests per endpoint, path and concurrency level (default 1000)',
+        )
+        parser.add_argument(
+            '--endpoints', nargs='+', default=[name for name, _, _ in ENDPOINTS],
+            choices=[name for name, _, _ in ENDPOINTS], help='Endpoints to measure (default: all)',
+        )
+        parser.add_argument('--cache', action='store_true', help='Keep the response cache on for the sync path')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the seeded data (default 1)')
+        parser.add_argument('--workers', type=int, help='populate_db worker processes')
+        parser.add_argument(
+            '--output', default='bench_concurrency.json', help='Where to save the results (default bench_concurrency.json)',
+        )
+
+    def handle(self, *args, **options):
+        if async_views.AsyncIOMotorClient is None:
+            raise CommandError('motor is not installed; the async endpoints are unavailable')
+
+        overrides = {}
+        if not options['cache']:
+            # The async endpoints have no response cache; compare like with like
+            overrides = {
+                'CACHES': dict(settings.CACHES, bench_concurrency={
+                    'BACKEND': 'django.core.cache.backends.dummy.DummyCache',
+                }),
+                'OCTOFIT_RESPONSE_CACHE_ALIAS': 'bench_concurrency',
+            }
+
+        results = {
+            'created': timezone.now().isoformat(),
+            'scale': options['scale'],
+            'response_cache': options['cache'],
+            'requests': options['requests'],
+            'endpoints': {},
+        }
+        with benchmarks.benchmark_database(), override_settings(**overrides):
+            self.stdout.write(self.style.WARNING(f'Seeding {options["scale"]}...'))
+            users, activities = benchmarks.seed(options['scale'], options['seed'], options['workers'])
+            results.update(users=users, activities=activities)
+            sample = get_db()[User._meta.db_table].find_one({}, {'_id': 1})
+            query = {'activities': f'user_id={sample["_id"]}'}
+            routes = [
+                (name, reverse(sync_route), reverse(async_route), query.get(name, ''))
+                for name, sync_route, async_route in ENDPOINTS if name in options['endpoints']
+            ]
+            asyncio.run(self.run_all(get_asgi_application(), routes, options, results['endpoints']))
+
+        with open(options['output'], 'w') as handle:
+            json.dump(results, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Saved results to {options["output"]}'))
+
+    async def run_all(self, application, routes, options, measured):
+        # One event loop for the whole run, so the motor client and its pool are reused
+        self.stdout.write(
+            f'{"endpoint":<14} {"path":<6} {"clients":>7} {"req/s":>9} {"p50":>8} {"p95":>8} {"p99":>8}'
+        )
+        for name, sync_path, async_path, query in routes:
+            measured[name] = {}
+            for mode, path in (('sync', sync_path), ('async', async_path)):
+                measured[name][mode] = {}
+                # Warm up connections, the motor pool and any lazily built state
+                await self.drive(application, path, query, 1, 3)
+                for concurrency in options['concurrency']:
+                    latencies, elapsed, size = await self.drive(
+                        application, path, query, concurrency, options['requests']
+                    )
+                    metrics = benchmarks.summarize(latencies, elapsed, size)
+                    measured[name][mode][str(concurrency)] = dict(metrics, url=f'{path}?{query}'.rstrip('?'))
+                    self.stdout.write(
+                        f'{name:<14} {mode:<6} {concurrency:>7} {metrics["throughput_rps"]:9.1f} '
+                        f'{metrics["p50_ms"]:8.2f} {metrics["p95_ms"]:8.2f} {metrics["p99_ms"]:8.2f}'
+                    )
+
+    @staticmethod
+    async def drive(application, path, query, concurrency, total):
+        """Issue ``total`` GETs from ``concurrency`` clients; returns (latencies, elapsed, bytes)."""
+        remaining = iter(range(total))
+        latencies = []
+        size = 0
+
+        async def client():
+            nonlocal size
+            for _ in remaining:
+                started = time.perf_counter()
+                status, body = await benchmarks.asgi_get(application, path, query)
+                latencies.append(time.perf_counter() - started)
+                if status != 200:
+                    raise CommandError(f'{path}?{query} returned {status}')
+                size = len(body)
+
+        started = time.perf_counter()
+        await asyncio.gather(*(client() for _ in range(min(concurrency, total))))
+        return latencies, time.perf_counter() - started, size
@@ -0,0 +1,69 @@
+import datetime
+import random
+import time
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+from rest_framework.renderers import JSONRenderer
+
+from octofit_tracker.models import Activity
+from octofit_tracker.renderers import ORJSONRenderer
+from octofit_tracker.serializers import ActivitySerializer, FastActivitySerializer
+
+
+class Command(BaseCommand):
+    help = 'Measure activity list serialization and rendering throughput in rows/second (no database needed)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, default=100000, help='Number of in-memory activities (default: 100000)')
+        parser.add_argument('--repeat', type=int, default=3, help='Runs per variant; the best is reported (default: 3)')
+
+    def handle(self, *args, **options):
+        rows = options['rows']
+        activities = self.build_activities(rows)
+        variants = [
+            ('ModelSerializer + JSONRenderer', ActivitySerializer, JSONRenderer()),
+            ('FastReadSerializer + JSONRenderer', FastActivitySerializer, JSONRenderer()),
+            ('FastReadSerializer + ORJSONRenderer', FastActivitySerializer, ORJSONRenderer()),
+        ]
+
+        self.stdout.write(self.style.WARNING(f'Serializing {rows} activities...'))
+        baseline = None
+        for label, serializer_class, renderer in variants:
+            serialize, render = self.best_of(options['repeat'], activities, serializer_class, renderer)
+            throughput = rows / (serialize + render)
+            baseline = baseline or throughput
+            self.stdout.write(
+                f'{label:<38} serialize {serialize:6.2f}s  render {render:6.2f}s  '
+                f'{throughput:10,.0f} rows/s  ({throughput / baseline:.1f}x)'
+            )
+
+    def build_activities(self, rows):
+        now = timezone.now()
+        activities = []
+        for _ in range(rows):
+            activity = Activity(
+                user_id=str(ObjectId()),
+                activity_type=random.choice(['Running', 'Cycling', 'Swimming', 'Yoga']),
+                duration=random.randint(20, 90),
+                calories=random.randint(100, 900),
+                date=now - datetime.timedelta(days=random.randint(0, 30)),
+                created_at=now,
+            )
+            activity._id = ObjectId()
+            activities.append(activity)
+        return activities
+
+    def best_of(self, repeat, activities, serializer_class, renderer):
+        best = None
+        for _ in range(repeat):
+            started = time.perf_counter()
+            data = serializer_class(activities, many=True).data
+            serialized = time.perf_counter()
+            renderer.render(data)
+            rendered = time.perf_counter()
+            timing = (serialized - started, rendered - serialized)
+            if best is None or sum(timing) < sum(best):
+                best = timing
+        return best
@@ -0,0 +1,70 @@
+import time
+
+from bson import ObjectId
+from django.core.management.base import BaseCommand
+from django.db import connection
+from django.utils import timezone
+from djongo.sql2mongo.query import Query
+
+from octofit_tracker.db_backend.cursor import CachingQuery
+from octofit_tracker.db_backend.translation_cache import translation_cache
+from octofit_tracker.models import Activity, Leaderboard, Team, User, Workout
+
+
+class Command(BaseCommand):
+    help = (
+        'Measure SQL-to-Mongo translation time per statement with and without the translation cache '
+        '(SELECTs are only translated, so no MongoDB server is needed)'
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--iterations', type=int, default=500, help='Translations per shape and variant (default: 500)')
+
+    def handle(self, *args, **options):
+        connection.ensure_connection()
+        iterations = options['iterations']
+        translation_cache.clear()
+        translation_cache.reset_stats()
+
+        self.stdout.write(f'{"statement":<30} {"djongo us":>10} {"cached us":>10} {"saved us":>9} {"speedup":>8}')
+        shapes = self.shapes()
+        total_plain = total_cached = 0.0
+        for label, queryset in shapes:
+            sql, params = queryset.query.get_compiler(connection.alias).as_sql()
+            plain = self.time(Query, sql, params, iterations)
+            cached = self.time(CachingQuery, sql, params, iterations)
+            total_plain += plain
+            total_cached += cached
+            self.stdout.write(
+                f'{label:<30} {plain * 1e6:10.0f} {cached * 1e6:10.0f} {(plain - cached) * 1e6:9.0f} '
+                f'{plain / cached:7.1f}x'
+            )
+
+        stats = translation_cache.stats()
+        self.stdout.write(self.style.SUCCESS(
+            f'Mean saved per statement: {(total_plain - total_cached) / len(shapes) * 1e6:.0f} us '
+            f'({total_plain / total_cached:.1f}x); cache hit rate {stats["hit_rate"]:.1%}'
+        ))
+
+    @staticmethod
+    def shapes():
+        """Statements the API issues most, with placeholder values."""
+        return [
+            ('users list', User.objects.order_by('_id')[:51]),
+            ('team members', User.objects.filter(team_id='team1').only('_id')),
+            ('activities by user', Activity.objects.filter(user_id='user1').order_by('-date', '-_id')[:51]),
+            ('activities by type and date', Activity.objects.filter(
+                activity_type='running', date__gte=timezone.now()).order_by('-date', '-_id')[:51]),
+            ('leaderboard by rank', Leaderboard.objects.order_by('rank', '_id')[:51]),
+            ('workout detail', Workout.objects.filter(_id=ObjectId())),
+            ('team name search', Team.objects.filter(name__icontains='blue')),
+        ]
+
+    @staticmethod
+    def time(query_class, sql, params, iterations):
+        """Mean seconds to translate one statement (the query is built, not run)."""
+        query_class(connection.client_connection, connection.connection, connection.djongo_connection, sql, params)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            query_class(connection.client_connection, connection.connection, connection.djongo_connection, sql, params)
+        return (time.perf_counter() - started) / iterations
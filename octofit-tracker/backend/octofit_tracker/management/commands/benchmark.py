@@ -0,0 +1,133 @@
+import json
+import time
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+from django.test import Client
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from pymongo import monitoring
+
+from octofit_tracker import benchmarks
+from octofit_tracker.db_backend.translation_cache import translation_cache
+from octofit_tracker.mongo import get_db
+from octofit_tracker.urls import router
+
+# Listeners only apply to clients created after registration, so register
+# before any connection is opened by this process.
+mongo_commands = benchmarks.MongoCommandCounter()
+monitoring.register(mongo_commands)
+
+
+class Command(BaseCommand):
+    help = 'Benchmark every API endpoint at fixed data scales in a throwaway test database'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--scales', nargs='+', default=['1k'], choices=list(benchmarks.SCALES),
+            help='Seeded activity counts to run at (default: 1k)',
+        )
+        parser.add_argument('--requests', type=int, default=50, help='Measured requests per endpoint (default 50)')
+        parser.add_argument('--warmup', type=int, default=3, help='Unmeasured requests per endpoint (default 3)')
+        parser.add_argument(
+            '--full-list-limit', type=int, default=10000,
+            help='Also measure unpaginated lists while a collection has at most this many rows (default 10000)',
+        )
+        parser.add_argument('--no-cache', action='store_true', help='Clear the response cache before every request')
+        parser.add_argument('--seed', type=int, default=1, help='Random seed for the seeded data (default 1)')
+        parser.add_argument('--workers', type=int, help='populate_db worker processes')
+        parser.add_argument('--output', default='benchmark.json', help='Where to save the results (default benchmark.json)')
+        parser.add_argument('--baseline', help='Earlier results file to compare against')
+        parser.add_argument(
+            '--threshold', type=float, default=0.2,
+            help='Allowed growth in p95 latency and Mongo commands per request over the baseline (default 0.2)',
+        )
+
+    def handle(self, *args, **options):
+        baseline = None
+        if options['baseline']:
+            with open(options['baseline']) as handle:
+                baseline = json.load(handle)
+
+        results = {
+            'created': timezone.now().isoformat(),
+            'read_path': getattr(settings, 'OCTOFIT_READ_PATH', 'orm'),
+            'response_cache': not options['no_cache'],
+            'requests_per_endpoint': options['requests'],
+            'scales': {},
+        }
+        with benchmarks.benchmark_database():
+            for scale in options['scales']:
+                results['scales'][scale] = self.run_scale(scale, options)
+
+        with open(options['output'], 'w') as handle:
+            json.dump(results, handle, indent=2)
+        self.stdout.write(self.style.SUCCESS(f'Saved results to {options["output"]}'))
+
+        if baseline is not None:
+            found = benchmarks.regressions(results, baseline, options['threshold'])
+            if found:
+                raise CommandError('Regressions against {}:\n  {}'.format(options['baseline'], '\n  '.join(found)))
+            self.stdout.write(self.style.SUCCESS(f'No regressions against {options["baseline"]}'))
+
+    def run_scale(self, scale, options):
+        self.stdout.write(self.style.WARNING(f'Seeding {scale}...'))
+        started = time.perf_counter()
+        users, activities = benchmarks.seed(scale, options['seed'], options['workers'])
+        seed_seconds = time.perf_counter() - started
+        db = get_db()
+
+        counts, samples = {}, {}
+        for _, viewset, basename in router.registry:
+            collection = db[viewset.queryset.model._meta.db_table]
+            counts[basename] = collection.estimated_document_count()
+            document = collection.find_one({}, {'_id': 1})
+            samples[basename] = document and str(document['_id'])
+        samples['user_id'] = samples['user']
+
+        client = Client()
+        cache = caches[settings.OCTOFIT_RESPONSE_CACHE_ALIAS]
+        measured = {}
+        self.stdout.write(
+            f'{"endpoint":<36} {"p50":>8} {"p95":>8} {"p99":>8} {"req/s":>8} {"queries":>8} {"mongo":>6} {"bytes":>10}'
+        )
+        for name, url in benchmarks.endpoints(router, samples, counts, options['full_list_limit']):
+            for _ in range(options['warmup']):
+                self.fetch(client, url, cache, options['no_cache'])
+            latencies, queries, commands, size = [], 0, 0, 0
+            translation_cache.reset_stats()
+            started = time.perf_counter()
+            for _ in range(options['requests']):
+                with CaptureQueriesContext(connection) as captured:
+                    commands_before = mongo_commands.count
+                    request_started = time.perf_counter()
+                    response = self.fetch(client, url, cache, options['no_cache'])
+                    # Streaming responses do their work while being consumed
+                    body = b''.join(response.streaming_content) if response.streaming else response.content
+                    latencies.append(time.perf_counter() - request_started)
+                    commands += mongo_commands.count - commands_before
+                queries += len(captured)
+                size = len(body)
+                if response.status_code >= 400:
+                    raise CommandError(f'{url} returned {response.status_code}')
+            metrics = benchmarks.summarize(latencies, time.perf_counter() - started, size, queries, commands)
+            sql_cache = translation_cache.stats()
+            measured[name] = dict(
+                metrics, url=url,
+                sql_cache_hit_rate=sql_cache['hit_rate'],
+                sql_parse_ms_saved_per_request=sql_cache['parse_ms_saved'] / options['requests'],
+            )
+            self.stdout.write(
+                f'{name:<36} {metrics["p50_ms"]:8.2f} {metrics["p95_ms"]:8.2f} {metrics["p99_ms"]:8.2f} '
+                f'{metrics["throughput_rps"]:8.1f} {metrics["queries_per_request"]:8.1f} '
+                f'{metrics["mongo_commands_per_request"]:6.1f} {metrics["response_bytes"]:10,}'
+            )
+        return {'activities': activities, 'users': users, 'seed_seconds': seed_seconds, 'endpoints': measured}
+
+    @staticmethod
+    def fetch(client, url, cache, no_cache):
+        if no_cache:
+            cache.clear()
+        return client.get(url, HTTP_ACCEPT='application/json')
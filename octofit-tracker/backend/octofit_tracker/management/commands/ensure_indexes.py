@@ -0,0 +1,69 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from octofit_tracker.indexes import (
+    HOT_QUERIES,
+    declared_indexes,
+    ensure_indexes,
+    index_report,
+    slow_collection_scans,
+    uses_collection_scan
+)
+from octofit_tracker.mongo import get_db
+
+
+class Command(BaseCommand):
+    help = 'Create missing MongoDB indexes and report index usage and size'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--check',
+            action='store_true',
+            help='Explain the hot queries and list profiled slow queries that scan a whole collection',
+        )
+        parser.add_argument(
+            '--slow-ms',
+            type=int,
+            default=100,
+            help='Profiler threshold in milliseconds used by --check (default: 100)',
+        )
+
+    def handle(self, *args, **options):
+        db = get_db()
+
+        if options['check']:
+            self.check_queries(db, options['slow_ms'])
+            return
+
+        self.stdout.write(self.style.WARNING('Ensuring indexes...'))
+        for collection, name, created in ensure_indexes(db):
+            if created:
+                self.stdout.write(self.style.SUCCESS(f'Created {collection}.{name}'))
+            else:
+                self.stdout.write(f'Exists  {collection}.{name}')
+
+        self.stdout.write(self.style.WARNING('\nIndex usage and size:'))
+        for collection in sorted(declared_indexes()):
+            for name, size, accesses in index_report(db, collection):
+                self.stdout.write(f'{collection}.{name}: {size / 1024:.1f} KiB, {accesses} accesses')
+
+    def check_queries(self, db, slow_ms):
+        failures = 0
+        self.stdout.write(self.style.WARNING('Explaining hot queries...'))
+        for collection, query, sort in HOT_QUERIES:
+            label = f'{collection} find({query}) sort({sort or []})'
+            if uses_collection_scan(db, collection, query, sort):
+                failures += 1
+                self.stdout.write(self.style.ERROR(f'COLLSCAN {label}'))
+            else:
+                self.stdout.write(self.style.SUCCESS(f'IXSCAN   {label}'))
+
+        slow = slow_collection_scans(db, slow_ms)
+        if slow:
+            self.stdout.write(self.style.WARNING(f'\nProfiled collection scans slower than {slow_ms} ms:'))
+            for op in slow:
+                failures += 1
+                self.stdout.write(self.style.ERROR(f"{op['millis']} ms {op['op']} {op['ns']}: {op.get('command')}"))
+
+        if failures:
+            raise CommandError(f'{failures} queries fall back to collection scans; run ensure_indexes')
+        self.stdout.write(self.style.SUCCESS('All hot queries use an index'))
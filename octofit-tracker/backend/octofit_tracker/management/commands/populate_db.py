@@ -1,149 +1,67 @@
-from django.core.management.base import BaseCommand
+from django.core.management.base import BaseCommand, CommandError
 from django.utils import timezone
 from octofit_tracker.models import User, Team, Activity, Leaderboard, Workout
+from octofit_tracker import leaderboard, rollups, synthetic, windows
+from octofit_tracker.mongo import client_settings, get_db, to_mongo_datetime
+from octofit_tracker.versions import bump
 from datetime import datetime, timedelta
+import multiprocessing
+import os
 import random
+import time
 
 
 class Command(BaseCommand):
     help = 'Populate the octofit_db database with test data'
 
-    def handle(self, *args, **kwargs):
-        self.stdout.write(self.style.WARNING('Clearing existing data...'))
-        
-        # Delete all existing data using Django ORM
-        User.objects.all().delete()
-        Team.objects.all().delete()
-        Activity.objects.all().delete()
-        Leaderboard.objects.all().delete()
-        Workout.objects.all().delete()
-        
-        self.stdout.write(self.style.SUCCESS('Existing data cleared'))
-        
-        # Create teams
-        self.stdout.write(self.style.WARNING('Creating teams...'))
-        team_marvel = Team.objects.create(
-            name='Team Marvel',
-            description='Earth\'s Mightiest Heroes',
-            created_at=timezone.now()
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, help='Generate this many synthetic users instead of the heroes')
+        parser.add_argument('--teams', type=int, default=10, help='Number of synthetic teams (default 10)')
+        parser.add_argument(
+            '--activities-per-user', type=int,
+            help='Activities per user (default 10 for synthetic users, 5-10 for heroes)',
         )
-        
-        team_dc = Team.objects.create(
-            name='Team DC',
-            description='Justice League Champions',
-            created_at=timezone.now()
+        parser.add_argument('--seed', type=int, help='Random seed for reproducible data')
+        parser.add_argument(
+            '--workers', type=int, default=os.cpu_count() or 1,
+            help='Worker processes generating synthetic data (default: CPU count)',
         )
+        parser.add_argument(
+            '--chunk-size', type=int, default=synthetic.INSERT_CHUNK_SIZE,
+            help=f'Documents per insert_many call (default {synthetic.INSERT_CHUNK_SIZE})',
+        )
+
+    def handle(self, *args, **options):
+        if options['users'] is not None and (options['users'] < 1 or options['teams'] < 1):
+            raise CommandError('--users and --teams must be positive')
+        if options['seed'] is not None:
+            random.seed(options['seed'])
+
+        self.stdout.write(self.style.WARNING('Clearing existing data...'))
         
-        self.stdout.write(self.style.SUCCESS(f'Created teams: {team_marvel.name}, {team_dc.name}'))
-        
-        # Create users (superheroes)
-        self.stdout.write(self.style.WARNING('Creating superhero users...'))
-        
-        marvel_heroes = [
-            {'name': 'Iron Man', 'email': 'tony.stark@marvel.com'},
-            {'name': 'Captain America', 'email': 'steve.rogers@marvel.com'},
-            {'name': 'Thor', 'email': 'thor.odinson@marvel.com'},
-            {'name': 'Black Widow', 'email': 'natasha.romanoff@marvel.com'},
-            {'name': 'Hulk', 'email': 'bruce.banner@marvel.com'},
-            {'name': 'Spider-Man', 'email': 'peter.parker@marvel.com'},
-        ]
-        
-        dc_heroes = [
-            {'name': 'Superman', 'email': 'clark.kent@dc.com'},
-            {'name': 'Batman', 'email': 'bruce.wayne@dc.com'},
-            {'name': 'Wonder Woman', 'email': 'diana.prince@dc.com'},
-            {'name': 'The Flash', 'email': 'barry.allen@dc.com'},
-            {'name': 'Aquaman', 'email': 'arthur.curry@dc.com'},
-            {'name': 'Green Lantern', 'email': 'hal.jordan@dc.com'},
-        ]
-        
-        marvel_users = []
-        for hero in marvel_heroes:
-            user = User.objects.create(
-                name=hero['name'],
-                email=hero['email'],
-                team_id=str(team_marvel._id),
-                created_at=timezone.now()
-            )
-            marvel_users.append(user)
-        
-        dc_users = []
-        for hero in dc_heroes:
-            user = User.objects.create(
-                name=hero['name'],
-                email=hero['email'],
-                team_id=str(team_dc._id),
-                created_at=timezone.now()
-            )
-            dc_users.append(user)
-        
-        all_users = marvel_users + dc_users
-        self.stdout.write(self.style.SUCCESS(f'Created {len(all_users)} superhero users'))
-        
-        # Create activities
-        self.stdout.write(self.style.WARNING('Creating activities...'))
+        # Raw deletes: the ORM would load and signal every row first
+        db = get_db()
+        for model in (User, Team, Activity, Leaderboard, Workout):
+            db[model._meta.db_table].delete_many({})
         
-        activity_types = [
-            {'type': 'Running', 'cal_per_min': 10},
-            {'type': 'Weightlifting', 'cal_per_min': 7},
-            {'type': 'Cycling', 'cal_per_min': 8},
-            {'type': 'Swimming', 'cal_per_min': 11},
-            {'type': 'Boxing', 'cal_per_min': 12},
-            {'type': 'Yoga', 'cal_per_min': 4},
-        ]
-        
-        activities_created = 0
-        for user in all_users:
-            # Create 5-10 random activities for each user
-            num_activities = random.randint(5, 10)
-            for i in range(num_activities):
-                activity_data = random.choice(activity_types)
-                duration = random.randint(20, 90)
-                calories = duration * activity_data['cal_per_min']
-                days_ago = random.randint(0, 30)
-                
-                Activity.objects.create(
-                    user_id=str(user._id),
-                    activity_type=activity_data['type'],
-                    duration=duration,
-                    calories=calories,
-                    date=timezone.now() - timedelta(days=days_ago),
-                    created_at=timezone.now()
-                )
-                activities_created += 1
+        self.stdout.write(self.style.SUCCESS('Existing data cleared'))
         
-        self.stdout.write(self.style.SUCCESS(f'Created {activities_created} activities'))
+        if options['users'] is None:
+            self.create_heroes(options['activities_per_user'])
+        else:
+            self.create_synthetic(options)
         
         # Create leaderboard entries
         self.stdout.write(self.style.WARNING('Creating leaderboard entries...'))
         
-        leaderboard_entries = []
-        for user in all_users:
-            # Calculate total calories and activities for this user
-            user_activities = Activity.objects.filter(user_id=str(user._id))
-            total_calories = sum(activity.calories for activity in user_activities)
-            total_activities = user_activities.count()
-            
-            leaderboard_entries.append({
-                'user': user,
-                'total_calories': total_calories,
-                'total_activities': total_activities
-            })
-        
-        # Sort by total calories to assign ranks
-        leaderboard_entries.sort(key=lambda x: x['total_calories'], reverse=True)
-        
-        for rank, entry in enumerate(leaderboard_entries, start=1):
-            Leaderboard.objects.create(
-                user_id=str(entry['user']._id),
-                team_id=entry['user'].team_id,
-                total_calories=entry['total_calories'],
-                total_activities=entry['total_activities'],
-                rank=rank,
-                updated_at=timezone.now()
-            )
+        leaderboard_count = leaderboard.rebuild()
         
-        self.stdout.write(self.style.SUCCESS(f'Created {len(leaderboard_entries)} leaderboard entries'))
+        self.stdout.write(self.style.SUCCESS(f'Created {leaderboard_count} leaderboard entries'))
+        
+        # Derived activity data is rebuilt rather than maintained during seeding
+        self.stdout.write(self.style.WARNING('Rebuilding activity rollups...'))
+        self.stdout.write(self.style.SUCCESS(f'Wrote {rollups.rebuild()} rollup buckets'))
+        windows.reset()
         
         # Create workouts
         self.stdout.write(self.style.WARNING('Creating workouts...'))
@@ -239,6 +157,9 @@ class Command(BaseCommand):
         
         self.stdout.write(self.style.SUCCESS(f'Created {len(workouts_data)} workout routines'))
         
+        # Invalidate ETags and cached responses for everything that was replaced
+        bump('users', 'teams', 'activities', 'leaderboard', 'workouts')
+
         # Summary
         self.stdout.write(self.style.SUCCESS('\n=== Database Population Complete ==='))
         self.stdout.write(self.style.SUCCESS(f'Teams: {Team.objects.count()}'))
@@ -246,3 +167,146 @@ class Command(BaseCommand):
         self.stdout.write(self.style.SUCCESS(f'Activities: {Activity.objects.count()}'))
         self.stdout.write(self.style.SUCCESS(f'Leaderboard Entries: {Leaderboard.objects.count()}'))
         self.stdout.write(self.style.SUCCESS(f'Workouts: {Workout.objects.count()}'))
+
+    def create_heroes(self, activities_per_user=None):
+        """Create the two hero teams, their members and a few activities each."""
+        # Create teams
+        self.stdout.write(self.style.WARNING('Creating teams...'))
+        team_marvel = Team.objects.create(
+            name='Team Marvel',
+            description='Earth\'s Mightiest Heroes',
+            created_at=timezone.now()
+        )
+        
+        team_dc = Team.objects.create(
+            name='Team DC',
+            description='Justice League Champions',
+            created_at=timezone.now()
+        )
+        
+        self.stdout.write(self.style.SUCCESS(f'Created teams: {team_marvel.name}, {team_dc.name}'))
+        
+        # Create users (superheroes)
+        self.stdout.write(self.style.WARNING('Creating superhero users...'))
+        
+        marvel_heroes = [
+            {'name': 'Iron Man', 'email': 'tony.stark@marvel.com'},
+            {'name': 'Captain America', 'email': 'steve.rogers@marvel.com'},
+            {'name': 'Thor', 'email': 'thor.odinson@marvel.com'},
+            {'name': 'Black Widow', 'email': 'natasha.romanoff@marvel.com'},
+            {'name': 'Hulk', 'email': 'bruce.banner@marvel.com'},
+            {'name': 'Spider-Man', 'email': 'peter.parker@marvel.com'},
+        ]
+        
+        dc_heroes = [
+            {'name': 'Superman', 'email': 'clark.kent@dc.com'},
+            {'name': 'Batman', 'email': 'bruce.wayne@dc.com'},
+            {'name': 'Wonder Woman', 'email': 'diana.prince@dc.com'},
+            {'name': 'The Flash', 'email': 'barry.allen@dc.com'},
+            {'name': 'Aquaman', 'email': 'arthur.curry@dc.com'},
+            {'name': 'Green Lantern', 'email': 'hal.jordan@dc.com'},
+        ]
+        
+        marvel_users = []
+        for hero in marvel_heroes:
+            user = User.objects.create(
+                name=hero['name'],
+                email=hero['email'],
+                team_id=str(team_marvel._id),
+                created_at=timezone.now()
+            )
+            marvel_users.append(user)
+        
+        dc_users = []
+        for hero in dc_heroes:
+            user = User.objects.create(
+                name=hero['name'],
+                email=hero['email'],
+                team_id=str(team_dc._id),
+                created_at=timezone.now()
+            )
+            dc_users.append(user)
+        
+        all_users = marvel_users + dc_users
+        self.stdout.write(self.style.SUCCESS(f'Created {len(all_users)} superhero users'))
+        
+        # Create activities
+        self.stdout.write(self.style.WARNING('Creating activities...'))
+        
+        activities_created = 0
+        for user in all_users:
+            # Create 5-10 random activities for each user
+            num_activities = activities_per_user or random.randint(5, 10)
+            for i in range(num_activities):
+                activity_data = random.choice(synthetic.ACTIVITY_TYPES)
+                duration = random.randint(20, 90)
+                calories = duration * activity_data['cal_per_min']
+                days_ago = random.randint(0, 30)
+                
+                Activity.objects.create(
+                    user_id=str(user._id),
+                    activity_type=activity_data['type'],
+                    duration=duration,
+                    calories=calories,
+                    date=timezone.now() - timedelta(days=days_ago),
+                    created_at=timezone.now()
+                )
+                activities_created += 1
+        
+        self.stdout.write(self.style.SUCCESS(f'Created {activities_created} activities'))
+
+    def create_synthetic(self, options):
+        """Bulk-insert generated teams, users and activities using worker processes."""
+        now = to_mongo_datetime(timezone.now())
+        self.stdout.write(self.style.WARNING(f'Creating {options["teams"]} synthetic teams...'))
+        teams = [
+            {'name': f'Team {index + 1}', 'description': f'Synthetic team {index + 1}',
+             'created_at': now, 'updated_at': now}
+            for index in range(options['teams'])
+        ]
+        get_db()[Team._meta.db_table].insert_many(teams)
+        
+        per_user = options['activities_per_user'] or 10
+        total_users = options['users']
+        total_activities = total_users * per_user
+        workers = max(1, options['workers'])
+        generator_options = {
+            'team_ids': [str(team['_id']) for team in teams],
+            'activities_per_user': per_user,
+            'now': now,
+            'seed': options['seed'],
+            'chunk_size': options['chunk_size'],
+        }
+        self.stdout.write(self.style.WARNING(
+            f'Creating {total_users:,} users and {total_activities:,} activities with {workers} workers...'
+        ))
+        
+        users_done = activities_done = 0
+        started = reported = time.perf_counter()
+        if workers == 1:
+            results = (synthetic.generate(get_db(), task, **generator_options) for task in synthetic.tasks(total_users))
+            pool = None
+        else:
+            params, name = client_settings()
+            pool = multiprocessing.Pool(workers, synthetic.init_worker, (params, name, generator_options))
+            results = pool.imap_unordered(synthetic.run_task, synthetic.tasks(total_users))
+        try:
+            for users, activities in results:
+                users_done += users
+                activities_done += activities
+                elapsed = time.perf_counter() - started
+                if elapsed - reported >= 1 or users_done == total_users:
+                    reported = elapsed
+                    self.stdout.write(
+                        f'  {users_done:,}/{total_users:,} users, {activities_done:,} activities '
+                        f'({activities_done / max(elapsed, 1e-9):,.0f} activities/s)'
+                    )
+        finally:
+            if pool is not None:
+                pool.close()
+                pool.join()
+        
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {users_done:,} users and {activities_done:,} activities in {elapsed:.1f}s'
+        ))
@@ -0,0 +1,51 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from octofit_tracker import leaderboard
+from octofit_tracker.models import Activity, Leaderboard, User
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the leaderboard inside MongoDB and swap it in atomically'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--compare', action='store_true',
+            help='Also time the per-user Python loop and check it ranks users the same way',
+        )
+
+    def handle(self, *args, **options):
+        self.stdout.write(self.style.WARNING('Rebuilding leaderboard...'))
+        timings = {}
+        started = time.perf_counter()
+        written = leaderboard.rebuild(timings)
+        elapsed = time.perf_counter() - started
+        for phase, seconds in timings.items():
+            self.stdout.write(f'  {phase:<10} {seconds:.3f}s')
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} leaderboard entries in {elapsed:.2f}s'))
+
+        if options['compare']:
+            started = time.perf_counter()
+            expected = self.python_ranks()
+            python_elapsed = time.perf_counter() - started
+            self.stdout.write(
+                f'Python loop: {python_elapsed:.2f}s ({python_elapsed / elapsed:.1f}x the pipeline)'
+            )
+            actual = {row.user_id: (row.total_calories, row.rank) for row in Leaderboard.objects.all()}
+            mismatched = [user_id for user_id, value in expected.items() if actual.get(user_id) != value]
+            if mismatched:
+                self.stdout.write(self.style.ERROR(f'{len(mismatched)} users differ, e.g. {mismatched[:5]}'))
+            else:
+                self.stdout.write(self.style.SUCCESS('Pipeline matches the Python loop'))
+
+    def python_ranks(self):
+        """The previous rebuild: one query per user, ranked in Python. Writes nothing."""
+        totals = {}
+        for user in User.objects.all():
+            user_activities = Activity.objects.filter(user_id=str(user._id))
+            totals[str(user._id)] = sum(activity.calories for activity in user_activities)
+        first_position = {}
+        for position, total in enumerate(sorted(totals.values(), reverse=True), start=1):
+            first_position.setdefault(total, position)
+        return {user_id: (total, first_position[total]) for user_id, total in totals.items()}
@@ -0,0 +1,16 @@
+import time
+
+from django.core.management.base import BaseCommand
+
+from octofit_tracker import rollups
+
+
+class Command(BaseCommand):
+    help = 'Rebuild the daily and weekly activity rollups from the activities collection'
+
+    def handle(self, *args, **kwargs):
+        self.stdout.write(self.style.WARNING('Rebuilding activity rollups...'))
+        started = time.perf_counter()
+        written = rollups.rebuild()
+        elapsed = time.perf_counter() - started
+        self.stdout.write(self.style.SUCCESS(f'Wrote {written} rollup buckets in {elapsed:.2f}s'))
@@ -7,9 +7,14 @@ class User(models.Model):
     email = models.EmailField(unique=True)
     team_id = models.CharField(max_length=100, null=True, blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'users'
+        indexes = [
+            models.Index(fields=['team_id']),
+            models.Index(fields=['updated_at', '_id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -20,9 +25,13 @@ class Team(models.Model):
     name = models.CharField(max_length=200)
     description = models.TextField(blank=True)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'teams'
+        indexes = [
+            models.Index(fields=['updated_at', '_id']),
+        ]
 
     def __str__(self):
         return self.name
@@ -36,9 +45,16 @@ class Activity(models.Model):
     calories = models.IntegerField()
     date = models.DateTimeField()
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'activities'
+        indexes = [
+            models.Index(fields=['user_id', 'date', '_id']),
+            models.Index(fields=['activity_type', 'date', '_id']),
+            models.Index(fields=['date', '_id']),
+            models.Index(fields=['updated_at', '_id']),
+        ]
 
     def __str__(self):
         return f"{self.activity_type} - {self.duration} min"
@@ -55,6 +71,11 @@ class Leaderboard(models.Model):
 
     class Meta:
         db_table = 'leaderboard'
+        indexes = [
+            models.Index(fields=['rank', '_id']),
+            models.Index(fields=['total_calories']),
+            models.Index(fields=['user_id']),
+        ]
 
     def __str__(self):
         return f"Rank {self.rank} - User {self.user_id}"
@@ -69,9 +90,13 @@ class Workout(models.Model):
     calories_estimate = models.IntegerField()
     exercises = models.JSONField(default=list)
     created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
 
     class Meta:
         db_table = 'workouts'
+        indexes = [
+            models.Index(fields=['updated_at', '_id']),
+        ]
 
     def __str__(self):
         return self.title
@@ -0,0 +1,68 @@
+"""Helpers for talking to MongoDB directly through djongo's pymongo connection."""
+import datetime
+import threading
+
+from bson import ObjectId
+from bson.errors import InvalidId
+from django.db import connection
+from django.utils import timezone
+from pymongo import MongoClient
+
+_shared_client = None
+_shared_client_lock = threading.Lock()
+
+
+def get_db():
+    """Return the pymongo Database behind the default djongo connection."""
+    connection.ensure_connection()
+    return connection.connection
+
+
+def client_settings():
+    """Return (MongoClient keyword arguments, database name) for the default connection."""
+    params = connection.get_connection_params()
+    name = params.pop('name')
+    params.pop('enforce_schema', None)
+    return params, name
+
+
+def get_shared_db():
+    """
+    Return the default database through one process-wide MongoClient.
+
+    Unlike djongo's per-thread connections, every thread shares the client's
+    connection pool, which suits read paths that skip the ORM.
+    """
+    global _shared_client
+    params, name = client_settings()
+    if _shared_client is None:
+        with _shared_client_lock:
+            if _shared_client is None:
+                _shared_client = MongoClient(**params)
+    return _shared_client[name]
+
+
+def to_object_id(value):
+    """Convert a string id to an ObjectId, returning None if it is not one."""
+    if isinstance(value, ObjectId):
+        return value
+    try:
+        return ObjectId(value)
+    except (InvalidId, TypeError):
+        return None
+
+
+def to_mongo_datetime(value):
+    """Convert a datetime to the naive UTC form djongo stores."""
+    if value is not None and timezone.is_aware(value):
+        value = timezone.make_naive(value, datetime.timezone.utc)
+    return value
+
+
+def team_ids_for_users(user_ids):
+    """Map each user id to its team_id using a single query."""
+    object_ids = [oid for oid in map(to_object_id, set(user_ids)) if oid is not None]
+    if not object_ids:
+        return {}
+    users = get_db()['users'].find({'_id': {'$in': object_ids}}, {'team_id': 1})
+    return {str(user['_id']): user.get('team_id') for user in users}
@@ -0,0 +1,115 @@
+"""
+Native pymongo read path for the list and retrieve actions.
+
+Documents are fetched with ``find`` and a projection through the shared
+MongoClient, skipping djongo's SQL translation, and are converted with the
+serializer's own field objects so the JSON matches the ORM path exactly.
+Enable it with ``OCTOFIT_READ_PATH = 'native'``.
+"""
+from types import SimpleNamespace
+
+from django.conf import settings
+from django.http import Http404
+from rest_framework import serializers
+from rest_framework.response import Response
+
+from .mongo import get_shared_db, to_object_id
+
+
+class NativeReader:
+    """Converts raw Mongo documents into a serializer's output shape."""
+
+    def __init__(self, serializer_class, names=None):
+        fields = serializer_class().fields
+        if names is not None:
+            fields = {name: field for name, field in fields.items() if name in names}
+        self.names = list(fields)
+        self.method_fields = [
+            name for name, field in fields.items()
+            if isinstance(field, serializers.SerializerMethodField) and name != 'id'
+        ]
+        self.converters = [
+            self._converter(name, field)
+            for name, field in fields.items()
+            if name != 'id' and name not in self.method_fields
+        ]
+        self.projection = {source: 1 for _, source, _ in self.converters}
+
+    @staticmethod
+    def _converter(name, field):
+        if isinstance(field, serializers.ModelField):
+            # ModelField reads the value off a model instance, so hand it a stand-in
+            attname = field.model_field.attname
+            return name, attname, lambda value: field.to_representation(SimpleNamespace(**{attname: value}))
+        return name, field.source, field.to_representation
+
+    def to_representation(self, document):
+        record = dict.fromkeys(self.names)
+        if 'id' in record:
+            record['id'] = str(document['_id'])
+        for name, source, to_representation in self.converters:
+            value = document.get(source)
+            record[name] = None if value is None else to_representation(value)
+        return record
+
+
+class NativeReadMixin:
+    """
+    Serves plain list and retrieve requests straight from pymongo.
+
+    Requests with other query parameters than ``native_query_params``
+    (pagination, filters) keep using the ORM. Views with extra method fields
+    fill them in ``native_annotate``.
+    """
+    native_sort = None
+    native_query_params = {'fields'}
+
+    def use_native_reads(self, request):
+        return (
+            getattr(settings, 'OCTOFIT_READ_PATH', 'orm') == 'native'
+            and set(request.query_params) <= self.native_query_params
+        )
+
+    def sparse_fields(self):
+        """Requested field names; see SparseFieldsMixin."""
+        return None
+
+    def native_reader(self, fields=None):
+        readers = type(self).__dict__.get('_native_readers')
+        if readers is None:
+            readers = type(self)._native_readers = {}
+        key = None if fields is None else tuple(fields)
+        reader = readers.get(key)
+        if reader is None:
+            reader = readers[key] = NativeReader(self.serializer_class, fields)
+        return reader
+
+    def native_collection(self):
+        return get_shared_db()[self.queryset.model._meta.db_table]
+
+    def native_annotate(self, records, documents):
+        """Hook for filling serializer method fields other than ``id``."""
+
+    def list(self, request, *args, **kwargs):
+        if not self.use_native_reads(request):
+            return super().list(request, *args, **kwargs)
+        reader = self.native_reader(self.sparse_fields())
+        cursor = self.native_collection().find({}, reader.projection)
+        if self.native_sort:
+            cursor = cursor.sort(self.native_sort)
+        documents = list(cursor)
+        records = [reader.to_representation(document) for document in documents]
+        self.native_annotate(records, documents)
+        return Response(records)
+
+    def retrieve(self, request, *args, **kwargs):
+        if not self.use_native_reads(request):
+            return super().retrieve(request, *args, **kwargs)
+        reader = self.native_reader(self.sparse_fields())
+        object_id = to_object_id(kwargs[self.lookup_url_kwarg or self.lookup_field])
+        document = object_id and self.native_collection().find_one({'_id': object_id}, reader.projection)
+        if document is None:
+            raise Http404
+        records = [reader.to_representation(document)]
+        self.native_annotate(records, [document])
+        return Response(records[0])
@@ -0,0 +1,33 @@
+from rest_framework.pagination import CursorPagination
+
+
+class OptInCursorPagination(CursorPagination):
+    """
+    Keyset pagination that only applies when the client asks for it.
+
+    Requests without a ``cursor`` or ``page_size`` parameter get the full
+    unpaginated list, so existing clients keep working. Each page is fetched
+    with a range filter on the leading ordering key instead of an offset
+    scan; an offset is only used to step over rows sharing the same key.
+    """
+    page_size = 50
+    page_size_query_param = 'page_size'
+    max_page_size = 500
+
+    def paginate_queryset(self, queryset, request, view=None):
+        params = (self.cursor_query_param, self.page_size_query_param)
+        if not any(param in request.query_params for param in params):
+            return None
+        return super().paginate_queryset(queryset, request, view)
+
+
+class IdCursorPagination(OptInCursorPagination):
+    ordering = '_id'
+
+
+class ActivityCursorPagination(OptInCursorPagination):
+    ordering = ('-date', '-_id')
+
+
+class LeaderboardCursorPagination(OptInCursorPagination):
+    ordering = ('rank', '_id')
@@ -0,0 +1,245 @@
+"""
+Per-request profiling: query counts, phase timings and slow-request logs.
+
+Each request is split into phases:
+
+* ``db``: time inside djongo cursor calls (SQL translation plus Mongo I/O),
+  measured by an execute wrapper installed on every new connection;
+* ``mongo``: server round trips as reported by a pymongo command listener,
+  which also sees native pymongo reads that bypass djongo;
+* ``render``: rendering the DRF response;
+* ``app``: everything else (views, serializers, middleware).
+
+The timings are sent in a ``Server-Timing`` header. Requests slower than
+``OCTOFIT_SLOW_REQUEST_MS`` are logged as JSON on the
+``octofit_tracker.slow_requests`` logger with every SQL statement and the
+Mongo commands it was translated into. ``OCTOFIT_PROFILE_SAMPLE_RATE`` of
+requests are run under cProfile and dumped to ``OCTOFIT_PROFILE_DIR``.
+
+The listener is registered when this module is imported from the app's
+``ready()``, before any MongoClient exists; clients created earlier are not
+observed. The current request is tracked in a context variable, so the
+middleware also works under ASGI, including sync views run in a thread.
+Commands issued from motor's executor threads are not attributed.
+"""
+import asyncio
+import contextvars
+import cProfile
+import json
+import logging
+import os
+import random
+import re
+import time
+
+from bson import json_util
+from django.conf import settings
+from django.db.backends.signals import connection_created
+from django.dispatch import receiver
+from pymongo import monitoring
+
+logger = logging.getLogger('octofit_tracker.slow_requests')
+
+# Upper bound on statements and commands kept for one slow-request log entry
+MAX_LOGGED_QUERIES = 50
+
+_current = contextvars.ContextVar('octofit_request_profile', default=None)
+
+
+class RequestProfile:
+    """Measurements collected while one request is handled."""
+
+    def __init__(self):
+        self.started = time.perf_counter()
+        self.queries = []
+        self.query_count = 0
+        self.commands = []
+        self.db_seconds = 0.0
+        self.mongo_seconds = 0.0
+        self.render_started = None
+        self.render_seconds = 0.0
+
+    def execute(self, execute, sql, params, many, context):
+        """Time one djongo statement."""
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - started
+            self.db_seconds += elapsed
+            self.query_count += 1
+            if len(self.queries) < MAX_LOGGED_QUERIES:
+                self.queries.append({'sql': sql, 'params': params, 'ms': round(elapsed * 1000, 3)})
+
+    def phases(self, total):
+        app = max(total - self.db_seconds - self.render_seconds, 0.0)
+        return {
+            'total': total,
+            'db': self.db_seconds,
+            'mongo': self.mongo_seconds,
+            'app': app,
+            'render': self.render_seconds,
+        }
+
+
+def loggable_command(command):
+    """A Mongo command as plain JSON, without session and database fields."""
+    command = command.to_dict() if hasattr(command, 'to_dict') else dict(command)
+    command.pop('lsid', None)
+    command.pop('$db', None)
+    return json.loads(json_util.dumps(command))
+
+
+class CommandCollector(monitoring.CommandListener):
+    """Attributes Mongo commands to the request being handled in the current context."""
+
+    def started(self, event):
+        profile = _current.get()
+        if profile is not None and len(profile.commands) < MAX_LOGGED_QUERIES:
+            # Kept as sent; only serialized if the request is logged
+            profile.commands.append({
+                'request_id': event.request_id,
+                'command_name': event.command_name,
+                'command': event.command,
+            })
+
+    def succeeded(self, event):
+        self._finished(event)
+
+    def failed(self, event):
+        self._finished(event)
+
+    @staticmethod
+    def _finished(event):
+        profile = _current.get()
+        if profile is None:
+            return
+        profile.mongo_seconds += event.duration_micros / 1e6
+        for command in reversed(profile.commands):
+            if command['request_id'] == event.request_id:
+                command['ms'] = event.duration_micros / 1000
+                break
+
+
+monitoring.register(CommandCollector())
+
+
+def _timed_execute(execute, sql, params, many, context):
+    profile = _current.get()
+    if profile is None:
+        return execute(sql, params, many, context)
+    return profile.execute(execute, sql, params, many, context)
+
+
+@receiver(connection_created)
+def install_execute_wrapper(sender, connection, **kwargs):
+    """Time statements on every connection, whichever thread opened it."""
+    if _timed_execute not in connection.execute_wrappers:
+        # First, so execute_wrapper() blocks, which pop the last entry, leave it alone
+        connection.execute_wrappers.insert(0, _timed_execute)
+
+
+def server_timing(phases, queries):
+    """Format phase timings (seconds) as a Server-Timing header value."""
+    parts = []
+    for name, seconds in phases.items():
+        part = f'{name};dur={seconds * 1000:.2f}'
+        if name == 'db':
+            part += f';desc="{queries} queries"'
+        parts.append(part)
+    return ', '.join(parts)
+
+
+class ProfilingMiddleware:
+    """Times every request and reports where the time went."""
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            # Lets Django call this middleware directly from async code
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        profile, profiler, token = self.start()
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(profiler, token)
+        return self.finish(request, response, profile, profiler)
+
+    async def __acall__(self, request):
+        profile, profiler, token = self.start()
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(profiler, token)
+        return self.finish(request, response, profile, profiler)
+
+    @staticmethod
+    def start():
+        profile = RequestProfile()
+        token = _current.set(profile)
+        profiler = None
+        if random.random() < getattr(settings, 'OCTOFIT_PROFILE_SAMPLE_RATE', 0.0):
+            profiler = cProfile.Profile()
+            profiler.enable()
+        return profile, profiler, token
+
+    @staticmethod
+    def stop(profiler, token):
+        if profiler is not None:
+            profiler.disable()
+        _current.reset(token)
+
+    def finish(self, request, response, profile, profiler):
+        total = time.perf_counter() - profile.started
+        phases = profile.phases(total)
+        response['Server-Timing'] = server_timing(phases, profile.query_count)
+
+        if total * 1000 >= getattr(settings, 'OCTOFIT_SLOW_REQUEST_MS', 500):
+            self.log_slow_request(request, response, profile, phases)
+        if profiler is not None:
+            self.dump_profile(request, profiler)
+        return response
+
+    def process_template_response(self, request, response):
+        """Time DRF rendering, which happens after this hook returns."""
+        profile = _current.get()
+        if profile is not None:
+            profile.render_started = time.perf_counter()
+            response.add_post_render_callback(lambda rendered: self._rendered(profile))
+        return response
+
+    @staticmethod
+    def _rendered(profile):
+        profile.render_seconds = time.perf_counter() - profile.render_started
+
+    @staticmethod
+    def log_slow_request(request, response, profile, phases):
+        logger.warning(json.dumps({
+            'method': request.method,
+            'path': request.get_full_path(),
+            'status': response.status_code,
+            'ms': {name: round(seconds * 1000, 3) for name, seconds in phases.items()},
+            'query_count': profile.query_count,
+            'queries': [dict(query, params=repr(query['params'])) for query in profile.queries],
+            'mongo_commands': [
+                {
+                    'command_name': command['command_name'],
+                    'command': loggable_command(command['command']),
+                    **({'ms': command['ms']} if 'ms' in command else {}),
+                }
+                for command in profile.commands
+            ],
+        }))
+
+    @staticmethod
+    def dump_profile(request, profiler):
+        directory = getattr(settings, 'OCTOFIT_PROFILE_DIR', 'profiles')
+        os.makedirs(directory, exist_ok=True)
+        slug = re.sub(r'[^A-Za-z0-9]+', '-', request.path).strip('-') or 'root'
+        profiler.dump_stats(os.path.join(directory, f'{time.time():.6f}-{request.method}-{slug}.prof'))
@@ -0,0 +1,120 @@
+"""
+In-memory order-statistic index over leaderboard totals.
+
+Each process keeps the leaderboard sorted by total_calories (descending,
+ties by user_id) together with an ascending array of totals, so rank and
+percentile lookups are a bisect and top-k / around-me queries are slices.
+Rows changed by ``leaderboard.apply_deltas`` in this process arrive through
+the ``leaderboard_changed`` signal and are moved within a copy of the
+snapshot, which then takes the version that write produced. The snapshot is
+only rebuilt from the collection after a rebuild, or when the version has
+moved by writes this process did not see (other processes, ORM writes);
+the version is checked at most once every ``OCTOFIT_RANK_INDEX_MAX_AGE``
+seconds.
+"""
+import threading
+import time
+from bisect import bisect_left, bisect_right, insort
+
+from django.conf import settings
+from django.dispatch import receiver
+
+from . import versions
+from .models import Leaderboard
+from .mongo import get_db
+from .signals import leaderboard_changed
+
+
+class RankSnapshot:
+    """Immutable sorted view of the leaderboard at one version."""
+
+    def __init__(self, totals, version, keys=None, ascending=None):
+        self.version = version
+        self.totals = totals
+        # (-total_calories, user_id), so a user's position is a bisect
+        self.keys = keys if keys is not None else sorted((-total, user_id) for user_id, total in totals.items())
+        self.ascending = ascending if ascending is not None else sorted(totals.values())
+
+    def updated(self, totals, version):
+        """A copy with the given {user_id: total_calories} moved into place."""
+        new_totals, keys, ascending = dict(self.totals), list(self.keys), list(self.ascending)
+        for user_id, total in totals.items():
+            if user_id in new_totals:
+                old = new_totals[user_id]
+                del keys[bisect_left(keys, (-old, user_id))]
+                del ascending[bisect_left(ascending, old)]
+            new_totals[user_id] = total
+            insort(keys, (-total, user_id))
+            insort(ascending, total)
+        return RankSnapshot(new_totals, version, keys, ascending)
+
+    def __len__(self):
+        return len(self.totals)
+
+    def __contains__(self, user_id):
+        return user_id in self.totals
+
+    def rank(self, user_id):
+        """Competition rank: one more than the number of users with more calories."""
+        return len(self.ascending) - bisect_right(self.ascending, self.totals[user_id]) + 1
+
+    def percentile(self, user_id):
+        """Percentage of users with fewer calories than ``user_id``."""
+        return 100.0 * bisect_left(self.ascending, self.totals[user_id]) / len(self.ascending)
+
+    def top(self, k):
+        return [user_id for _, user_id in self.keys[:k]]
+
+    def around(self, user_id, radius):
+        position = bisect_left(self.keys, (-self.totals[user_id], user_id))
+        return [user_id for _, user_id in self.keys[max(position - radius, 0):position + radius + 1]]
+
+
+class RankIndex:
+    """Per-process holder that swaps in a new RankSnapshot when the leaderboard changes."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._snapshot = None
+        self._checked_at = 0.0
+
+    def snapshot(self):
+        """Return a current snapshot, rebuilding it if the leaderboard changed."""
+        snapshot = self._snapshot
+        max_age = getattr(settings, 'OCTOFIT_RANK_INDEX_MAX_AGE', 2.0)
+        if snapshot is not None and time.monotonic() - self._checked_at < max_age:
+            return snapshot
+        table = Leaderboard._meta.db_table
+        version = versions.current([table])[table][0]
+        if snapshot is None or snapshot.version != version:
+            with self._lock:
+                if self._snapshot is None or self._snapshot.version != version:
+                    rows = get_db()[table].find({}, {'_id': 0, 'user_id': 1, 'total_calories': 1})
+                    self._snapshot = RankSnapshot(
+                        {row['user_id']: row.get('total_calories') or 0 for row in rows}, version
+                    )
+        self._checked_at = time.monotonic()
+        return self._snapshot
+
+    def apply(self, changes):
+        """Move changed (user_id, total_calories, ...) rows; ``apply_deltas`` bumps the version once."""
+        with self._lock:
+            if self._snapshot is not None:
+                totals = {change[0]: change[1] or 0 for change in changes}
+                self._snapshot = self._snapshot.updated(totals, self._snapshot.version + 1)
+
+    def reset(self):
+        with self._lock:
+            self._snapshot = None
+
+
+rank_index = RankIndex()
+
+
+@receiver(leaderboard_changed)
+def update_rank_index(sender, changes=None, **kwargs):
+    """Keep this process's snapshot in step with its own leaderboard writes."""
+    if changes is None:
+        rank_index.reset()
+    else:
+        rank_index.apply(changes)
@@ -0,0 +1,74 @@
+"""
+Write-invalidated cache of rendered JSON responses.
+
+Entries are keyed by the same fingerprint as the ETag: request path, query
+string, media type and the version of every collection the response
+depends on. A write bumps a version, so later reads miss and nothing needs
+to be deleted. Storage, size bounds and TTL come from the Django cache named
+by ``OCTOFIT_RESPONSE_CACHE_ALIAS`` (LocMem LRU by default, Redis when
+``OCTOFIT_CACHE_URL`` is set).
+"""
+import threading
+from collections import Counter
+
+from django.conf import settings
+from django.core.cache import caches
+from django.http import HttpResponse
+
+from .conditional import ConditionalGetMixin
+
+_stats = Counter()
+_stats_lock = threading.Lock()
+
+
+def _count(outcome):
+    with _stats_lock:
+        _stats[outcome] += 1
+
+
+def stats():
+    """Return this process's hit/miss counters."""
+    with _stats_lock:
+        hits, misses = _stats['hits'], _stats['misses']
+    total = hits + misses
+    alias = settings.OCTOFIT_RESPONSE_CACHE_ALIAS
+    return {
+        'backend': settings.CACHES[alias]['BACKEND'],
+        'hits': hits,
+        'misses': misses,
+        'hit_rate': hits / total if total else 0.0,
+    }
+
+
+def reset_stats():
+    with _stats_lock:
+        _stats.clear()
+
+
+class CachedResponseMixin(ConditionalGetMixin):
+    """
+    Serves repeated JSON list and retrieve requests from the response cache.
+    """
+
+    def fresh_response(self, request, etag, handler, *args, **kwargs):
+        if getattr(request.accepted_renderer, 'format', None) != 'json':
+            return super().fresh_response(request, etag, handler, *args, **kwargs)
+
+        cache = caches[settings.OCTOFIT_RESPONSE_CACHE_ALIAS]
+        key = 'octofit:response:' + etag.strip('"')
+        cached = cache.get(key)
+        if cached is not None:
+            _count('hits')
+            content, content_type = cached
+            response = HttpResponse(content, content_type=content_type)
+            response['X-Cache'] = 'HIT'
+            return response
+
+        _count('misses')
+        response = super().fresh_response(request, etag, handler, *args, **kwargs)
+        if response.status_code == 200:
+            def store(rendered):
+                cache.set(key, (rendered.content, rendered['Content-Type']))
+            response.add_post_render_callback(store)
+        response['X-Cache'] = 'MISS'
+        return response
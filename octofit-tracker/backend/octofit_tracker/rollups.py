@@ -0,0 +1,203 @@
+"""
+Pre-aggregated daily and ISO-weekly activity rollups per user and per team.
+
+Each bucket document is keyed by (scope, owner_id, period, bucket) and holds
+calories, duration and count totals plus the same totals per activity type.
+Buckets are updated with ``$inc`` upserts on every activity write and can be
+rebuilt from scratch with ``manage.py rebuild_rollups``. A user's activities
+count towards the team they currently belong to: when a user changes team
+(or is deleted), their daily and weekly user buckets are moved from the old
+team's buckets to the new one's, so later edits and removals, like a
+rebuild, are charged to the current team.
+"""
+import datetime
+from collections import defaultdict
+
+from django.dispatch import receiver
+from pymongo import ASCENDING, UpdateOne
+
+from .models import Activity
+from .mongo import get_db, team_ids_for_users, to_mongo_datetime
+from .signals import activities_changed, team_changed
+
+ROLLUP_COLLECTION = 'activity_rollups'
+SCOPES = ('user', 'team')
+PERIODS = ('day', 'week')
+TOTALS = ('calories', 'duration', 'count')
+
+
+def rollup_collection():
+    return get_db()[ROLLUP_COLLECTION]
+
+
+def type_key(activity_type):
+    """Make an activity type safe to use as a Mongo field name."""
+    return activity_type.replace('.', '_').lstrip('$') or '_'
+
+
+def bucket_for(date, period):
+    """Return the (bucket label, bucket start) for a datetime."""
+    day = to_mongo_datetime(date).date()
+    if period == 'week':
+        year, week, weekday = day.isocalendar()
+        start = day - datetime.timedelta(days=weekday - 1)
+        return f'{year}-W{week:02d}', datetime.datetime.combine(start, datetime.time.min)
+    return day.isoformat(), datetime.datetime.combine(day, datetime.time.min)
+
+
+def _accumulate(buckets, owners, date, activity_type, values):
+    """Add ``values`` to every bucket an activity on ``date`` falls into."""
+    for period in PERIODS:
+        bucket, start = bucket_for(date, period)
+        for scope, owner_id in owners:
+            totals = buckets[(scope, owner_id, period, bucket)]
+            totals['start'] = start
+            for name, value in values.items():
+                totals[name] += value
+                totals[f'by_type.{type_key(activity_type)}.{name}'] += value
+
+
+def _values(activity, sign):
+    return {'calories': sign * activity['calories'], 'duration': sign * activity['duration'], 'count': sign}
+
+
+def _owners(activity, teams):
+    owners = [('user', activity['user_id'])]
+    team_id = teams.get(activity['user_id'])
+    if team_id:
+        owners.append(('team', team_id))
+    return owners
+
+
+def bucket_deltas(added=(), removed=()):
+    """Reduce activity snapshots to per-bucket ``$inc`` documents."""
+    teams = team_ids_for_users([a['user_id'] for a in list(added) + list(removed)])
+    buckets = defaultdict(lambda: defaultdict(int))
+    for activities, sign in ((added, 1), (removed, -1)):
+        for activity in activities:
+            _accumulate(
+                buckets, _owners(activity, teams), activity['date'], activity['activity_type'],
+                _values(activity, sign)
+            )
+    return buckets
+
+
+def _upserts(buckets):
+    operations = []
+    for (scope, owner_id, period, bucket), totals in buckets.items():
+        increments = {name: value for name, value in totals.items() if name != 'start'}
+        operations.append(UpdateOne(
+            {'scope': scope, 'owner_id': owner_id, 'period': period, 'bucket': bucket},
+            {'$inc': increments, '$setOnInsert': {'start': totals['start']}},
+            upsert=True,
+        ))
+    return operations
+
+
+def _bucket_document(key, totals):
+    """A whole bucket document, with the dotted ``by_type`` paths nested."""
+    scope, owner_id, period, bucket = key
+    document = {'scope': scope, 'owner_id': owner_id, 'period': period, 'bucket': bucket}
+    for path, value in totals.items():
+        target = document
+        *parents, name = path.split('.')
+        for parent in parents:
+            target = target.setdefault(parent, {})
+        target[name] = value
+    return document
+
+
+def apply_bucket_deltas(buckets):
+    """Write bucket deltas in a single bulk round trip."""
+    operations = _upserts(buckets)
+    if operations:
+        rollup_collection().bulk_write(operations, ordered=False)
+
+
+@receiver(activities_changed)
+def update_rollups(sender, added=(), removed=(), **kwargs):
+    """Keep rollup buckets in step with activity writes."""
+    apply_bucket_deltas(bucket_deltas(added, removed))
+
+
+@receiver(team_changed)
+def move_team_buckets(sender, user_id, previous=None, current=None, **kwargs):
+    """Move a user's totals from their previous team's buckets to their current team's."""
+    if previous == current:
+        return
+    teams = [(team_id, sign) for team_id, sign in ((previous, -1), (current, 1)) if team_id]
+    buckets = defaultdict(lambda: defaultdict(int))
+    for document in rollup_collection().find({'scope': 'user', 'owner_id': user_id}):
+        for team_id, sign in teams:
+            totals = buckets[('team', team_id, document['period'], document['bucket'])]
+            totals['start'] = document['start']
+            for name in TOTALS:
+                totals[name] += sign * document.get(name, 0)
+            for key, type_totals in document.get('by_type', {}).items():
+                for name in TOTALS:
+                    totals[f'by_type.{key}.{name}'] += sign * type_totals.get(name, 0)
+    apply_bucket_deltas(buckets)
+
+
+def rebuild():
+    """
+    Recompute every bucket from the activities collection.
+
+    Activities are first grouped per (user, day, activity type) inside Mongo;
+    the much smaller result is folded into user/team and day/week buckets.
+    The buckets are written to a staging collection that is renamed over the
+    live one with ``dropTarget``, so readers never see a partial set. As with
+    ``leaderboard.rebuild``, activity writes that land meanwhile only reach
+    the old collection and are lost, so run it when writes are quiet.
+    Returns the number of bucket documents written.
+    """
+    db = get_db()
+    teams = {str(user['_id']): user.get('team_id') for user in db['users'].find({}, {'team_id': 1})}
+    groups = db[Activity._meta.db_table].aggregate([
+        {'$group': {
+            '_id': {
+                'user_id': '$user_id',
+                'day': {'$dateToString': {'format': '%Y-%m-%d', 'date': '$date'}},
+                'activity_type': '$activity_type',
+            },
+            'calories': {'$sum': '$calories'},
+            'duration': {'$sum': '$duration'},
+            'count': {'$sum': 1},
+        }},
+    ], allowDiskUse=True)
+
+    buckets = defaultdict(lambda: defaultdict(int))
+    for group in groups:
+        key = group['_id']
+        _accumulate(
+            buckets, _owners(key, teams), datetime.datetime.strptime(key['day'], '%Y-%m-%d'),
+            key['activity_type'], {name: group[name] for name in TOTALS}
+        )
+
+    # Imported here: indexes imports this module for ROLLUP_COLLECTION
+    from .indexes import RAW_COLLECTION_INDEXES
+
+    staging = f'{ROLLUP_COLLECTION}_staging'
+    db.drop_collection(staging)
+    db.create_collection(staging)
+    documents = [_bucket_document(key, totals) for key, totals in buckets.items()]
+    if documents:
+        db[staging].insert_many(documents, ordered=False)
+    for spec in RAW_COLLECTION_INDEXES[ROLLUP_COLLECTION]:
+        db[staging].create_index(spec['keys'], name=spec['name'], unique=spec.get('unique', False))
+    db[staging].rename(ROLLUP_COLLECTION, dropTarget=True)
+    return len(documents)
+
+
+def series(scope, owner_id, period, start=None, end=None):
+    """Return the buckets of one owner in chronological order."""
+    query = {'scope': scope, 'owner_id': owner_id, 'period': period}
+    date_range = {}
+    if start:
+        date_range['$gte'] = to_mongo_datetime(start)
+    if end:
+        date_range['$lt'] = to_mongo_datetime(end)
+    if date_range:
+        query['start'] = date_range
+    projection = {'_id': 0, 'bucket': 1, 'start': 1, 'by_type': 1, **{name: 1 for name in TOTALS}}
+    return list(rollup_collection().find(query, projection).sort('start', ASCENDING))
@@ -1,3 +1,8 @@
+from operator import attrgetter
+
+from django.db.models import Count
+from django.utils import timezone
+from django.utils.encoding import is_protected_type
 from rest_framework import serializers
 from .models import User, Team, Activity, Leaderboard, Workout
 
@@ -28,8 +33,21 @@ class TeamSerializer(serializers.ModelSerializer):
     
     def get_member_count(self, obj):
         """Count the number of users in this team"""
+        member_counts = self.context.get('member_counts')
+        if member_counts is not None:
+            return member_counts.get(str(obj._id), 0)
         return User.objects.filter(team_id=str(obj._id)).count()
 
+    @staticmethod
+    def member_counts(teams):
+        """Count the members of several teams with one grouped query"""
+        rows = (
+            User.objects.filter(team_id__in=[str(team._id) for team in teams])
+            .values('team_id')
+            .annotate(member_count=Count('team_id'))
+        )
+        return {row['team_id']: row['member_count'] for row in rows}
+
 
 class ActivitySerializer(serializers.ModelSerializer):
     id = serializers.SerializerMethodField()
@@ -65,3 +83,112 @@ class WorkoutSerializer(serializers.ModelSerializer):
     def get_id(self, obj):
         """Convert ObjectId to string"""
         return str(obj._id)
+
+
+class FastReadSerializer:
+    """
+    Read-only stand-in for a ModelSerializer on list and retrieve requests.
+
+    Produces the same output as ``model_serializer`` but builds every row from
+    a list of (name, accessor, converter) tuples compiled once per class, so
+    there is no per-field DRF dispatch. Method fields other than ``id`` are
+    delegated to the wrapped serializer. ``fields`` limits the output to a
+    subset of field names.
+    """
+    model_serializer = None
+
+    def __init__(self, instance=None, many=False, context=None, fields=None, **kwargs):
+        self.instance = instance
+        self.many = many
+        self.context = context or {}
+        self.fields = fields
+
+    @classmethod
+    def compiled_fields(cls):
+        compiled = cls.__dict__.get('_compiled_fields')
+        if compiled is None:
+            compiled = cls._compiled_fields = [
+                cls.compile_field(name, field)
+                for name, field in cls.model_serializer().fields.items()
+            ]
+        return compiled
+
+    @classmethod
+    def compile_field(cls, name, field):
+        if name == 'id':
+            return name, attrgetter('_id'), str
+        if isinstance(field, serializers.SerializerMethodField):
+            return name, None, field.method_name or f'get_{name}'
+        if isinstance(field, serializers.ModelField):
+            return name, attrgetter(field.model_field.attname), _model_field_value
+        if isinstance(field, serializers.DateTimeField):
+            return name, attrgetter(field.source), _datetime_converter
+        if isinstance(field, serializers.IntegerField):
+            return name, attrgetter(field.source), int
+        if isinstance(field, serializers.CharField):
+            return name, attrgetter(field.source), str
+        return name, attrgetter(field.source), field.to_representation
+
+    @property
+    def data(self):
+        tz = timezone.get_current_timezone()
+        fields = [
+            (name, accessor, _datetime_converter(tz) if convert is _datetime_converter else convert)
+            for name, accessor, convert in self.compiled_fields()
+            if self.fields is None or name in self.fields
+        ]
+        delegate = None
+        if any(accessor is None for _, accessor, _ in fields):
+            delegate = self.model_serializer(context=self.context)
+        if not self.many:
+            return self._row(self.instance, fields, delegate)
+        return [self._row(obj, fields, delegate) for obj in self.instance]
+
+    @staticmethod
+    def _row(obj, fields, delegate):
+        row = {}
+        for name, accessor, convert in fields:
+            if accessor is None:
+                row[name] = getattr(delegate, convert)(obj)
+                continue
+            value = accessor(obj)
+            row[name] = None if value is None else convert(value)
+        return row
+
+
+def _datetime_converter(tz):
+    """Build a converter matching DateTimeField's ISO 8601 output in ``tz``"""
+    def convert(value):
+        if not value:
+            return None
+        value = value.astimezone(tz) if value.utcoffset() is not None else timezone.make_aware(value, tz)
+        value = value.isoformat()
+        if value.endswith('+00:00'):
+            value = value[:-6] + 'Z'
+        return value
+    return convert
+
+
+def _model_field_value(value):
+    """Match ModelField output for model fields DRF has no mapping for"""
+    return value if is_protected_type(value) else str(value)
+
+
+class FastUserSerializer(FastReadSerializer):
+    model_serializer = UserSerializer
+
+
+class FastTeamSerializer(FastReadSerializer):
+    model_serializer = TeamSerializer
+
+
+class FastActivitySerializer(FastReadSerializer):
+    model_serializer = ActivitySerializer
+
+
+class FastLeaderboardSerializer(FastReadSerializer):
+    model_serializer = LeaderboardSerializer
+
+
+class FastWorkoutSerializer(FastReadSerializer):
+    model_serializer = WorkoutSerializer
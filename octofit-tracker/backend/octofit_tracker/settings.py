@@ -52,6 +52,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'octofit_tracker.profiling.ProfilingMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'corsheaders.middleware.CorsMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
@@ -86,9 +87,10 @@ WSGI_APPLICATION = 'octofit_tracker.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.1/ref/settings/#databases
 
+# octofit_tracker.db_backend is djongo plus a cache of parsed SQL statements
 DATABASES = {
     'default': {
-        'ENGINE': 'djongo',
+        'ENGINE': 'octofit_tracker.db_backend',
         'NAME': 'octofit_db',
         'ENFORCE_SCHEMA': False,
         'CLIENT': {
@@ -98,6 +100,66 @@ DATABASES = {
     }
 }
 
+# Read path for list/retrieve: 'orm' goes through djongo, 'native' queries
+# MongoDB directly with pymongo (see octofit_tracker/native_reads.py)
+OCTOFIT_READ_PATH = os.environ.get('OCTOFIT_READ_PATH', 'orm')
+
+REST_FRAMEWORK = {
+    'DEFAULT_RENDERER_CLASSES': [
+        'octofit_tracker.renderers.ORJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ],
+}
+
+
+# Caches
+# https://docs.djangoproject.com/en/4.1/topics/cache/
+# Rendered API responses live in the 'responses' cache: a size-bounded LRU
+# with a TTL per process, or a shared Redis when OCTOFIT_CACHE_URL is set
+# (Django's RedisCache, which needs the redis package).
+
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'responses': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'octofit-responses',
+        'TIMEOUT': 300,
+        'OPTIONS': {
+            'MAX_ENTRIES': 1000,
+        },
+    },
+}
+if os.environ.get('OCTOFIT_CACHE_URL'):
+    CACHES['responses'] = {
+        'BACKEND': 'django.core.cache.backends.redis.RedisCache',
+        'LOCATION': os.environ['OCTOFIT_CACHE_URL'],
+        'TIMEOUT': 300,
+    }
+
+OCTOFIT_RESPONSE_CACHE_ALIAS = 'responses'
+
+# Seconds between leaderboard version checks by the in-memory rank index
+OCTOFIT_RANK_INDEX_MAX_AGE = 2.0
+
+# Request profiling (see octofit_tracker/profiling.py): requests slower than
+# OCTOFIT_SLOW_REQUEST_MS are logged with their queries, and a fraction
+# OCTOFIT_PROFILE_SAMPLE_RATE of requests is dumped as cProfile stats.
+OCTOFIT_SLOW_REQUEST_MS = float(os.environ.get('OCTOFIT_SLOW_REQUEST_MS', 500))
+OCTOFIT_PROFILE_SAMPLE_RATE = float(os.environ.get('OCTOFIT_PROFILE_SAMPLE_RATE', 0))
+OCTOFIT_PROFILE_DIR = os.environ.get('OCTOFIT_PROFILE_DIR', str(BASE_DIR / 'profiles'))
+
+# Write-behind activity creation (see octofit_tracker/write_queue.py): POSTs
+# are validated, queued and answered with 202, then inserted in batches.
+OCTOFIT_WRITE_BEHIND = os.environ.get('OCTOFIT_WRITE_BEHIND', '') == '1'
+OCTOFIT_WRITE_QUEUE_SIZE = 10000
+OCTOFIT_WRITE_BATCH_SIZE = 500
+OCTOFIT_WRITE_FLUSH_INTERVAL = 0.5
+
+# Connection pool size of the motor client behind the /api/async/ endpoints
+OCTOFIT_ASYNC_MONGO_POOL_SIZE = 100
+
 
 # Password validation
 # https://docs.djangoproject.com/en/4.1/ref/settings/#auth-password-validators
@@ -161,3 +223,32 @@ CORS_ALLOW_HEADERS = [
     'x-csrftoken',
     'x-requested-with',
 ]
+# Lets browser clients read the delta sync cursor of list responses
+CORS_EXPOSE_HEADERS = ['X-Sync-Cursor']
+
+# Parsed SQL templates kept by the database backend's translation cache
+# (see octofit_tracker/db_backend/translation_cache.py)
+OCTOFIT_SQL_CACHE_SIZE = 512
+
+# Leaderboard event stream (see octofit_tracker/leaderboard_stream.py):
+# changes are merged into at most one message per OCTOFIT_STREAM_INTERVAL
+# seconds. OCTOFIT_STREAM_SOURCE is 'local' (this process's writes),
+# 'change_stream' or 'auto' (a change stream when the server supports one).
+OCTOFIT_STREAM_INTERVAL = float(os.environ.get('OCTOFIT_STREAM_INTERVAL', 1.0))
+OCTOFIT_STREAM_SOURCE = os.environ.get('OCTOFIT_STREAM_SOURCE', 'auto')
+OCTOFIT_STREAM_KEEPALIVE = 15.0
+OCTOFIT_STREAM_QUEUE_SIZE = 16
+
+# Delta sync (see octofit_tracker/delta_sync.py): ?since= returns at most
+# OCTOFIT_SYNC_MAX_CHANGES documents per response; cursors lag by
+# OCTOFIT_SYNC_OVERLAP_SECONDS so in-flight writes are not skipped, and
+# deletion tombstones (and so cursors) expire after OCTOFIT_TOMBSTONE_TTL_DAYS.
+OCTOFIT_SYNC_MAX_CHANGES = 1000
+OCTOFIT_SYNC_OVERLAP_SECONDS = 5
+OCTOFIT_TOMBSTONE_TTL_DAYS = 30
+
+# Batched reads (see octofit_tracker/batch.py): at most
+# OCTOFIT_BATCH_MAX_REQUESTS parts per call, run on a pool of
+# OCTOFIT_BATCH_WORKERS threads shared by every batch in the process.
+OCTOFIT_BATCH_MAX_REQUESTS = 20
+OCTOFIT_BATCH_WORKERS = 4
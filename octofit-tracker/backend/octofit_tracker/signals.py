@@ -0,0 +1,21 @@
+from django.dispatch import Signal
+
+# Sent once per write batch with ``added`` and ``removed`` lists of activity
+# snapshots. An update is sent as the old snapshot removed and the new one added.
+activities_changed = Signal()
+
+# Sent after leaderboard rows change with ``changes``, a list of (user_id,
+# total_calories, total_activities, rank) tuples, or ``changes=None`` when a
+# rebuild replaced the whole board.
+leaderboard_changed = Signal()
+
+# Sent when a user's team changes, with ``user_id``, ``previous`` and
+# ``current`` team ids (``current=None`` when the user was deleted).
+team_changed = Signal()
+
+SNAPSHOT_FIELDS = ('user_id', 'activity_type', 'duration', 'calories', 'date')
+
+
+def activity_snapshot(activity):
+    """Capture the fields of an activity that derived data depends on"""
+    return {field: getattr(activity, field) for field in SNAPSHOT_FIELDS}
@@ -0,0 +1,86 @@
+"""
+Sparse fieldsets: ``?fields=name,email`` on list and retrieve.
+
+The requested fields trim the serializer output and are pushed down as
+``QuerySet.only()``, which djongo turns into a ``find`` projection, so the
+omitted fields are never read from MongoDB. The native read path uses the
+same list as its projection.
+"""
+from rest_framework import serializers
+from rest_framework.exceptions import ValidationError
+
+
+def parse_fields(params, available):
+    """
+    Return the ``fields`` query parameter as a list in serializer order.
+
+    Returns None when the parameter is absent and raises ValidationError for
+    unknown names.
+    """
+    raw = params.get('fields')
+    if raw is None:
+        return None
+    requested = {name.strip() for name in raw.split(',') if name.strip()}
+    unknown = sorted(requested - set(available))
+    if unknown or not requested:
+        raise ValidationError({
+            'fields': f'Unknown field(s): {", ".join(unknown) or "(none given)"}. '
+                      f'Choose from: {", ".join(available)}.'
+        })
+    return [name for name in available if name in requested]
+
+
+def model_columns(serializer_class, names):
+    """Model attributes that must be loaded to serialize ``names``."""
+    fields = serializer_class().fields
+    columns = []
+    for name in names:
+        field = fields[name]
+        if name == 'id' or isinstance(field, serializers.SerializerMethodField):
+            # Method fields here only read the primary key, which is always loaded
+            continue
+        if isinstance(field, serializers.ModelField):
+            columns.append(field.model_field.attname)
+        else:
+            columns.append(field.source)
+    return columns
+
+
+class SparseFieldsMixin:
+    """
+    Adds ``?fields=`` to the list and retrieve actions.
+
+    Pagination ordering fields are always loaded, since the cursor is built
+    from them.
+    """
+
+    def sparse_fields(self):
+        """The requested field names, or None for the full representation."""
+        if self.request.method != 'GET' or self.action not in ('list', 'retrieve'):
+            return None
+        if not hasattr(self, '_sparse_fields'):
+            available = list(self.serializer_class().fields)
+            self._sparse_fields = parse_fields(self.request.query_params, available)
+        return self._sparse_fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.sparse_fields()
+        if fields is None:
+            return queryset
+        paginator = self.paginator
+        ordering = ()
+        if hasattr(paginator, 'get_ordering'):
+            ordering = paginator.get_ordering(self.request, queryset, self)
+        columns = [
+            queryset.model._meta.pk.attname,
+            *model_columns(self.serializer_class, fields),
+            *(name.lstrip('-') for name in ordering),
+        ]
+        return queryset.only(*dict.fromkeys(columns))
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.sparse_fields()
+        if fields is not None:
+            kwargs['fields'] = fields
+        return super().get_serializer(*args, **kwargs)
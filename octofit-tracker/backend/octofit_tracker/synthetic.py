@@ -0,0 +1,102 @@
+"""
+Synthetic users and activities for load testing.
+
+Users are split into fixed-size tasks. Each task builds its users and their
+activities from its own ``random.Random`` (seeded from the run seed and the
+task's first user index, so output does not depend on the worker count) and
+writes them with chunked ``insert_many``. Tasks run in worker processes that
+each open their own MongoClient; they never touch the Django ORM. Workers
+set Django up themselves and models are imported when first needed, so the
+pool works under the ``spawn`` start method (macOS, Windows) as well as
+``fork``.
+"""
+import datetime
+import random
+
+import django
+from bson import ObjectId
+from django.apps import apps
+from pymongo import MongoClient
+
+ACTIVITY_TYPES = [
+    {'type': 'Running', 'cal_per_min': 10},
+    {'type': 'Weightlifting', 'cal_per_min': 7},
+    {'type': 'Cycling', 'cal_per_min': 8},
+    {'type': 'Swimming', 'cal_per_min': 11},
+    {'type': 'Boxing', 'cal_per_min': 12},
+    {'type': 'Yoga', 'cal_per_min': 4},
+]
+DAYS_BACK = 30
+USERS_PER_TASK = 1000
+INSERT_CHUNK_SIZE = 5000
+
+_worker = {}
+
+
+def init_worker(client_params, db_name, options):
+    """Pool initializer: set up Django, open this process's client and keep the run options."""
+    if not apps.ready:
+        # Spawned workers start from a fresh interpreter
+        django.setup()
+    _worker['db'] = MongoClient(**client_params)[db_name]
+    _worker['options'] = options
+
+
+def tasks(users):
+    """Split ``users`` into (first, stop) user index ranges."""
+    return [(start, min(start + USERS_PER_TASK, users)) for start in range(0, users, USERS_PER_TASK)]
+
+
+def run_task(task):
+    """Worker entry point; returns (users written, activities written)."""
+    return generate(_worker['db'], task, **_worker['options'])
+
+
+def _insert(collection, documents, chunk_size):
+    for start in range(0, len(documents), chunk_size):
+        collection.insert_many(documents[start:start + chunk_size], ordered=False)
+
+
+def generate(db, task, team_ids, activities_per_user, now, seed=None, chunk_size=INSERT_CHUNK_SIZE):
+    """Write the users in ``task`` and their activities; returns (users, activities)."""
+    from .models import Activity, User
+
+    first, stop = task
+    rng = random.Random(None if seed is None else f'{seed}:{first}')
+    users = [
+        {
+            '_id': ObjectId(),
+            'name': f'Athlete {index}',
+            'email': f'athlete{index}@octofit.example',
+            'team_id': team_ids[index % len(team_ids)] if team_ids else None,
+            'created_at': now,
+            'updated_at': now,
+        }
+        for index in range(first, stop)
+    ]
+    _insert(db[User._meta.db_table], users, chunk_size)
+
+    activities = db[Activity._meta.db_table]
+    batch, written = [], 0
+    for user in users:
+        user_id = str(user['_id'])
+        for _ in range(activities_per_user):
+            activity_type = rng.choice(ACTIVITY_TYPES)
+            duration = rng.randint(20, 90)
+            batch.append({
+                'user_id': user_id,
+                'activity_type': activity_type['type'],
+                'duration': duration,
+                'calories': duration * activity_type['cal_per_min'],
+                'date': now - datetime.timedelta(days=rng.randint(0, DAYS_BACK), seconds=rng.randint(0, 86399)),
+                'created_at': now,
+                'updated_at': now,
+            })
+            if len(batch) >= chunk_size:
+                activities.insert_many(batch, ordered=False)
+                written += len(batch)
+                batch = []
+    if batch:
+        activities.insert_many(batch, ordered=False)
+        written += len(batch)
+    return len(users), written
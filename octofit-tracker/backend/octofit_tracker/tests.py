@@ -1,9 +1,44 @@
-from django.test import TestCase
+from django.core.asgi import get_asgi_application
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from rest_framework.test import APITestCase
 from rest_framework import status
 from django.urls import reverse
+from django.utils import timezone
 from .models import User, Team, Activity, Leaderboard, Workout
-from datetime import datetime
+from . import async_views, benchmarks, leaderboard, profiling, response_cache, rollups, windows
+from .db_backend.translation_cache import TranslationCache, translation_cache
+from .delta_sync import CURSOR_HEADER, decode_cursor, encode_cursor
+from .filters import activity_lookups, mongo_query
+from .leaderboard_stream import RESET_MESSAGE, STREAM_PATH, LeaderboardBroker, Subscription, leaderboard_events
+from .indexes import HOT_QUERIES, ensure_indexes, uses_collection_scan
+from .mongo import get_db
+from .rank_index import RankSnapshot, rank_index
+from .renderers import ORJSONRenderer
+from .urls import router
+from .views import ActivityViewSet
+from .write_queue import QueueFull, WriteBehindQueue, write_queue
+from .serializers import (
+    UserSerializer,
+    TeamSerializer,
+    ActivitySerializer,
+    LeaderboardSerializer,
+    WorkoutSerializer,
+    FastUserSerializer,
+    FastActivitySerializer,
+    FastLeaderboardSerializer,
+    FastWorkoutSerializer
+)
+from rest_framework.renderers import JSONRenderer
+from datetime import datetime, timedelta, timezone as dt_timezone
+from io import StringIO
+import asyncio
+import json
+import os
+import tempfile
+from unittest import skipUnless
 
 
 class UserAPITestCase(APITestCase):
@@ -168,3 +203,1048 @@ class APIRootTestCase(APITestCase):
         self.assertIn('activities', response.data)
         self.assertIn('leaderboard', response.data)
         self.assertIn('workouts', response.data)
+
+
+class LeaderboardEngineTestCase(APITestCase):
+    """Test cases for incremental leaderboard maintenance."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.alice = User.objects.create(name="Alice", email="alice@example.com", team_id="team1")
+        self.bob = User.objects.create(name="Bob", email="bob@example.com", team_id="team2")
+        self.url = reverse('activity-list')
+
+    def log_activity(self, user, calories):
+        data = {
+            'user_id': str(user._id),
+            'activity_type': 'running',
+            'duration': 30,
+            'calories': calories,
+            'date': datetime.now().isoformat()
+        }
+        return self.client.post(self.url, data, format='json')
+
+    def entry(self, user):
+        return Leaderboard.objects.get(user_id=str(user._id))
+
+    def test_create_updates_totals_and_rank(self):
+        """Test that logging activities updates totals and ranks."""
+        self.log_activity(self.alice, 200)
+        self.log_activity(self.bob, 300)
+        self.log_activity(self.alice, 150)
+        alice, bob = self.entry(self.alice), self.entry(self.bob)
+        self.assertEqual((alice.total_calories, alice.total_activities, alice.rank), (350, 2, 1))
+        self.assertEqual((bob.total_calories, bob.total_activities, bob.rank), (300, 1, 2))
+        self.assertEqual(alice.team_id, "team1")
+
+    def test_update_and_delete_rerank(self):
+        """Test that editing and deleting activities re-ranks users."""
+        response = self.log_activity(self.alice, 500)
+        self.log_activity(self.bob, 300)
+        detail = reverse('activity-detail', args=[response.data['id']])
+        self.client.patch(detail, {'calories': 100}, format='json')
+        self.assertEqual(self.entry(self.alice).rank, 2)
+        self.assertEqual(self.entry(self.bob).rank, 1)
+        self.client.delete(detail)
+        alice = self.entry(self.alice)
+        self.assertEqual((alice.total_calories, alice.total_activities), (0, 0))
+
+    def test_rebuild_matches_incremental_board(self):
+        """Test that the aggregation rebuild reproduces the incremental totals and ranks."""
+        carol = User.objects.create(name="Carol", email="carol@example.com", team_id="team1")
+        self.log_activity(self.alice, 300)
+        self.log_activity(self.bob, 300)
+        self.log_activity(self.alice, 50)
+        before = {row.user_id: (row.total_calories, row.total_activities, row.rank)
+                  for row in Leaderboard.objects.all()}
+        leaderboard.rebuild()
+        after = {row.user_id: (row.total_calories, row.total_activities, row.rank)
+                 for row in Leaderboard.objects.all()}
+        self.assertEqual(after.pop(str(carol._id)), (0, 0, 3))
+        self.assertEqual(after, before)
+        self.assertEqual(self.entry(self.bob).team_id, "team2")
+
+
+class TeamMemberCountTestCase(APITestCase):
+    """Test cases for team member counts."""
+
+    def create_teams(self, count):
+        for i in range(count):
+            team = Team.objects.create(name=f"Team {i}", description="")
+            User.objects.create(name=f"User {i}", email=f"user{i}@example.com", team_id=str(team._id))
+
+    def test_list_query_count_is_constant(self):
+        """Test that listing teams does not run a query per team."""
+        url = reverse('team-list')
+        self.create_teams(2)
+        with self.assertNumQueries(2):
+            self.client.get(url)
+        self.create_teams(8)
+        with self.assertNumQueries(2):
+            response = self.client.get(url)
+        self.assertEqual(len(response.data), 10)
+        self.assertTrue(all(team['member_count'] == 1 for team in response.data))
+
+    def test_member_count_follows_team_changes(self):
+        """Test that moving a user between teams updates both counts."""
+        red = Team.objects.create(name="Red", description="")
+        blue = Team.objects.create(name="Blue", description="")
+        user = User.objects.create(name="Mover", email="mover@example.com", team_id=str(red._id))
+        self.client.patch(reverse('user-detail', args=[str(user._id)]), {'team_id': str(blue._id)}, format='json')
+        red_count = self.client.get(reverse('team-detail', args=[str(red._id)])).data['member_count']
+        blue_count = self.client.get(reverse('team-detail', args=[str(blue._id)])).data['member_count']
+        self.assertEqual((red_count, blue_count), (0, 1))
+
+
+class CursorPaginationTestCase(APITestCase):
+    """Test cases for opt-in cursor pagination."""
+
+    def setUp(self):
+        """Set up test data."""
+        for i in range(5):
+            Activity.objects.create(
+                user_id="user123",
+                activity_type="running",
+                duration=30,
+                calories=100 + i,
+                date=datetime(2024, 1, 1 + i)
+            )
+
+    def test_unpaginated_by_default(self):
+        """Test that lists stay unpaginated without pagination parameters."""
+        response = self.client.get(reverse('activity-list'))
+        self.assertEqual(len(response.data), 5)
+
+    def test_walk_pages(self):
+        """Test following next links returns every activity once, newest first."""
+        url = reverse('activity-list') + '?page_size=2'
+        seen = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertLessEqual(len(response.data['results']), 2)
+            seen.extend(row['calories'] for row in response.data['results'])
+            url = response.data['next']
+        self.assertEqual(seen, [104, 103, 102, 101, 100])
+
+
+class ActivityBulkTestCase(APITestCase):
+    """Test cases for bulk activity ingestion."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.url = reverse('activity-bulk')
+        self.record = {
+            'user_id': 'user123',
+            'activity_type': 'running',
+            'duration': 30,
+            'calories': 250,
+            'date': datetime.now().isoformat()
+        }
+
+    def test_bulk_json_with_partial_errors(self):
+        """Test that valid records are committed alongside per-record errors."""
+        invalid = dict(self.record, calories='lots')
+        response = self.client.post(self.url, [self.record, invalid, self.record], format='json')
+        self.assertEqual(response.status_code, status.HTTP_207_MULTI_STATUS)
+        self.assertEqual([row['index'] for row in response.data['created']], [0, 2])
+        self.assertEqual([row['index'] for row in response.data['errors']], [1])
+        self.assertEqual(Activity.objects.count(), 2)
+        entry = Leaderboard.objects.get(user_id='user123')
+        self.assertEqual((entry.total_calories, entry.total_activities), (500, 2))
+
+    def test_bulk_ndjson(self):
+        """Test ingesting an NDJSON body."""
+        body = '\n'.join(json.dumps(self.record) for _ in range(3))
+        response = self.client.post(self.url, body, content_type='application/x-ndjson')
+        self.assertEqual(response.status_code, status.HTTP_201_CREATED)
+        self.assertEqual(Activity.objects.count(), 3)
+
+
+class ActivityExportTestCase(APITestCase):
+    """Test cases for streaming activity exports."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.team = Team.objects.create(name="Exporters", description="")
+        self.member = User.objects.create(name="Member", email="member@example.com", team_id=str(self.team._id))
+        for user_id, day in [(str(self.member._id), 1), (str(self.member._id), 10), ("other", 5)]:
+            Activity.objects.create(
+                user_id=user_id,
+                activity_type="running",
+                duration=30,
+                calories=250,
+                date=datetime(2024, 3, day)
+            )
+
+    def export(self, query=''):
+        response = self.client.get(reverse('activity-export') + query)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return b''.join(response.streaming_content).decode()
+
+    def test_ndjson_matches_api(self):
+        """Test that exported rows match the list endpoint output."""
+        rows = [json.loads(line) for line in self.export().splitlines()]
+        listed = self.client.get(reverse('activity-list')).data
+        self.assertEqual(
+            sorted(rows, key=lambda row: row['id']),
+            sorted((dict(row) for row in listed), key=lambda row: row['id'])
+        )
+
+    def test_csv_with_filters(self):
+        """Test CSV output filtered by team and date range."""
+        lines = self.export(f'?output=csv&team_id={self.team._id}&date_after=2024-03-05').splitlines()
+        self.assertEqual(lines[0], 'id,user_id,activity_type,duration,calories,date,created_at')
+        self.assertEqual(len(lines), 2)
+
+
+class ActivityRollupTestCase(APITestCase):
+    """Test cases for daily and weekly activity rollups."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.team = Team.objects.create(name="Rollers", description="")
+        self.user = User.objects.create(name="Roller", email="roller@example.com", team_id=str(self.team._id))
+        url = reverse('activity-list')
+        for day, activity_type, calories in [(1, 'running', 100), (1, 'yoga', 40), (2, 'running', 200)]:
+            self.client.post(url, {
+                'user_id': str(self.user._id),
+                'activity_type': activity_type,
+                'duration': 30,
+                'calories': calories,
+                'date': f'2024-01-0{day}T10:00:00Z'
+            }, format='json')
+
+    def series(self, **params):
+        response = self.client.get(reverse('rollups'), params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return response.data
+
+    def test_daily_user_buckets(self):
+        """Test that daily buckets hold totals and per-type breakdowns."""
+        days = self.series(owner_id=str(self.user._id))
+        self.assertEqual([day['bucket'] for day in days], ['2024-01-01', '2024-01-02'])
+        self.assertEqual((days[0]['calories'], days[0]['count']), (140, 2))
+        self.assertEqual(days[0]['by_type']['yoga']['calories'], 40)
+
+    def test_weekly_team_buckets_match_rebuild(self):
+        """Test that incremental team buckets equal a full rebuild."""
+        params = {'scope': 'team', 'owner_id': str(self.team._id), 'period': 'week'}
+        incremental = self.series(**params)
+        self.assertEqual(incremental[0]['calories'], 340)
+        rollups.rebuild()
+        self.assertEqual(self.series(**params), incremental)
+
+    def test_team_move_then_delete(self):
+        """Test that a moved user's history and later removals follow the current team."""
+        old = {'scope': 'team', 'owner_id': str(self.team._id), 'period': 'week'}
+        team = Team.objects.create(name="Movers", description="")
+        new = dict(old, owner_id=str(team._id))
+        self.client.patch(reverse('user-detail', args=[self.user._id]), {'team_id': str(team._id)}, format='json')
+        activity = Activity.objects.get(calories=100)
+        self.client.delete(reverse('activity-detail', args=[activity._id]))
+
+        self.assertEqual([bucket['calories'] for bucket in self.series(**old)], [0])
+        incremental = self.series(**new)
+        self.assertEqual(incremental[0]['calories'], 240)
+        rollups.rebuild()
+        self.assertEqual(self.series(**old), [])
+        self.assertEqual(self.series(**new), incremental)
+
+
+class EnsureIndexesTestCase(TestCase):
+    """Test cases for the declared indexes."""
+
+    def test_ensure_indexes_is_idempotent(self):
+        """Test that a second run creates nothing."""
+        db = get_db()
+        ensure_indexes(db)
+        self.assertFalse(any(created for _, _, created in ensure_indexes(db)))
+
+    def test_hot_queries_use_indexes(self):
+        """Test that every hot query shape is served by an index."""
+        Activity.objects.create(user_id="user123", activity_type="running", duration=30, calories=250, date=datetime(2024, 1, 1))
+        db = get_db()
+        ensure_indexes(db)
+        for collection, query, sort in HOT_QUERIES:
+            self.assertFalse(uses_collection_scan(db, collection, query, sort), f'{collection} {query} {sort}')
+
+
+class NativeReadPathTestCase(APITestCase):
+    """Test cases for the native pymongo read path."""
+
+    def setUp(self):
+        """Set up test data."""
+        team = Team.objects.create(name="Natives", description="Native team")
+        user = User.objects.create(name="Native", email="native@example.com", team_id=str(team._id))
+        # Inserted out of date order, so natural order differs from the list ordering
+        for day in (2, 5, 1, 4, 3):
+            Activity.objects.create(user_id=str(user._id), activity_type="running", duration=30, calories=50 * day, date=datetime(2024, 1, day))
+        Leaderboard.objects.create(user_id=str(user._id), team_id=str(team._id), total_calories=750, total_activities=5, rank=1)
+        Workout.objects.create(title="Run", description="Run", difficulty="easy", duration=30, calories_estimate=250, exercises=["run"])
+
+    def test_native_output_matches_orm(self):
+        """Test that both read paths return identical JSON."""
+        for basename in ['user', 'team', 'activity', 'leaderboard', 'workout']:
+            url = reverse(f'{basename}-list')
+            with self.settings(OCTOFIT_READ_PATH='orm'):
+                orm_list = self.client.get(url).json()
+            with self.settings(OCTOFIT_READ_PATH='native'):
+                native_list = self.client.get(url).json()
+                detail = reverse(f'{basename}-detail', args=[orm_list[0]['id']])
+                native_detail = self.client.get(detail).json()
+            self.assertEqual(native_list, orm_list, basename)
+            self.assertEqual(native_detail, orm_list[0], basename)
+
+
+class FastReadSerializerTestCase(APITestCase):
+    """Test cases for the fast read serializers and renderer."""
+
+    def setUp(self):
+        """Set up test data."""
+        team = Team.objects.create(name="Fast", description="Fast team")
+        User.objects.create(name="Speedy", email="speedy@example.com", team_id=str(team._id))
+        Activity.objects.create(user_id="user123", activity_type="running", duration=30, calories=250, date=datetime(2024, 1, 1))
+        Leaderboard.objects.create(user_id="user123", team_id=str(team._id), total_calories=250, total_activities=1, rank=1)
+        Workout.objects.create(title="Run", description="Run", difficulty="easy", duration=30, calories_estimate=250, exercises=["run"])
+
+    def test_fast_serializers_match_model_serializers(self):
+        """Test that fast serializers produce the same rows as the model serializers."""
+        pairs = [
+            (User, UserSerializer, FastUserSerializer),
+            (Activity, ActivitySerializer, FastActivitySerializer),
+            (Leaderboard, LeaderboardSerializer, FastLeaderboardSerializer),
+            (Workout, WorkoutSerializer, FastWorkoutSerializer),
+        ]
+        for model, serializer_class, fast_class in pairs:
+            objects = list(model.objects.all())
+            expected = [dict(row) for row in serializer_class(objects, many=True).data]
+            self.assertEqual(fast_class(objects, many=True).data, expected, model.__name__)
+
+    def test_orjson_renderer_matches_json_renderer(self):
+        """Test that the orjson renderer emits byte-identical JSON."""
+        data = TeamSerializer(Team.objects.all(), many=True).data
+        self.assertEqual(ORJSONRenderer().render(data), JSONRenderer().render(data))
+
+
+class ConditionalGetTestCase(APITestCase):
+    """Test cases for ETag and Last-Modified support."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.url = reverse('leaderboard-list')
+        self.client.post(reverse('activity-list'), {
+            'user_id': 'user123',
+            'activity_type': 'running',
+            'duration': 30,
+            'calories': 250,
+            'date': datetime.now().isoformat()
+        }, format='json')
+
+    def test_if_none_match_skips_query(self):
+        """Test that a matching ETag returns 304 without querying the leaderboard."""
+        response = self.client.get(self.url)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('Last-Modified', response)
+        with self.assertNumQueries(0):
+            cached = self.client.get(self.url, HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+        self.assertEqual(cached['ETag'], response['ETag'])
+
+    def test_if_modified_since(self):
+        """Test that If-Modified-Since is honoured."""
+        response = self.client.get(self.url)
+        cached = self.client.get(self.url, HTTP_IF_MODIFIED_SINCE=response['Last-Modified'])
+        self.assertEqual(cached.status_code, status.HTTP_304_NOT_MODIFIED)
+
+    def test_activity_write_changes_etag(self):
+        """Test that an activity write invalidates the leaderboard ETag."""
+        etag = self.client.get(self.url)['ETag']
+        self.client.post(reverse('activity-list'), {
+            'user_id': 'user456',
+            'activity_type': 'cycling',
+            'duration': 45,
+            'calories': 350,
+            'date': datetime.now().isoformat()
+        }, format='json')
+        response = self.client.get(self.url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertNotEqual(response['ETag'], etag)
+
+
+class ResponseCacheTestCase(APITestCase):
+    """Test cases for the write-invalidated response cache."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.url = reverse('workout-list')
+        Workout.objects.create(title="Run", description="Run", difficulty="easy", duration=30, calories_estimate=250, exercises=["run"])
+        response_cache.reset_stats()
+
+    def test_repeat_request_is_served_from_cache(self):
+        """Test that a repeated request skips the database."""
+        first = self.client.get(self.url)
+        self.assertEqual(first['X-Cache'], 'MISS')
+        with self.assertNumQueries(0):
+            second = self.client.get(self.url)
+        self.assertEqual(second['X-Cache'], 'HIT')
+        self.assertEqual(second.json(), first.json())
+        stats = self.client.get(reverse('cache-stats')).data
+        self.assertEqual((stats['hits'], stats['misses']), (1, 1))
+
+    def test_write_invalidates_cache(self):
+        """Test that a client sees its own write immediately."""
+        self.client.get(self.url)
+        self.client.post(self.url, {
+            'title': 'Evening Yoga',
+            'description': 'Relaxing yoga session',
+            'difficulty': 'easy',
+            'duration': 45,
+            'calories_estimate': 150,
+            'exercises': ['stretching']
+        }, format='json')
+        response = self.client.get(self.url)
+        self.assertEqual(response['X-Cache'], 'MISS')
+        self.assertEqual(len(response.json()), 2)
+
+
+@override_settings(OCTOFIT_RANK_INDEX_MAX_AGE=0)
+class RankLookupTestCase(APITestCase):
+    """Test cases for top, around-me and percentile leaderboard lookups."""
+
+    def setUp(self):
+        """Set up test data."""
+        for rank, (user_id, calories) in enumerate([('u1', 500), ('u2', 400), ('u3', 300), ('u4', 200), ('u5', 100)], start=1):
+            Leaderboard.objects.create(user_id=user_id, team_id="team1", total_calories=calories, total_activities=1, rank=rank)
+
+    def test_top(self):
+        """Test the top-k endpoint."""
+        response = self.client.get(reverse('leaderboard-top'), {'k': 2})
+        self.assertEqual([(row['user_id'], row['rank']) for row in response.data], [('u1', 1), ('u2', 2)])
+
+    def test_around(self):
+        """Test the around-me endpoint."""
+        response = self.client.get(reverse('leaderboard-around', args=['u3']), {'radius': 1})
+        self.assertEqual([row['user_id'] for row in response.data], ['u2', 'u3', 'u4'])
+        missing = self.client.get(reverse('leaderboard-around', args=['nobody']))
+        self.assertEqual(missing.status_code, status.HTTP_404_NOT_FOUND)
+
+    def test_percentile(self):
+        """Test the percentile endpoint."""
+        response = self.client.get(reverse('leaderboard-percentile', args=['u2']))
+        self.assertEqual((response.data['rank'], response.data['percentile'], response.data['total_users']), (2, 60.0, 5))
+
+    def test_snapshot_follows_writes_without_rescanning(self):
+        """Test that this process's leaderboard writes move rows within the snapshot."""
+        before = rank_index.snapshot()
+        self.client.post(reverse('activity-list'), {
+            'user_id': 'u5', 'activity_type': 'running', 'duration': 30, 'calories': 450,
+            'date': datetime.now().isoformat()
+        }, format='json')
+        snapshot = rank_index.snapshot()
+        self.assertIsNot(snapshot, before)
+        self.assertEqual(snapshot.version, before.version + 1)
+        self.assertEqual((snapshot.rank('u5'), snapshot.top(3)), (1, ['u5', 'u1', 'u2']))
+        self.assertIs(rank_index.snapshot(), snapshot)
+
+    def test_updated_snapshot_matches_rebuild(self):
+        """Test that moving rows gives the same order as sorting from scratch."""
+        totals = {'a': 300, 'b': 200, 'c': 200, 'd': 100}
+        moved = RankSnapshot(totals, 1).updated({'d': 250, 'a': 200, 'e': 50}, 2)
+        fresh = RankSnapshot(dict(totals, d=250, a=200, e=50), 2)
+        self.assertEqual((moved.keys, moved.ascending, moved.totals), (fresh.keys, fresh.ascending, fresh.totals))
+        self.assertEqual(moved.around('b', 1), ['a', 'b', 'c'])
+        self.assertEqual((len(moved), len(RankSnapshot(totals, 1))), (5, 4))
+
+
+class WindowLeaderboardTestCase(APITestCase):
+    """Test cases for sliding-window leaderboards."""
+
+    def setUp(self):
+        """Set up test data."""
+        db = get_db()
+        for collection in (windows.WINDOW_COLLECTION, windows.WINDOW_STATE_COLLECTION, rollups.ROLLUP_COLLECTION):
+            db[collection].delete_many({})
+        self.now = timezone.now()
+        for user_id, days_ago, calories in [
+            ('u1', 0, 100), ('u1', 3, 200), ('u1', 10, 300), ('u1', 40, 400),
+            ('u2', 1, 250), ('u2', 6, 150), ('u2', 20, 500),
+        ]:
+            self.client.post(reverse('activity-list'), {
+                'user_id': user_id,
+                'activity_type': 'running',
+                'duration': 30,
+                'calories': calories,
+                'date': (self.now - timedelta(days=days_ago)).isoformat()
+            }, format='json')
+
+    def brute_force(self, window, day):
+        start = windows.window_start(window, day)
+        totals = {}
+        for activity in Activity.objects.all():
+            if start <= activity.date.astimezone(dt_timezone.utc).date() <= day:
+                calories, count = totals.get(activity.user_id, (0, 0))
+                totals[activity.user_id] = (calories + activity.calories, count + 1)
+        return totals
+
+    def window_totals(self, rows):
+        return {row['user_id']: (row['total_calories'], row['total_activities']) for row in rows}
+
+    def test_windows_match_brute_force(self):
+        """Test each window against a recompute from raw activities."""
+        for window in windows.WINDOWS:
+            response = self.client.get(reverse('leaderboard-list'), {'window': window})
+            self.assertEqual(response.status_code, status.HTTP_200_OK)
+            self.assertEqual(self.window_totals(response.data), self.brute_force(window, windows.today()), window)
+            ranks = [row['rank'] for row in response.data]
+            self.assertEqual(ranks, sorted(ranks))
+
+    def test_expired_days_are_subtracted(self):
+        """Test that moving the window forward subtracts expired days."""
+        windows.advance('7d')
+        later = windows.today() + timedelta(days=4)
+        rows = windows.ranked('7d', later)
+        self.assertEqual(self.window_totals(rows), self.brute_force('7d', later))
+
+    def test_future_activities_enter_the_window(self):
+        """Test that an activity dated ahead of the window is counted once the window reaches it."""
+        self.client.post(reverse('activity-list'), {
+            'user_id': 'u2', 'activity_type': 'running', 'duration': 30, 'calories': 600,
+            'date': (self.now + timedelta(days=2)).isoformat()
+        }, format='json')
+        self.assertEqual(self.window_totals(windows.ranked('7d')), self.brute_force('7d', windows.today()))
+        later = windows.today() + timedelta(days=3)
+        self.assertEqual(self.window_totals(windows.ranked('7d', later)), self.brute_force('7d', later))
+
+    def test_invalid_window(self):
+        """Test that an unknown window is rejected."""
+        response = self.client.get(reverse('leaderboard-list'), {'window': 'forever'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+
+class PopulateDbTestCase(TestCase):
+    """Test cases for the synthetic data generator."""
+
+    def test_synthetic_users_and_activities(self):
+        """Test that synthetic seeding writes the requested volume and derived data."""
+        call_command('populate_db', users=25, teams=3, activities_per_user=4, seed=7, workers=1, stdout=StringIO())
+        self.assertEqual(Team.objects.count(), 3)
+        self.assertEqual(User.objects.count(), 25)
+        self.assertEqual(Activity.objects.count(), 100)
+        self.assertEqual(Leaderboard.objects.count(), 25)
+        self.assertEqual(Leaderboard.objects.filter(rank=1).first().total_activities, 4)
+        self.assertEqual(len({user.team_id for user in User.objects.all()}), 3)
+
+
+class BenchmarkHelpersTestCase(TestCase):
+    """Test cases for the endpoint benchmark helpers."""
+
+    def test_percentiles_use_nearest_rank(self):
+        """Test that percentiles pick an observed latency."""
+        values = [float(value) for value in range(1, 101)]
+        self.assertEqual(benchmarks.percentile(values, 50), 50.0)
+        self.assertEqual(benchmarks.percentile(values, 99), 99.0)
+        self.assertEqual(benchmarks.percentile([3.0], 95), 3.0)
+
+    def test_regressions_beyond_threshold(self):
+        """Test that only growth above the threshold is reported."""
+        def run(p95, commands):
+            return {'scales': {'1k': {'endpoints': {'activity-list': {
+                'p95_ms': p95, 'mongo_commands_per_request': commands,
+            }}}}}
+        self.assertEqual(benchmarks.regressions(run(11.0, 2), run(10.0, 2), 0.2), [])
+        found = benchmarks.regressions(run(13.0, 3), run(10.0, 2), 0.2)
+        self.assertEqual(len(found), 2)
+
+    def test_endpoints_cover_router_get_routes(self):
+        """Test that every GET route of the router is benchmarked."""
+        samples = {'user': 'u1', 'team': 't1', 'activity': 'a1', 'leaderboard': 'l1', 'workout': 'w1',
+                   'user_id': 'u1'}
+        names = [name for name, _ in benchmarks.endpoints(router, samples, {'activity': 10 ** 6}, 10000)]
+        self.assertIn('activity-export', names)
+        self.assertIn('leaderboard-around', names)
+        self.assertIn('workout-detail', names)
+        self.assertNotIn('activity-list', names)
+        self.assertNotIn('activity-bulk', names)
+
+
+class ProfilingMiddlewareTestCase(APITestCase):
+    """Test cases for per-request profiling."""
+
+    def setUp(self):
+        """Set up test data."""
+        User.objects.create(name="Alice", email="alice@example.com", team_id="team1")
+        self.url = reverse('user-list')
+
+    def test_server_timing_header(self):
+        """Test that every response reports its phase timings."""
+        response = self.client.get(self.url)
+        timing = response['Server-Timing']
+        for phase in ('total', 'db', 'mongo', 'app', 'render'):
+            self.assertIn(f'{phase};dur=', timing)
+        self.assertRegex(timing, r'db;dur=[\d.]+;desc="[1-9]\d* queries"')
+
+    @override_settings(OCTOFIT_SLOW_REQUEST_MS=0)
+    def test_slow_request_log_includes_queries(self):
+        """Test that slow requests are logged with SQL and Mongo commands."""
+        with self.assertLogs('octofit_tracker.slow_requests', level='WARNING') as logs:
+            self.client.get(self.url)
+        entry = json.loads(logs.records[0].getMessage())
+        self.assertEqual(entry['path'], self.url)
+        self.assertTrue(entry['queries'])
+        self.assertTrue(any(command['command_name'] == 'find' for command in entry['mongo_commands']))
+
+    def test_query_count_is_not_capped(self):
+        """Test that every statement is counted though only the first ones are kept for the log."""
+        profile = profiling.RequestProfile()
+        for _ in range(profiling.MAX_LOGGED_QUERIES + 10):
+            profile.execute(lambda *args: None, 'SELECT 1', (), False, {})
+        self.assertEqual(profile.query_count, profiling.MAX_LOGGED_QUERIES + 10)
+        self.assertEqual(len(profile.queries), profiling.MAX_LOGGED_QUERIES)
+
+    def test_sampled_requests_are_profiled(self):
+        """Test that sampled requests leave a cProfile dump."""
+        with tempfile.TemporaryDirectory() as directory:
+            with self.settings(OCTOFIT_PROFILE_SAMPLE_RATE=1.0, OCTOFIT_PROFILE_DIR=directory):
+                self.client.get(self.url)
+            self.assertEqual(len(os.listdir(directory)), 1)
+
+
+class SparseFieldsTestCase(APITestCase):
+    """Test cases for ?fields= sparse fieldsets."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.team = Team.objects.create(name="Team Blue", description="Blue team")
+        User.objects.create(name="Alice", email="alice@example.com", team_id=str(self.team._id))
+        Workout.objects.create(
+            title="Morning Run", description="Easy run", difficulty="easy",
+            duration=30, calories_estimate=250, exercises=["warm-up", "run"]
+        )
+        for days_ago in range(3):
+            Activity.objects.create(
+                user_id="user1", activity_type="running", duration=30, calories=300,
+                date=timezone.now() - timedelta(days=days_ago)
+            )
+
+    def test_fields_trim_output_and_projection(self):
+        """Test that only requested fields are returned and read from MongoDB."""
+        with CaptureQueriesContext(connection) as captured:
+            response = self.client.get(reverse('workout-list'), {'fields': 'title,difficulty'})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual(response.data, [{'title': 'Morning Run', 'difficulty': 'easy'}])
+        self.assertFalse(any('exercises' in query['sql'] for query in captured.captured_queries))
+
+    def test_fields_with_cursor_pagination(self):
+        """Test that sparse fieldsets work on paginated lists."""
+        url = reverse('activity-list')
+        response = self.client.get(url, {'fields': 'id,calories', 'page_size': 2})
+        self.assertEqual([set(row) for row in response.data['results']], [{'id', 'calories'}] * 2)
+        response = self.client.get(response.data['next'])
+        self.assertEqual(len(response.data['results']), 1)
+
+    def test_omitted_method_field_skips_query(self):
+        """Test that teams without member_count skip the member count query."""
+        with self.assertNumQueries(1):
+            response = self.client.get(reverse('team-list'), {'fields': 'name'})
+        self.assertEqual(response.data, [{'name': 'Team Blue'}])
+
+    def test_unknown_field_is_rejected(self):
+        """Test that unknown field names return 400."""
+        response = self.client.get(reverse('user-list'), {'fields': 'name,password'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_native_path_matches_orm(self):
+        """Test that the native read path honours ?fields= the same way."""
+        params = {'fields': 'id,name,member_count'}
+        expected = self.client.get(reverse('team-list'), params).data
+        with override_settings(OCTOFIT_READ_PATH='native'):
+            response = self.client.get(reverse('team-list'), params)
+        self.assertEqual(response.data, expected)
+        self.assertEqual(expected[0]['member_count'], 1)
+
+
+class ActivityFilterTestCase(APITestCase):
+    """Test cases for activity filtering and ordering."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.alice = User.objects.create(name="Alice", email="alice@example.com", team_id="team1")
+        self.bob = User.objects.create(name="Bob", email="bob@example.com", team_id="team1")
+        self.carol = User.objects.create(name="Carol", email="carol@example.com", team_id="team2")
+        self.url = reverse('activity-list')
+        day = datetime(2024, 3, 10, tzinfo=dt_timezone.utc)
+        for offset, (user, activity_type) in enumerate([
+            (self.alice, "running"), (self.alice, "cycling"), (self.bob, "running"), (self.carol, "running"),
+        ]):
+            Activity.objects.create(
+                user_id=str(user._id), activity_type=activity_type, duration=30,
+                calories=100 * (offset + 1), date=day + timedelta(days=offset)
+            )
+
+    def calories(self, params):
+        response = self.client.get(self.url, params)
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        return [row['calories'] for row in response.data]
+
+    def test_filters(self):
+        """Test each filter and a combination, newest first by default."""
+        self.assertEqual(self.calories({'user_id': str(self.alice._id)}), [200, 100])
+        self.assertEqual(self.calories({'activity_type': 'running'}), [400, 300, 100])
+        self.assertEqual(self.calories({'date_after': '2024-03-11', 'date_before': '2024-03-13'}), [300, 200])
+        self.assertEqual(self.calories({'team_id': 'team1'}), [300, 200, 100])
+        self.assertEqual(self.calories({'team_id': 'team1', 'activity_type': 'running'}), [300, 100])
+        self.assertEqual(self.calories({'team_id': 'team2', 'user_id': str(self.alice._id)}), [])
+
+    def test_ordering_is_limited_to_indexed_keys(self):
+        """Test that indexed orderings apply and others fall back to the default."""
+        self.assertEqual(self.calories({'ordering': 'date'}), [100, 200, 300, 400])
+        self.assertEqual(self.calories({'ordering': 'calories'}), [400, 300, 200, 100])
+        self.assertEqual(self.calories({'ordering': 'activity_type'}), [400, 300, 200, 100])
+        response = self.client.get(self.url, {'ordering': 'date', 'page_size': 3})
+        self.assertEqual([row['calories'] for row in response.data['results']], [100, 200, 300])
+
+    def test_every_filter_combination_uses_an_index(self):
+        """Test that explain() shows no collection scan for any filter combination."""
+        db = get_db()
+        ensure_indexes(db)
+        filters = {
+            'user_id': str(self.alice._id),
+            'team_id': 'team1',
+            'activity_type': 'running',
+            'date_after': '2024-03-11',
+        }
+        names = list(filters)
+        for mask in range(2 ** len(names)):
+            params = {name: filters[name] for bit, name in enumerate(names) if mask & (1 << bit)}
+            query = mongo_query(activity_lookups(params))
+            for field in ActivityViewSet.ordering_fields:
+                for direction in (1, -1):
+                    sort = [(field, direction), ('_id', direction)]
+                    self.assertFalse(uses_collection_scan(db, 'activities', query, sort), f'{params} {sort}')
+
+
+class WriteBehindQueueTestCase(APITestCase):
+    """Test cases for write-behind activity creation."""
+
+    def setUp(self):
+        """Set up test data."""
+        self.user = User.objects.create(name="Alice", email="alice@example.com", team_id="team1")
+        self.data = {
+            'user_id': str(self.user._id),
+            'activity_type': 'running',
+            'duration': 30,
+            'calories': 300,
+            'date': datetime.now().isoformat()
+        }
+
+    @override_settings(OCTOFIT_WRITE_BEHIND=True)
+    def test_create_is_accepted_and_written_on_flush(self):
+        """Test that queued activities get an id up front and reach the database."""
+        response = self.client.post(reverse('activity-list'), self.data, format='json')
+        self.assertEqual(response.status_code, status.HTTP_202_ACCEPTED)
+        self.assertTrue(write_queue.flush(timeout=10))
+        activity = Activity.objects.get(_id=response.data['id'])
+        self.assertEqual(activity.calories, 300)
+        self.assertEqual(Leaderboard.objects.get(user_id=str(self.user._id)).total_calories, 300)
+
+    @override_settings(OCTOFIT_WRITE_BEHIND=True)
+    def test_invalid_records_are_rejected_immediately(self):
+        """Test that validation still happens before queueing."""
+        response = self.client.post(reverse('activity-list'), {'user_id': 'x'}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_full_queue_applies_backpressure(self):
+        """Test that a full queue refuses records and shutdown writes the rest."""
+        queue = WriteBehindQueue(max_size=2, batch_size=100, flush_interval=60)
+        record = {'user_id': 'user1', 'activity_type': 'running', 'duration': 30, 'calories': 100,
+                  'date': timezone.now()}
+        queue.submit(dict(record))
+        queue.submit(dict(record))
+        with self.assertRaises(QueueFull):
+            queue.submit(dict(record))
+        self.assertEqual(queue.stats()['depth'], 2)
+        queue.shutdown()
+        stats = queue.stats()
+        self.assertEqual((stats['written'], stats['rejected'], stats['depth']), (2, 1, 0))
+        self.assertEqual(Activity.objects.filter(user_id='user1').count(), 2)
+
+
+@skipUnless(async_views.AsyncIOMotorClient, 'motor is not installed')
+class AsyncEndpointsTestCase(APITestCase):
+    """Test cases for the /api/async/ read endpoints."""
+
+    def setUp(self):
+        """Set up test data."""
+        Leaderboard.objects.create(user_id="user1", team_id="team1", total_calories=500,
+                                   total_activities=2, rank=2)
+        Leaderboard.objects.create(user_id="user2", team_id="team1", total_calories=900,
+                                   total_activities=3, rank=1)
+        Workout.objects.create(
+            title="Morning Run", description="Easy run", difficulty="easy",
+            duration=30, calories_estimate=250, exercises=["warm-up", "run"]
+        )
+        for user_id, activity_type in (("user1", "running"), ("user1", "cycling"), ("user2", "running")):
+            Activity.objects.create(user_id=user_id, activity_type=activity_type, duration=30,
+                                    calories=300, date=timezone.now())
+
+    def assertSameAsSync(self, sync_name, async_name, query=''):
+        sync = self.client.get(f'{reverse(sync_name)}{query}', HTTP_ACCEPT='application/json')
+        asynchronous = self.client.get(f'{reverse(async_name)}{query}', HTTP_ACCEPT='application/json')
+        self.assertEqual(asynchronous.status_code, status.HTTP_200_OK)
+        self.assertEqual(json.loads(asynchronous.content), json.loads(sync.content))
+
+    def test_lists_match_sync_viewsets(self):
+        """Test that the async endpoints return the same JSON as the sync lists."""
+        self.assertSameAsSync('leaderboard-list', 'async-leaderboard-list')
+        self.assertSameAsSync('workout-list', 'async-workout-list', '?fields=id,title')
+        self.assertSameAsSync('activity-list', 'async-activity-list', '?user_id=user1&activity_type=running')
+
+    def test_invalid_parameters_are_rejected(self):
+        """Test that bad filters and fields answer 400."""
+        response = self.client.get(f'{reverse("async-activity-list")}?date_after=soon')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(f'{reverse("async-workout-list")}?fields=nope')
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+
+    def test_served_through_asgi(self):
+        """Test that the endpoints are served by the ASGI handler."""
+        application = get_asgi_application()
+        code, body = asyncio.run(benchmarks.asgi_get(application, reverse('async-leaderboard-list')))
+        self.assertEqual(code, 200)
+        self.assertEqual([entry['rank'] for entry in json.loads(body)], [1, 2])
+
+
+class TranslationCacheTestCase(APITestCase):
+    """Test cases for the SQL translation cache in the database backend."""
+
+    def test_lru_eviction_and_stats(self):
+        """Test that the least recently used template is evicted."""
+        cache = TranslationCache(max_size=2)
+        first = cache.parse('SELECT "a" FROM "t"')
+        cache.parse('SELECT "b" FROM "t"')
+        self.assertIs(cache.parse('SELECT "a" FROM "t"'), first)
+        cache.parse('SELECT "c" FROM "t"')
+        cache.parse('SELECT "b" FROM "t"')
+        stats = cache.stats()
+        self.assertEqual((stats['hits'], stats['misses'], stats['evictions']), (1, 4, 2))
+        self.assertEqual(stats['size'], 2)
+        self.assertAlmostEqual(stats['hit_rate'], 0.2)
+
+    def test_repeated_queries_hit_with_new_parameters(self):
+        """Test that one query shape is parsed once and still binds each call's values."""
+        User.objects.create(name="Alice", email="alice@example.com", team_id="team1")
+        User.objects.create(name="Bob", email="bob@example.com", team_id="team2")
+        list(User.objects.filter(team_id="warmup"))
+        translation_cache.reset_stats()
+        self.assertEqual(User.objects.get(team_id="team1").name, "Alice")
+        self.assertEqual(User.objects.get(team_id="team2").name, "Bob")
+        self.assertEqual(User.objects.filter(name__icontains="ali").count(), 1)
+        stats = translation_cache.stats()
+        self.assertGreaterEqual(stats['hits'], 2)
+        self.assertGreater(stats['parse_ms_saved'], 0)
+
+    def test_stats_endpoint(self):
+        """Test that the hit rate is exposed over the API."""
+        response = self.client.get(reverse('sql-cache-stats'))
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertIn('hit_rate', response.data)
+
+
+class LeaderboardStreamTestCase(APITestCase):
+    """Test cases for the leaderboard Server-Sent Events stream."""
+
+    def test_bursts_are_coalesced(self):
+        """Test that changes within one interval become one message with the latest rows."""
+        broker = LeaderboardBroker(interval=0.2, queue_size=16, source='local')
+
+        async def collect():
+            subscription = broker.subscribe(asyncio.get_running_loop())
+            rows = [{'user_id': 'user1', 'total_calories': calories, 'total_activities': 1, 'rank': 1}
+                    for calories in range(100, 110)]
+            await asyncio.to_thread(broker.publish, rows)
+            messages = [await asyncio.wait_for(subscription.queue.get(), 5)]
+            await asyncio.sleep(0.5)
+            while not subscription.queue.empty():
+                messages.append(subscription.queue.get_nowait())
+            return messages
+
+        messages = asyncio.run(collect())
+        self.assertEqual(len(messages), 1)
+        self.assertIn(b'event: ranks', messages[0])
+        self.assertIn(b'"total_calories":109', messages[0])
+        self.assertNotIn(b'"total_calories":108', messages[0])
+
+    def test_lagging_subscriber_is_reset(self):
+        """Test that a full queue is replaced by a reset message."""
+        async def overflow():
+            subscription = Subscription(asyncio.get_running_loop(), max_size=2)
+            for message in (b'a', b'b', b'c'):
+                subscription.deliver(message)
+            return [subscription.queue.get_nowait() for _ in range(subscription.queue.qsize())]
+
+        self.assertEqual(asyncio.run(overflow()), [RESET_MESSAGE])
+
+    def test_stream_pushes_activity_changes(self):
+        """Test that a new activity reaches an open stream."""
+        user = User.objects.create(name="Alice", email="alice@example.com", team_id="team1")
+        data = {'user_id': str(user._id), 'activity_type': 'running', 'duration': 30, 'calories': 300,
+                'date': timezone.now().isoformat()}
+
+        async def stream():
+            sent, disconnected = [], asyncio.Event()
+
+            async def receive():
+                await disconnected.wait()
+                return {'type': 'http.disconnect'}
+
+            async def send(message):
+                sent.append(message)
+
+            scope = {'type': 'http', 'method': 'GET', 'path': STREAM_PATH}
+            task = asyncio.ensure_future(leaderboard_events(scope, receive, send))
+            await asyncio.sleep(0.1)
+            await asyncio.to_thread(self.client.post, reverse('activity-list'), data, format='json')
+            for _ in range(50):
+                if any(b'event: ranks' in message.get('body', b'') for message in sent):
+                    break
+                await asyncio.sleep(0.1)
+            disconnected.set()
+            await task
+            return sent
+
+        sent = asyncio.run(stream())
+        self.assertEqual(sent[0]['status'], 200)
+        self.assertIn((b'content-type', b'text/event-stream'), sent[0]['headers'])
+        body = b''.join(message.get('body', b'') for message in sent[1:])
+        self.assertIn(f'"user_id":"{user._id}","total_calories":300'.encode(), body)
+
+
+@override_settings(OCTOFIT_SYNC_OVERLAP_SECONDS=0)
+class DeltaSyncTestCase(APITestCase):
+    """Test cases for ?since= delta sync with tombstones."""
+
+    def setUp(self):
+        """Set up test data written well before the sync cursor."""
+        self.users = [
+            User.objects.create(name=f"User {index}", email=f"user{index}@example.com", team_id="team1")
+            for index in range(5)
+        ]
+        get_db()[User._meta.db_table].update_many(
+            {}, {'$set': {'updated_at': datetime.utcnow() - timedelta(hours=1)}}
+        )
+        self.url = reverse('user-list')
+
+    def test_cursor_round_trip(self):
+        """Test that cursors keep the timestamp to the millisecond and the tie-breaking id."""
+        moment = datetime(2024, 5, 1, 12, 30, 15, 123000)
+        user_id = self.users[0]._id
+        self.assertEqual(decode_cursor(encode_cursor(moment, user_id)), (moment, user_id))
+        self.assertEqual(decode_cursor(encode_cursor(moment)), (moment, None))
+
+    def test_since_returns_only_changes_and_tombstones(self):
+        """Test that a refresh carries the changed and deleted documents only."""
+        cursor = self.client.get(self.url)[CURSOR_HEADER]
+        changed, deleted = self.users[1], self.users[2]
+        self.client.patch(reverse('user-detail', args=[changed._id]), {'name': 'Renamed'}, format='json')
+        self.client.delete(reverse('user-detail', args=[deleted._id]))
+
+        response = self.client.get(self.url, {'since': cursor})
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        self.assertEqual([record['id'] for record in response.data['changes']], [str(changed._id)])
+        self.assertEqual(response.data['changes'][0]['name'], 'Renamed')
+        self.assertEqual(response.data['deleted'], [str(deleted._id)])
+        self.assertFalse(response.data['more'])
+
+        response = self.client.get(self.url, {'since': response.data['cursor']})
+        self.assertEqual((response.data['changes'], response.data['deleted']), ([], []))
+
+    def test_member_changes_touch_teams(self):
+        """Test that a user joining a team sends the team's new member_count."""
+        team = Team.objects.create(name="Blue Team", description="Team Blue")
+        get_db()[Team._meta.db_table].update_many(
+            {}, {'$set': {'updated_at': datetime.utcnow() - timedelta(hours=1)}}
+        )
+        cursor = self.client.get(reverse('team-list'))[CURSOR_HEADER]
+        self.client.patch(reverse('user-detail', args=[self.users[0]._id]), {'team_id': str(team._id)}, format='json')
+
+        response = self.client.get(reverse('team-list'), {'since': cursor})
+        self.assertEqual(
+            [(record['id'], record['member_count']) for record in response.data['changes']], [(str(team._id), 1)]
+        )
+
+    @override_settings(OCTOFIT_SYNC_MAX_CHANGES=2)
+    def test_pages_follow_cursor(self):
+        """Test that documents sharing one timestamp are paged by id without gaps."""
+        cursor = encode_cursor(datetime.utcnow() - timedelta(minutes=1))
+        record = {'user_id': 'user1', 'activity_type': 'running', 'duration': 30, 'calories': 250,
+                  'date': timezone.now().isoformat()}
+        self.client.post(reverse('activity-bulk'), [record] * 5, format='json')
+        seen, pages = [], 0
+        while True:
+            response = self.client.get(reverse('activity-list'), {'since': cursor, 'fields': 'id'})
+            seen += [record['id'] for record in response.data['changes']]
+            cursor, pages = response.data['cursor'], pages + 1
+            if not response.data['more']:
+                break
+        self.assertEqual(pages, 3)
+        self.assertEqual(len(set(seen)), 5)
+
+    def test_invalid_and_expired_cursors(self):
+        """Test that bad cursors are rejected and expired ones ask for a full download."""
+        response = self.client.get(self.url, {'since': 'not-a-cursor!'})
+        self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
+        response = self.client.get(self.url, {'since': encode_cursor(datetime.utcnow() - timedelta(days=60))})
+        self.assertEqual(response.status_code, status.HTTP_410_GONE)
+
+
+class BatchTestCase(APITestCase):
+    """Test cases for the batched read endpoint."""
+
+    def setUp(self):
+        """Set up test data."""
+        User.objects.create(name="Alice", email="alice@example.com", team_id="team1")
+        Team.objects.create(name="Blue Team", description="Team Blue")
+        self.url = reverse('batch')
+
+    def test_parts_match_separate_requests(self):
+        """Test that every part carries the body and status of the same GET made alone."""
+        paths = {
+            'users': '/api/users/?fields=id,name',
+            'teams': '/api/teams/',
+            'leaderboard': '/api/leaderboard/',
+            'missing': '/api/nothing-here/',
+        }
+        response = self.client.post(self.url, {'requests': paths}, format='json')
+        self.assertEqual(response.status_code, status.HTTP_200_OK)
+        parts = json.loads(response.content)['responses']
+        self.assertEqual(list(parts), list(paths))
+        for name in ('users', 'teams', 'leaderboard'):
+            alone = self.client.get(paths[name])
+            self.assertEqual(parts[name]['status'], alone.status_code)
+            self.assertEqual(parts[name]['body'], json.loads(alone.content))
+        self.assertEqual(parts['missing']['status'], status.HTTP_404_NOT_FOUND)
+        self.assertIn('ETag', parts['teams']['headers'])
+        self.assertIn(CURSOR_HEADER, parts['users']['headers'])
+
+    def test_rejected_parts(self):
+        """Test that nested batches and streaming exports are refused per part."""
+        paths = {'nested': '/api/batch/', 'export': '/api/activities/export/?output=csv'}
+        parts = json.loads(self.client.post(self.url, {'requests': paths}, format='json').content)['responses']
+        self.assertEqual(parts['nested']['status'], status.HTTP_400_BAD_REQUEST)
+        self.assertEqual(parts['export']['status'], status.HTTP_400_BAD_REQUEST)
+
+    @skipUnless(async_views.AsyncIOMotorClient, 'motor is not installed')
+    def test_async_parts_are_rejected(self):
+        """Test that async views are refused per part instead of failing."""
+        paths = {'async': '/api/async/workouts/'}
+        parts = json.loads(self.client.post(self.url, {'requests': paths}, format='json').content)['responses']
+        self.assertEqual(parts['async']['status'], status.HTTP_400_BAD_REQUEST)
+
+    @override_settings(OCTOFIT_BATCH_MAX_REQUESTS=2)
+    def test_invalid_batches(self):
+        """Test that malformed, oversized and non-API batches are rejected whole."""
+        for body in ({}, {'requests': []}, {'requests': {'admin': '/admin/'}},
+                     {'requests': {name: '/api/users/' for name in 'abc'}}):
+            response = self.client.post(self.url, body, format='json')
+            self.assertEqual(response.status_code, status.HTTP_400_BAD_REQUEST)
@@ -17,8 +17,14 @@ import os
 from django.contrib import admin
 from django.urls import path, include
 from rest_framework import routers
+from . import async_views
+from .batch import batch
 from .views import (
     api_root,
+    activity_rollups,
+    cache_stats,
+    sql_cache_stats,
+    write_queue_stats,
     UserViewSet,
     TeamViewSet,
     ActivityViewSet,
@@ -45,5 +51,18 @@ urlpatterns = [
     path('admin/', admin.site.urls),
     path('', api_root, name='api-root'),
     path('api/', api_root, name='api-root'),
+    path('api/rollups/', activity_rollups, name='rollups'),
+    path('api/cache/stats/', cache_stats, name='cache-stats'),
+    path('api/write-queue/stats/', write_queue_stats, name='write-queue-stats'),
+    path('api/sql-cache/stats/', sql_cache_stats, name='sql-cache-stats'),
+    path('api/batch/', batch, name='batch'),
     path('api/', include(router.urls)),
 ]
+
+# Async read endpoints for ASGI deployments, when motor is installed
+if async_views.AsyncIOMotorClient is not None:
+    urlpatterns += [
+        path('api/async/leaderboard/', async_views.leaderboard_list, name='async-leaderboard-list'),
+        path('api/async/activities/', async_views.activity_list, name='async-activity-list'),
+        path('api/async/workouts/', async_views.workout_list, name='async-workout-list'),
+    ]
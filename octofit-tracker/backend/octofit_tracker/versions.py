@@ -0,0 +1,45 @@
+"""
+Per-collection version counters.
+
+Every write bumps the version of the collection it touches, so readers can
+tell whether anything changed with a single ``_id`` lookup. They back the
+ETag / Last-Modified headers and the response cache of the read endpoints.
+ORM writes are versioned through model signals; code that writes with
+pymongo directly calls ``bump`` itself.
+"""
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from .mongo import get_db, to_mongo_datetime
+
+VERSION_COLLECTION = 'collection_versions'
+
+
+def bump(*collections):
+    """Advance the version of each named collection."""
+    versions = get_db()[VERSION_COLLECTION]
+    now = to_mongo_datetime(timezone.now())
+    for name in collections:
+        versions.update_one(
+            {'_id': name},
+            {'$inc': {'version': 1}, '$set': {'updated_at': now}},
+            upsert=True,
+        )
+
+
+def current(collections):
+    """Return {name: (version, updated_at)}; unknown collections are (0, None)."""
+    found = {
+        row['_id']: (row['version'], row.get('updated_at'))
+        for row in get_db()[VERSION_COLLECTION].find({'_id': {'$in': list(collections)}})
+    }
+    return {name: found.get(name, (0, None)) for name in collections}
+
+
+@receiver(post_save)
+@receiver(post_delete)
+def bump_model_collection(sender, **kwargs):
+    """Version every ORM write to one of this app's models, whoever makes it."""
+    if sender._meta.app_label == 'octofit_tracker':
+        bump(sender._meta.db_table)
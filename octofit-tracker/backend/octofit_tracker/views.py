@@ -1,5 +1,9 @@
-from rest_framework import viewsets
-from rest_framework.decorators import api_view
+from bson import ObjectId
+from django.conf import settings
+from django.http import Http404, StreamingHttpResponse
+from rest_framework import status, viewsets
+from rest_framework.decorators import action, api_view
+from rest_framework.parsers import JSONParser
 from rest_framework.response import Response
 from rest_framework.reverse import reverse
 from .models import User, Team, Activity, Leaderboard, Workout
@@ -8,8 +12,49 @@ from .serializers import (
     TeamSerializer,
     ActivitySerializer,
     LeaderboardSerializer,
-    WorkoutSerializer
+    WorkoutSerializer,
+    FastUserSerializer,
+    FastTeamSerializer,
+    FastActivitySerializer,
+    FastLeaderboardSerializer,
+    FastWorkoutSerializer
 )
+from .conditional import ConditionalGetMixin
+from .delta_sync import DeltaSyncMixin, touch
+from .db_backend.translation_cache import translation_cache
+from .exports import (
+    activity_export_filter,
+    activity_records,
+    csv_stream,
+    ndjson_stream
+)
+from .filters import ActivityFilterBackend, IndexedOrderingFilter, parse_date_param
+from .ingest import insert_activities
+from .native_reads import NativeReader, NativeReadMixin
+from .pagination import (
+    ActivityCursorPagination,
+    IdCursorPagination,
+    LeaderboardCursorPagination
+)
+from .parsers import NDJSONParser
+from .rank_index import rank_index
+from .response_cache import CachedResponseMixin
+from .signals import activities_changed, activity_snapshot, team_changed
+from .sparse_fields import SparseFieldsMixin
+from .write_queue import write_queue
+from . import response_cache, rollups, windows
+
+
+class FastReadMixin:
+    """
+    Uses a FastReadSerializer for GET list and retrieve requests.
+    """
+    read_serializer_class = None
+
+    def get_serializer_class(self):
+        if self.request.method == 'GET' and self.action in ('list', 'retrieve'):
+            return self.read_serializer_class
+        return super().get_serializer_class()
 
 
 @api_view(['GET'])
@@ -23,44 +68,347 @@ def api_root(request, format=None):
         'activities': reverse('activity-list', request=request, format=format),
         'leaderboard': reverse('leaderboard-list', request=request, format=format),
         'workouts': reverse('workout-list', request=request, format=format),
+        'rollups': reverse('rollups', request=request, format=format),
+        'cache_stats': reverse('cache-stats', request=request, format=format),
+        'write_queue_stats': reverse('write-queue-stats', request=request, format=format),
+        'sql_cache_stats': reverse('sql-cache-stats', request=request, format=format),
+        'batch': reverse('batch', request=request, format=format),
     })
 
 
-class UserViewSet(viewsets.ModelViewSet):
+@api_view(['GET'])
+def cache_stats(request, format=None):
+    """
+    Hit/miss counters of the response cache in this process.
+    """
+    return Response(response_cache.stats())
+
+
+@api_view(['GET'])
+def write_queue_stats(request, format=None):
+    """
+    Depth, throughput and flush latency of the activity write-behind queue.
+    """
+    return Response(write_queue.stats())
+
+
+@api_view(['GET'])
+def sql_cache_stats(request, format=None):
+    """
+    Hit rate and parsing time saved by the SQL translation cache in this process.
+    """
+    return Response(translation_cache.stats())
+
+
+@api_view(['GET'])
+def activity_rollups(request, format=None):
+    """
+    Time series of pre-aggregated activity totals for one user or team.
+
+    Query parameters: scope (user or team), owner_id, period (day or week),
+    and optional date_after / date_before bounds on the bucket start.
+    """
+    params = request.query_params
+    scope = params.get('scope', 'user')
+    period = params.get('period', 'day')
+    owner_id = params.get('owner_id')
+    errors = {}
+    if scope not in rollups.SCOPES:
+        errors['scope'] = f'Choose one of: {", ".join(rollups.SCOPES)}.'
+    if period not in rollups.PERIODS:
+        errors['period'] = f'Choose one of: {", ".join(rollups.PERIODS)}.'
+    if not owner_id:
+        errors['owner_id'] = 'This parameter is required.'
+    if errors:
+        return Response(errors, status=status.HTTP_400_BAD_REQUEST)
+
+    buckets = rollups.series(
+        scope, owner_id, period,
+        parse_date_param(params, 'date_after'),
+        parse_date_param(params, 'date_before')
+    )
+    for bucket in buckets:
+        bucket['start'] = bucket['start'].date().isoformat()
+    return Response(buckets)
+
+
+class UserViewSet(DeltaSyncMixin, SparseFieldsMixin, NativeReadMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing users.
     """
     queryset = User.objects.all()
     serializer_class = UserSerializer
+    read_serializer_class = FastUserSerializer
+    pagination_class = IdCursorPagination
+
+    # A team's member_count changes with its users; let delta sync clients see it
+    def perform_create(self, serializer):
+        user = serializer.save()
+        touch(Team._meta.db_table, [user.team_id])
 
+    def perform_update(self, serializer):
+        previous = serializer.instance.team_id
+        user = serializer.save()
+        if user.team_id != previous:
+            touch(Team._meta.db_table, [previous, user.team_id])
+            team_changed.send(sender=User, user_id=str(user.pk), previous=previous, current=user.team_id)
 
-class TeamViewSet(viewsets.ModelViewSet):
+    def perform_destroy(self, instance):
+        user_id = str(instance.pk)
+        super().perform_destroy(instance)
+        touch(Team._meta.db_table, [instance.team_id])
+        team_changed.send(sender=User, user_id=user_id, previous=instance.team_id, current=None)
+
+
+class TeamViewSet(DeltaSyncMixin, ConditionalGetMixin, SparseFieldsMixin, NativeReadMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing teams.
     """
     queryset = Team.objects.all()
     serializer_class = TeamSerializer
+    read_serializer_class = FastTeamSerializer
+    version_collections = ('teams', 'users')
+    pagination_class = IdCursorPagination
+
+    def get_serializer(self, *args, **kwargs):
+        """Look up member counts for every team being read in one query."""
+        fields = self.sparse_fields()
+        if args and self.request.method == 'GET' and (fields is None or 'member_count' in fields):
+            teams = args[0] if kwargs.get('many') else [args[0]]
+            kwargs.setdefault('context', self.get_serializer_context())
+            kwargs['context']['member_counts'] = TeamSerializer.member_counts(teams)
+        return super().get_serializer(*args, **kwargs)
 
+    def native_annotate(self, records, documents):
+        if not records or 'member_count' not in records[0]:
+            return
+        team_ids = [str(document['_id']) for document in documents]
+        users = self.native_collection().database[User._meta.db_table]
+        counts = {
+            row['_id']: row['member_count']
+            for row in users.aggregate([
+                {'$match': {'team_id': {'$in': team_ids}}},
+                {'$group': {'_id': '$team_id', 'member_count': {'$sum': 1}}},
+            ])
+        }
+        for record, team_id in zip(records, team_ids):
+            record['member_count'] = counts.get(team_id, 0)
 
-class ActivityViewSet(viewsets.ModelViewSet):
+
+class ActivityViewSet(DeltaSyncMixin, SparseFieldsMixin, NativeReadMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing activities.
     """
     queryset = Activity.objects.all()
     serializer_class = ActivitySerializer
+    read_serializer_class = FastActivitySerializer
+    pagination_class = ActivityCursorPagination
+    filter_backends = [ActivityFilterBackend, IndexedOrderingFilter]
+    # Every activity index ends in (date, _id), so only date orderings are
+    # served by an index whatever the filters
+    ordering_fields = ('date',)
+    ordering = ('-date', '-_id')
+    native_sort = [('date', -1), ('_id', -1)]
+    max_bulk_records = 10000
+    export_formats = {
+        'ndjson': ('application/x-ndjson', ndjson_stream),
+        'csv': ('text/csv', csv_stream),
+    }
+
+    def create(self, request, *args, **kwargs):
+        """
+        With ``OCTOFIT_WRITE_BEHIND``, validate and queue the activity and return 202.
+        """
+        if not getattr(settings, 'OCTOFIT_WRITE_BEHIND', False):
+            return super().create(request, *args, **kwargs)
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        record = dict(serializer.validated_data, _id=ObjectId())
+        write_queue.submit(record)
+        return Response(ActivitySerializer(Activity(**record)).data, status=status.HTTP_202_ACCEPTED)
+
+    def perform_create(self, serializer):
+        activity = serializer.save()
+        activities_changed.send(sender=Activity, added=[activity_snapshot(activity)])
+
+    def perform_update(self, serializer):
+        previous = activity_snapshot(serializer.instance)
+        activity = serializer.save()
+        activities_changed.send(
+            sender=Activity,
+            added=[activity_snapshot(activity)],
+            removed=[previous],
+        )
+
+    def perform_destroy(self, instance):
+        previous = activity_snapshot(instance)
+        super().perform_destroy(instance)
+        activities_changed.send(sender=Activity, removed=[previous])
+
+    @action(detail=False, methods=['post'], url_path='bulk', parser_classes=[JSONParser, NDJSONParser])
+    def bulk(self, request):
+        """
+        Create many activities from a JSON array or an NDJSON body.
 
+        Valid records are committed even when others fail; the response
+        lists the new id or the validation errors for each record index.
+        """
+        records = request.data
+        if not isinstance(records, list):
+            return Response(
+                {'detail': 'Expected a JSON array or an NDJSON body.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        if len(records) > self.max_bulk_records:
+            return Response(
+                {'detail': f'At most {self.max_bulk_records} records can be sent at once.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
 
-class LeaderboardViewSet(viewsets.ModelViewSet):
+        valid, errors = [], []
+        for index, record in enumerate(records):
+            serializer = self.get_serializer(data=record)
+            if serializer.is_valid():
+                valid.append((index, serializer.validated_data))
+            else:
+                errors.append({'index': index, 'errors': serializer.errors})
+
+        created, insert_errors = insert_activities(valid)
+        errors = sorted(errors + insert_errors, key=lambda error: error['index'])
+        if not created:
+            response_status = status.HTTP_400_BAD_REQUEST
+        elif errors:
+            response_status = status.HTTP_207_MULTI_STATUS
+        else:
+            response_status = status.HTTP_201_CREATED
+        return Response({
+            'created': [{'index': index, 'id': str(document['_id'])} for index, document in created],
+            'errors': errors,
+        }, status=response_status)
+
+    @action(detail=False, methods=['get'], url_path='export')
+    def export(self, request):
+        """
+        Stream activities as NDJSON (default) or CSV with ``?output=csv``.
+
+        Supports the user_id, team_id, date_after and date_before filters.
+        """
+        output = request.query_params.get('output', 'ndjson')
+        if output not in self.export_formats:
+            return Response(
+                {'output': f'Choose one of: {", ".join(self.export_formats)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        records = activity_records(activity_export_filter(request.query_params))
+        content_type, encode = self.export_formats[output]
+        response = StreamingHttpResponse(encode(records), content_type=content_type)
+        response['Content-Disposition'] = f'attachment; filename="activities.{output}"'
+        return response
+
+
+class LeaderboardViewSet(CachedResponseMixin, SparseFieldsMixin, NativeReadMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing leaderboard entries.
     """
     queryset = Leaderboard.objects.all().order_by('rank')
     serializer_class = LeaderboardSerializer
+    read_serializer_class = FastLeaderboardSerializer
+    version_collections = ('leaderboard', windows.WINDOW_COLLECTION)
+    pagination_class = LeaderboardCursorPagination
+    native_sort = [('rank', 1)]
+    max_top = 100
+    max_radius = 50
+
+    def fingerprint_parts(self, request):
+        # Windowed rankings also change when a day expires
+        if 'window' in request.query_params:
+            return [windows.today().isoformat()]
+        return []
+
+    def list(self, request, *args, **kwargs):
+        """
+        The all-time leaderboard, or a sliding window with ``?window=7d|30d|month``.
+        """
+        if 'window' in request.query_params:
+            return self.conditional(request, self.window_list, *args, **kwargs)
+        return super().list(request, *args, **kwargs)
+
+    def window_list(self, request, *args, **kwargs):
+        window = request.query_params['window']
+        if window not in windows.WINDOWS:
+            return Response(
+                {'window': f'Choose one of: {", ".join(windows.WINDOWS)}.'},
+                status=status.HTTP_400_BAD_REQUEST
+            )
+        reader = NativeReader(LeaderboardSerializer, self.sparse_fields())
+        return Response([reader.to_representation(row) for row in windows.ranked(window)])
+
+    def ranked_rows(self, snapshot, user_ids):
+        """Fetch leaderboard rows for ``user_ids`` in index order with index ranks."""
+        reader = NativeReader(LeaderboardSerializer)
+        documents = {
+            document['user_id']: document
+            for document in self.native_collection().find({'user_id': {'$in': user_ids}}, reader.projection)
+        }
+        rows = []
+        for user_id in user_ids:
+            if user_id in documents:
+                row = reader.to_representation(documents[user_id])
+                row['rank'] = snapshot.rank(user_id)
+                rows.append(row)
+        return rows
+
+    @staticmethod
+    def bounded_int(params, name, default, maximum):
+        try:
+            value = int(params.get(name, default))
+        except ValueError:
+            value = default
+        return min(max(value, 0), maximum)
+
+    @action(detail=False, methods=['get'], url_path='top')
+    def top(self, request):
+        """
+        The ``k`` best ranked users (default 10, at most 100).
+        """
+        snapshot = rank_index.snapshot()
+        k = self.bounded_int(request.query_params, 'k', 10, self.max_top)
+        return Response(self.ranked_rows(snapshot, snapshot.top(k)))
+
+    @action(detail=False, methods=['get'], url_path=r'around/(?P<user_id>[^/.]+)')
+    def around(self, request, user_id=None):
+        """
+        A user's leaderboard row with ``radius`` neighbours on each side (default 5, at most 50).
+        """
+        snapshot = rank_index.snapshot()
+        if user_id not in snapshot:
+            raise Http404
+        radius = self.bounded_int(request.query_params, 'radius', 5, self.max_radius)
+        return Response(self.ranked_rows(snapshot, snapshot.around(user_id, radius)))
+
+    @action(detail=False, methods=['get'], url_path=r'percentile/(?P<user_id>[^/.]+)')
+    def percentile(self, request, user_id=None):
+        """
+        A user's rank and the percentage of users with fewer calories.
+        """
+        snapshot = rank_index.snapshot()
+        if user_id not in snapshot:
+            raise Http404
+        return Response({
+            'user_id': user_id,
+            'total_calories': snapshot.totals[user_id],
+            'rank': snapshot.rank(user_id),
+            'percentile': round(snapshot.percentile(user_id), 2),
+            'total_users': len(snapshot),
+        })
 
 
-class WorkoutViewSet(viewsets.ModelViewSet):
+class WorkoutViewSet(DeltaSyncMixin, CachedResponseMixin, SparseFieldsMixin, NativeReadMixin, FastReadMixin, viewsets.ModelViewSet):
     """
     API endpoint for managing workouts.
     """
     queryset = Workout.objects.all()
     serializer_class = WorkoutSerializer
+    read_serializer_class = FastWorkoutSerializer
+    version_collections = ('workouts',)
+    pagination_class = IdCursorPagination
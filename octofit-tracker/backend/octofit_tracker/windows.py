@@ -0,0 +1,185 @@
+"""
+Sliding-window leaderboards: last 7 days, last 30 days and the current month.
+
+Per-user window totals live in the ``window_leaderboard`` collection. Activity
+writes that fall inside a window are added with ``$inc``; when a window moves
+forward, the days that came in are added and the days that fell out are
+subtracted using the daily per-user rollup buckets, so raw activities are
+never rescanned. A window without state is seeded from the same buckets.
+"""
+import datetime
+from collections import defaultdict
+
+from django.dispatch import receiver
+from django.utils import timezone
+from pymongo import DESCENDING, UpdateOne
+from pymongo.errors import DuplicateKeyError
+
+from .mongo import get_db, team_ids_for_users, to_mongo_datetime
+from .rollups import ROLLUP_COLLECTION
+from .signals import activities_changed
+from .versions import bump
+
+WINDOW_COLLECTION = 'window_leaderboard'
+WINDOW_STATE_COLLECTION = 'window_state'
+WINDOWS = ('7d', '30d', 'month')
+
+ONE_DAY = datetime.timedelta(days=1)
+
+
+def today():
+    return timezone.now().astimezone(datetime.timezone.utc).date()
+
+
+def window_start(window, day):
+    """Return the first day included in ``window`` when the last day is ``day``."""
+    if window == '7d':
+        return day - datetime.timedelta(days=6)
+    if window == '30d':
+        return day - datetime.timedelta(days=29)
+    return day.replace(day=1)
+
+
+def _user_day_totals(first_day, last_day):
+    """Sum the daily user rollup buckets in [first_day, last_day) per user."""
+    rows = get_db()[ROLLUP_COLLECTION].aggregate([
+        {'$match': {
+            'scope': 'user',
+            'period': 'day',
+            'bucket': {'$gte': first_day.isoformat(), '$lt': last_day.isoformat()},
+        }},
+        {'$group': {'_id': '$owner_id', 'calories': {'$sum': '$calories'}, 'count': {'$sum': '$count'}}},
+    ])
+    return {row['_id']: (row['calories'], row['count']) for row in rows}
+
+
+def _apply(window, deltas):
+    """Add {user_id: (calories, activities)} deltas to one window."""
+    if not deltas:
+        return
+    teams = team_ids_for_users(deltas)
+    now = to_mongo_datetime(timezone.now())
+    collection = get_db()[WINDOW_COLLECTION]
+    collection.bulk_write([
+        UpdateOne(
+            {'window': window, 'user_id': user_id},
+            {
+                '$inc': {'total_calories': calories, 'total_activities': activities},
+                '$set': {'updated_at': now},
+                '$setOnInsert': {'team_id': teams.get(user_id)},
+            },
+            upsert=True,
+        )
+        for user_id, (calories, activities) in deltas.items()
+    ], ordered=False)
+    collection.delete_many({'window': window, 'total_activities': {'$lte': 0}})
+
+
+def advance(window, day=None):
+    """
+    Bring a window up to ``day`` (default today).
+
+    The window's state records the first and last day it covers. Moving the
+    last day forward adds the days that came in and subtracts the days that
+    fell out, both from the daily rollups, so activities dated ahead of the
+    window are counted once it reaches them. A window is never moved back.
+
+    Returns (first, last, loaded): the days the window now covers, and the
+    (first, last) days read from the rollups on this call or None. Those
+    days already hold every activity written so far.
+    """
+    day = day or today()
+    start = window_start(window, day)
+    states = get_db()[WINDOW_STATE_COLLECTION]
+    state = states.find_one({'_id': window})
+
+    if state is not None and 'end' not in state:
+        # Saved before the last covered day was recorded: seed it again
+        states.delete_one({'_id': window, 'end': {'$exists': False}})
+        state = None
+
+    if state is None:
+        try:
+            states.insert_one({'_id': window, 'start': start.isoformat(), 'end': day.isoformat()})
+        except DuplicateKeyError:
+            # Another worker seeded the window first
+            return advance(window, day)
+        get_db()[WINDOW_COLLECTION].delete_many({'window': window})
+        _apply(window, _user_day_totals(start, day + ONE_DAY))
+        bump(WINDOW_COLLECTION)
+        return start, day, (start, day)
+
+    previous_start = datetime.date.fromisoformat(state['start'])
+    previous_end = datetime.date.fromisoformat(state['end'])
+    if day <= previous_end:
+        return previous_start, previous_end, None
+
+    # Only the worker that moves the window applies the days in between
+    claimed = states.find_one_and_update(
+        {'_id': window, 'start': state['start'], 'end': state['end']},
+        {'$set': {'start': start.isoformat(), 'end': day.isoformat()}},
+    )
+    if claimed is None:
+        return advance(window, day)
+
+    entered_from = max(previous_end + ONE_DAY, start)
+    deltas = defaultdict(lambda: [0, 0])
+    for (first, last), sign in (
+        ((previous_start, min(start, previous_end + ONE_DAY)), -1),
+        ((entered_from, day + ONE_DAY), 1),
+    ):
+        if first < last:
+            for user_id, (calories, count) in _user_day_totals(first, last).items():
+                deltas[user_id][0] += sign * calories
+                deltas[user_id][1] += sign * count
+    _apply(window, {user_id: tuple(delta) for user_id, delta in deltas.items() if delta != [0, 0]})
+    bump(WINDOW_COLLECTION)
+    return start, day, (entered_from, day)
+
+
+@receiver(activities_changed)
+def update_windows(sender, added=(), removed=(), **kwargs):
+    """Add activity writes that fall inside each window."""
+    day = today()
+    changed = False
+    for window in WINDOWS:
+        first, last, loaded = advance(window, day)
+        deltas = defaultdict(lambda: [0, 0])
+        for activities, sign in ((added, 1), (removed, -1)):
+            for activity in activities:
+                activity_day = to_mongo_datetime(activity['date']).date()
+                # Days just read from the rollups already include this write
+                if loaded and loaded[0] <= activity_day <= loaded[1]:
+                    continue
+                if first <= activity_day <= last:
+                    delta = deltas[activity['user_id']]
+                    delta[0] += sign * activity['calories']
+                    delta[1] += sign
+        _apply(window, {user_id: tuple(delta) for user_id, delta in deltas.items() if delta != [0, 0]})
+        changed = changed or bool(deltas)
+    if changed:
+        bump(WINDOW_COLLECTION)
+
+
+def ranked(window, day=None):
+    """Return a window's rows sorted by calories with competition ranks."""
+    advance(window, day)
+    rows = list(
+        get_db()[WINDOW_COLLECTION]
+        .find({'window': window})
+        .sort([('total_calories', DESCENDING), ('user_id', 1)])
+    )
+    rank = 0
+    for position, row in enumerate(rows, start=1):
+        if position == 1 or row['total_calories'] != rows[position - 2]['total_calories']:
+            rank = position
+        row['rank'] = rank
+    return rows
+
+
+def reset():
+    """Drop every window's rows and state so each one is reseeded on next use."""
+    db = get_db()
+    db[WINDOW_COLLECTION].delete_many({})
+    db[WINDOW_STATE_COLLECTION].delete_many({})
+    bump(WINDOW_COLLECTION)
@@ -0,0 +1,151 @@
+"""
+Write-behind queue for activity creation.
+
+With ``OCTOFIT_WRITE_BEHIND`` enabled, ``POST /api/activities/`` validates
+the record, gives it an ObjectId, queues it and answers ``202 Accepted``.
+A background thread writes queued records with ``insert_activities`` once
+``OCTOFIT_WRITE_BATCH_SIZE`` records are waiting or the oldest has waited
+``OCTOFIT_WRITE_FLUSH_INTERVAL`` seconds. At most ``OCTOFIT_WRITE_QUEUE_SIZE``
+records may be queued or in flight; beyond that requests get a 503.
+
+Queued records live only in this process: they are flushed at interpreter
+exit, but a crash loses them.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import deque
+
+from django.conf import settings
+from django.db import connection
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+from .ingest import insert_activities
+
+logger = logging.getLogger(__name__)
+
+
+class QueueFull(APIException):
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'The activity write queue is full, retry shortly.'
+    default_code = 'write_queue_full'
+    # Sent as Retry-After by DRF's exception handler
+    wait = 1
+
+
+class WriteBehindQueue:
+    """Bounded in-process queue drained in batches by one background thread."""
+
+    def __init__(self, max_size, batch_size, flush_interval):
+        self.max_size = max_size
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+        self._items = deque()
+        self._pending = 0
+        self._condition = threading.Condition()
+        self._flush_requested = False
+        self._stopping = False
+        self._thread = None
+        self._metrics = {
+            'enqueued': 0, 'written': 0, 'failed': 0, 'rejected': 0, 'batches': 0,
+            'flush_ms_total': 0.0, 'flush_ms_last': 0.0, 'flush_ms_max': 0.0,
+        }
+
+    def submit(self, record):
+        """Queue one validated activity, or raise QueueFull."""
+        with self._condition:
+            if self._stopping or self._pending >= self.max_size:
+                self._metrics['rejected'] += 1
+                raise QueueFull()
+            self._items.append((time.monotonic(), record))
+            self._pending += 1
+            self._metrics['enqueued'] += 1
+            if len(self._items) >= self.batch_size:
+                self._condition.notify_all()
+            if self._thread is None or not self._thread.is_alive():
+                self._thread = threading.Thread(target=self._run, name='octofit-write-queue', daemon=True)
+                self._thread.start()
+
+    def flush(self, timeout=None):
+        """Write everything queued so far; returns False if ``timeout`` expired first."""
+        with self._condition:
+            self._flush_requested = True
+            self._condition.notify_all()
+            done = self._condition.wait_for(lambda: self._pending == 0, timeout)
+            self._flush_requested = False
+            return done
+
+    def shutdown(self, timeout=10):
+        """Stop accepting records and write the remaining ones."""
+        with self._condition:
+            self._stopping = True
+            self._condition.notify_all()
+            thread = self._thread
+        if thread is not None and thread.is_alive():
+            thread.join(timeout)
+
+    def stats(self):
+        with self._condition:
+            metrics = dict(self._metrics)
+            oldest = self._items[0][0] if self._items else None
+            metrics.update(
+                depth=self._pending,
+                queued=len(self._items),
+                max_size=self.max_size,
+                oldest_ms=(time.monotonic() - oldest) * 1000 if oldest is not None else 0.0,
+            )
+        batches = metrics.pop('batches')
+        metrics['flush_ms_mean'] = metrics.pop('flush_ms_total') / batches if batches else 0.0
+        metrics['batches'] = batches
+        return metrics
+
+    def _next_batch(self):
+        """Wait for a full batch, an expired interval, a flush or shutdown."""
+        with self._condition:
+            while not self._items:
+                if self._stopping:
+                    return None
+                self._condition.wait()
+            deadline = self._items[0][0] + self.flush_interval
+            while len(self._items) < self.batch_size and not (self._stopping or self._flush_requested):
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                self._condition.wait(remaining)
+            return [self._items.popleft()[1] for _ in range(min(self.batch_size, len(self._items)))]
+
+    def _run(self):
+        while True:
+            batch = self._next_batch()
+            if batch is None:
+                connection.close()
+                return
+            started = time.perf_counter()
+            written = 0
+            try:
+                created, errors = insert_activities(list(enumerate(batch)))
+                written = len(created)
+                if errors:
+                    logger.warning('Write queue: MongoDB rejected %d of %d activities', len(errors), len(batch))
+            except Exception:
+                logger.exception('Write queue: dropping a batch of %d activities', len(batch))
+            elapsed_ms = (time.perf_counter() - started) * 1000
+            with self._condition:
+                self._pending -= len(batch)
+                self._metrics['written'] += written
+                self._metrics['failed'] += len(batch) - written
+                self._metrics['batches'] += 1
+                self._metrics['flush_ms_total'] += elapsed_ms
+                self._metrics['flush_ms_last'] = elapsed_ms
+                self._metrics['flush_ms_max'] = max(self._metrics['flush_ms_max'], elapsed_ms)
+                self._condition.notify_all()
+
+
+write_queue = WriteBehindQueue(
+    max_size=getattr(settings, 'OCTOFIT_WRITE_QUEUE_SIZE', 10000),
+    batch_size=getattr(settings, 'OCTOFIT_WRITE_BATCH_SIZE', 500),
+    flush_interval=getattr(settings, 'OCTOFIT_WRITE_FLUSH_INTERVAL', 0.5),
+)
+atexit.register(write_queue.shutdown)
@@ -6,9 +6,11 @@ function Leaderboard() {
   const [error, setError] = useState(null);
 
   useEffect(() => {
+    const baseUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/leaderboard/`;
+
     const fetchLeaderboard = async () => {
       try {
-        const apiUrl = `https://${process.env.REACT_APP_CODESPACE_NAME}-8000.app.github.dev/api/leaderboard/`;
+        const apiUrl = baseUrl;
         console.log('Leaderboard - Fetching from:', apiUrl);
         
         const response = await fetch(apiUrl);
@@ -32,7 +34,33 @@ function Leaderboard() {
       }
     };
 
+    // Live updates (only served under an ASGI server). Subscribe before the
+    // first fetch so no change is missed in between.
+    const events = new EventSource(`${baseUrl}stream/`);
+    let opened = false;
+    events.onopen = () => {
+      opened = true;
+    };
+    events.onerror = () => {
+      // Never connected (e.g. runserver/WSGI): stop retrying and keep the fetched board
+      if (!opened) {
+        events.close();
+      }
+    };
+    events.addEventListener('ranks', (event) => {
+      const { changes } = JSON.parse(event.data);
+      setLeaderboard((current) => {
+        const byUser = new Map(current.map((entry) => [entry.user_id, entry]));
+        changes.forEach((change) => {
+          byUser.set(change.user_id, { ...byUser.get(change.user_id), ...change });
+        });
+        return [...byUser.values()].sort((a, b) => (b.total_calories || 0) - (a.total_calories || 0));
+      });
+    });
+    events.addEventListener('reset', () => fetchLeaderboard());
+
     fetchLeaderboard();
+    return () => events.close();
   }, []);
 
   if (loading) {